@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AnalyticsEvent
+from .models import AnalyticsEvent, TenantDailyMetrics
 
 
 @admin.register(AnalyticsEvent)
@@ -8,3 +8,18 @@ class AnalyticsEventAdmin(admin.ModelAdmin):
     list_display = ("event_type", "tenant", "user_id", "timestamp")
     search_fields = ("event_type", "user_id")
     list_filter = ("event_type", "tenant")
+
+
+@admin.register(TenantDailyMetrics)
+class TenantDailyMetricsAdmin(admin.ModelAdmin):
+    list_display = (
+        "tenant",
+        "date",
+        "new_patients",
+        "appointments_total",
+        "clinical_records",
+        "lab_results",
+        "revenue",
+    )
+    list_filter = ("tenant",)
+    date_hierarchy = "date"
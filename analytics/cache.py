@@ -0,0 +1,131 @@
+"""
+Tenant-scoped cache for analytics view contexts.
+
+Entries are keyed by (tenant, view, parameters). Each tenant has a generation
+counter that model signals bump on every change, so invalidating a tenant is a
+single ``incr`` instead of a key scan. Outdated entries are still served while a
+Celery task recomputes them in the background (stale-while-revalidate).
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Entries are considered fresh for ANALYTICS_CACHE_TTL seconds, then kept for
+# ANALYTICS_CACHE_STALE_TTL seconds so they can be served while recomputing.
+DEFAULT_TTL = 15 * 60
+DEFAULT_STALE_TTL = 24 * 60 * 60
+REFRESH_LOCK_TIMEOUT = 5 * 60
+
+_builders = {}
+
+
+def _ttl():
+    return getattr(settings, "ANALYTICS_CACHE_TTL", DEFAULT_TTL)
+
+
+def _stale_ttl():
+    return getattr(settings, "ANALYTICS_CACHE_STALE_TTL", DEFAULT_STALE_TTL)
+
+
+def _generation_key(tenant_id):
+    return f"analytics:gen:{tenant_id}"
+
+
+def tenant_generation(tenant_id):
+    """Return the tenant's current cache generation, creating it if needed."""
+    key = _generation_key(tenant_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock so a lost counter never reuses an older generation.
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_tenant_generation(tenant_id):
+    """Mark every cached analytics context of the tenant as stale."""
+    try:
+        cache.incr(_generation_key(tenant_id))
+    except ValueError:
+        cache.set(_generation_key(tenant_id), time.time_ns(), timeout=None)
+
+
+def analytics_cache_key(tenant_id, view_name, params=None):
+    digest = hashlib.md5(
+        json.dumps(params or {}, sort_keys=True, default=str).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f"analytics:ctx:{tenant_id}:{view_name}:{digest}"
+
+
+def cached_report(view_name):
+    """Register ``builder(tenant, **params)`` as the context builder for ``view_name``."""
+
+    def decorator(builder):
+        _builders[view_name] = builder
+        return builder
+
+    return decorator
+
+
+def compute_and_store(view_name, tenant, params=None):
+    """Build the context for ``view_name`` and cache it under the current generation."""
+    params = params or {}
+    # Read the generation first: a change while building leaves the entry stale.
+    generation = tenant_generation(tenant.id)
+    context = _builders[view_name](tenant, **params)
+    cache.set(
+        analytics_cache_key(tenant.id, view_name, params),
+        {
+            "context": context,
+            "generation": generation,
+            "fresh_until": time.time() + _ttl(),
+        },
+        timeout=_stale_ttl(),
+    )
+    return context
+
+
+def _schedule_refresh(view_name, tenant_id, params):
+    lock_key = analytics_cache_key(tenant_id, view_name, params) + ":refreshing"
+    if not cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+        return  # another worker is already recomputing this entry
+    from analytics.tasks import refresh_analytics_context
+
+    try:
+        refresh_analytics_context.delay(view_name, tenant_id, params)
+    except Exception:
+        cache.delete(lock_key)
+        logger.exception(
+            "Could not enqueue analytics cache refresh",
+            extra={"view": view_name, "tenant_id": tenant_id},
+        )
+
+
+def release_refresh_lock(view_name, tenant_id, params):
+    cache.delete(analytics_cache_key(tenant_id, view_name, params) + ":refreshing")
+
+
+def get_cached_context(view_name, tenant, params=None):
+    """
+    Return the analytics context for ``view_name``.
+    Fresh entries are returned as is; stale ones are returned immediately while a
+    background refresh is scheduled; only a cold miss is computed inline.
+    """
+    params = params or {}
+    entry = cache.get(analytics_cache_key(tenant.id, view_name, params))
+    if entry is None:
+        return compute_and_store(view_name, tenant, params)
+
+    if (
+        entry["generation"] != tenant_generation(tenant.id)
+        or entry["fresh_until"] <= time.time()
+    ):
+        _schedule_refresh(view_name, tenant.id, params)
+    return entry["context"]
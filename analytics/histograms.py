@@ -0,0 +1,87 @@
+"""
+Single-query histogram helpers for analytics charts.
+Each helper returns every bucket, zero counts included, from one grouped query.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.functions import ExtractIsoWeekDay
+
+WEEKDAY_NAMES = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def histogram(queryset, field, buckets):
+    """
+    Count the rows of ``queryset`` per bucket of ``field`` in one query.
+
+    ``buckets`` is a list of ``(label, lower, upper)`` half-open ranges
+    (``lower <= value < upper``); ``None`` leaves a side unbounded. Works for
+    numeric, date and datetime fields. A row is counted in the first bucket
+    it matches; rows matching none are ignored.
+    """
+    whens = []
+    for label, lower, upper in buckets:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(**{f"{field}__gte": lower})
+        if upper is not None:
+            condition &= Q(**{f"{field}__lt": upper})
+        whens.append(When(condition, then=Value(label)))
+
+    rows = (
+        queryset.annotate(bucket=Case(*whens, default=None, output_field=CharField()))
+        .filter(bucket__isnull=False)
+        .values("bucket")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    counts = {row["bucket"]: row["count"] for row in rows}
+    return [{"label": label, "count": counts.get(label, 0)} for label, *_ in buckets]
+
+
+def weekday_histogram(queryset, field):
+    """Count the rows of ``queryset`` per ISO weekday of ``field`` (Monday first)."""
+    rows = (
+        queryset.annotate(weekday=ExtractIsoWeekDay(field))
+        .values("weekday")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    counts = {row["weekday"]: row["count"] for row in rows}
+    return [
+        {"label": name, "count": counts.get(number, 0)}
+        for number, name in enumerate(WEEKDAY_NAMES, start=1)
+    ]
+
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:  # 29 February in a non-leap target year
+        return day.replace(year=day.year - years, day=28)
+
+
+def age_buckets(age_ranges, today=None):
+    """
+    Turn inclusive ``(label, min_age, max_age)`` ranges into date-of-birth
+    buckets for :func:`histogram`. ``max_age=None`` leaves the oldest range open.
+    """
+    today = today or date.today()
+    one_day = timedelta(days=1)
+    buckets = []
+    for label, min_age, max_age in age_ranges:
+        # Aged min_age..max_age means born after the (max_age + 1)th birthday
+        # cutoff and no later than the min_age one.
+        lower = None
+        if max_age is not None:
+            lower = _years_before(today, max_age + 1) + one_day
+        buckets.append((label, lower, _years_before(today, min_age) + one_day))
+    return buckets
@@ -0,0 +1,220 @@
+"""
+KPI engine for the analytics views.
+Computes every tenant KPI with conditional aggregation: one query per source table.
+"""
+from dataclasses import asdict, dataclass, fields
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from users.models import CustomUser
+
+
+@dataclass(frozen=True)
+class TenantKPIs:
+    """Tenant-wide KPI snapshot shared by all analytics views."""
+
+    # Patients
+    total_patients: int = 0
+    new_patients_30d: int = 0
+    patients_current_month: int = 0
+    patients_last_month: int = 0
+    # Appointments
+    total_appointments: int = 0
+    appointments_this_month: int = 0
+    completed_appointments_this_month: int = 0
+    upcoming_appointments: int = 0
+    completed_appointments_30d: int = 0
+    active_patients_90d: int = 0
+    # Clinical records and labs
+    total_clinical_records: int = 0
+    records_this_month: int = 0
+    total_lab_results: int = 0
+    # Users
+    total_users: int = 0
+    admin_count: int = 0
+    active_users_30d: int = 0
+    # Revenue
+    total_revenue: Decimal = Decimal("0")
+    avg_payment: Decimal = Decimal("0")
+    payment_count: int = 0
+    revenue_90d: Decimal = Decimal("0")
+    avg_payment_90d: Decimal = Decimal("0")
+    payment_count_90d: int = 0
+    revenue_current_month: Decimal = Decimal("0")
+    revenue_last_month: Decimal = Decimal("0")
+    revenue_ytd: Decimal = Decimal("0")
+
+    @property
+    def patient_growth_rate(self):
+        """Month-over-month new patient growth, in percent."""
+        if not self.patients_last_month:
+            return 0
+        return (
+            (self.patients_current_month - self.patients_last_month)
+            / self.patients_last_month
+            * 100
+        )
+
+    @property
+    def revenue_growth_rate(self):
+        """Month-over-month revenue growth, in percent."""
+        if not self.revenue_last_month:
+            return 0
+        return (
+            (self.revenue_current_month - self.revenue_last_month)
+            / self.revenue_last_month
+            * 100
+        )
+
+    @property
+    def completion_rate(self):
+        """Share of this month's appointments that were completed, in percent."""
+        if not self.appointments_this_month:
+            return 0
+        return (
+            self.completed_appointments_this_month / self.appointments_this_month * 100
+        )
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _period_boundaries(now):
+    """Return the datetime boundaries every KPI window is measured from."""
+    local_now = timezone.localtime(now)
+    month_start = local_now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    return {
+        "now": now,
+        "month_start": month_start,
+        "next_month_start": next_month_start,
+        "last_month_start": last_month_start,
+        "year_start": month_start.replace(month=1),
+        "days_30": now - timedelta(days=30),
+        "days_90": now - timedelta(days=90),
+    }
+
+
+def kpi_sources(now):
+    """
+    Return ``{source: (queryset, aggregates)}``, one entry per source table.
+    Add new KPIs as extra aggregates on an existing source so the engine
+    keeps issuing exactly one query per table.
+    """
+    b = _period_boundaries(now)
+    this_month = Q(
+        scheduled_for__gte=b["month_start"], scheduled_for__lt=b["next_month_start"]
+    )
+    return {
+        "patients": (
+            Patient.objects.all(),
+            {
+                "total_patients": Count("id"),
+                "new_patients_30d": Count("id", filter=Q(created_at__gte=b["days_30"])),
+                "patients_current_month": Count(
+                    "id", filter=Q(created_at__gte=b["month_start"])
+                ),
+                "patients_last_month": Count(
+                    "id",
+                    filter=Q(
+                        created_at__gte=b["last_month_start"],
+                        created_at__lt=b["month_start"],
+                    ),
+                ),
+            },
+        ),
+        "appointments": (
+            Appointment.objects.all(),
+            {
+                "total_appointments": Count("id"),
+                "appointments_this_month": Count("id", filter=this_month),
+                "completed_appointments_this_month": Count(
+                    "id", filter=this_month & Q(status="completed")
+                ),
+                "upcoming_appointments": Count(
+                    "id", filter=Q(scheduled_for__gte=b["now"], status="scheduled")
+                ),
+                "completed_appointments_30d": Count(
+                    "id", filter=Q(scheduled_for__gte=b["days_30"], status="completed")
+                ),
+                "active_patients_90d": Count(
+                    "patient", distinct=True, filter=Q(scheduled_for__gte=b["days_90"])
+                ),
+            },
+        ),
+        "clinical_records": (
+            ClinicalRecord.objects.all(),
+            {
+                "total_clinical_records": Count("id"),
+                "records_this_month": Count(
+                    "id", filter=Q(created_at__gte=b["month_start"])
+                ),
+            },
+        ),
+        "labs": (
+            LabResult.objects.all(),
+            {"total_lab_results": Count("id")},
+        ),
+        "users": (
+            CustomUser.objects.filter(is_active=True),
+            {
+                "total_users": Count("id"),
+                "admin_count": Count("id", filter=Q(role="admin")),
+                "active_users_30d": Count("id", filter=Q(last_login__gte=b["days_30"])),
+            },
+        ),
+        "payments": (
+            Payment.objects.all(),
+            {
+                "total_revenue": Sum("amount"),
+                "avg_payment": Avg("amount"),
+                "payment_count": Count("id"),
+                "revenue_90d": Sum("amount", filter=Q(timestamp__gte=b["days_90"])),
+                "avg_payment_90d": Avg("amount", filter=Q(timestamp__gte=b["days_90"])),
+                "payment_count_90d": Count("id", filter=Q(timestamp__gte=b["days_90"])),
+                "revenue_current_month": Sum(
+                    "amount", filter=Q(timestamp__gte=b["month_start"])
+                ),
+                "revenue_last_month": Sum(
+                    "amount",
+                    filter=Q(
+                        timestamp__gte=b["last_month_start"],
+                        timestamp__lt=b["month_start"],
+                    ),
+                ),
+                "revenue_ytd": Sum("amount", filter=Q(timestamp__gte=b["year_start"])),
+            },
+        ),
+    }
+
+
+def compute_tenant_kpis(tenant, now=None, only=None):
+    """
+    Compute the KPI set for ``tenant`` in one query per source table.
+    ``only`` restricts the run to the named sources; KPIs of skipped sources
+    keep their defaults.
+    """
+    now = now or timezone.now()
+    values = {}
+    for source, (queryset, aggregates) in kpi_sources(now).items():
+        if only is not None and source not in only:
+            continue
+        values.update(queryset.filter(tenant=tenant).aggregate(**aggregates))
+
+    defaults = {f.name: f.default for f in fields(TenantKPIs)}
+    # Sum/Avg return None on empty sets; fall back to the typed default.
+    return TenantKPIs(
+        **{
+            name: defaults[name] if value is None else value
+            for name, value in values.items()
+        }
+    )
@@ -0,0 +1,71 @@
+"""
+Management command to rebuild TenantDailyMetrics history.
+Usage: python manage.py backfill_daily_metrics --start 2025-01-01 [--end 2025-12-31] [--chunk-days 31] [--tenant 3]
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.models import RollupWatermark
+from analytics.rollups import DAILY_METRICS_WATERMARK, rebuild_daily_metrics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily tenant metrics rollup for a date range, in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First day to rebuild (YYYY-MM-DD). Defaults to 365 days ago.",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            help="Last day to rebuild (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Number of days rebuilt per transaction",
+        )
+        parser.add_argument(
+            "--tenant",
+            type=int,
+            action="append",
+            dest="tenant_ids",
+            help="Only rebuild this tenant ID (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        end = options["end"] or timezone.localdate()
+        start = options["start"] or end - timedelta(days=365)
+        chunk_days = options["chunk_days"]
+        if start > end:
+            raise CommandError("--start must not be after --end")
+        if chunk_days < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        total = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+            written = rebuild_daily_metrics(
+                chunk_start, chunk_end, tenant_ids=options["tenant_ids"]
+            )
+            total += written
+            self.stdout.write(f"  {chunk_start} → {chunk_end}: {written} rows")
+            chunk_start = chunk_end + timedelta(days=1)
+
+        # A full rebuild up to today supersedes anything the incremental task missed.
+        if not options["tenant_ids"] and end >= timezone.localdate():
+            RollupWatermark.objects.update_or_create(
+                name=DAILY_METRICS_WATERMARK, defaults={"processed_until": started}
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Rebuilt {total} daily metric rows ({start} → {end})")
+        )
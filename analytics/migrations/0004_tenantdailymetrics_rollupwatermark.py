@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("analytics", "0003_alter_analyticsevent_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("processed_until", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TenantDailyMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("new_patients", models.PositiveIntegerField(default=0)),
+                ("appointments_total", models.PositiveIntegerField(default=0)),
+                ("appointments_scheduled", models.PositiveIntegerField(default=0)),
+                ("appointments_completed", models.PositiveIntegerField(default=0)),
+                ("appointments_cancelled", models.PositiveIntegerField(default=0)),
+                ("clinical_records", models.PositiveIntegerField(default=0)),
+                ("lab_results", models.PositiveIntegerField(default=0)),
+                ("payment_count", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_metrics",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "tenant daily metrics",
+                "ordering": ["date"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="tenantdailymetrics",
+            constraint=models.UniqueConstraint(
+                fields=("tenant", "date"), name="unique_tenant_daily_metrics"
+            ),
+        ),
+    ]
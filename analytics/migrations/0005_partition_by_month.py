@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:21
+
+from django.db import migrations
+
+from common.partitions import convert_to_partitioned
+
+
+def partition_table(apps, schema_editor):
+    # Monthly range partitions on PostgreSQL; a no-op on other backends.
+    convert_to_partitioned(schema_editor, "analytics_analyticsevent", "timestamp")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0004_tenantdailymetrics_rollupwatermark"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
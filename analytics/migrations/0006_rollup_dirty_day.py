@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0006_tenant_plan_created_index"),
+        ("analytics", "0005_partition_by_month"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupDirtyDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="rollupdirtyday",
+            constraint=models.UniqueConstraint(
+                fields=("tenant", "date"), name="unique_rollup_dirty_day"
+            ),
+        ),
+    ]
@@ -48,3 +48,69 @@ class AnalyticsEvent(models.Model):
 
     def __str__(self):
         return f"{self.get_event_type_display()} at {self.timestamp} (tenant {self.tenant_id})"
+
+
+class TenantDailyMetrics(models.Model):
+    """
+    Pre-aggregated per-tenant counts for a single day.
+    Maintained by analytics.rollups; analytics charts read these rows
+    instead of scanning the raw tables.
+    """
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="daily_metrics"
+    )
+    date = models.DateField()
+    new_patients = models.PositiveIntegerField(default=0)
+    appointments_total = models.PositiveIntegerField(default=0)
+    appointments_scheduled = models.PositiveIntegerField(default=0)
+    appointments_completed = models.PositiveIntegerField(default=0)
+    appointments_cancelled = models.PositiveIntegerField(default=0)
+    clinical_records = models.PositiveIntegerField(default=0)
+    lab_results = models.PositiveIntegerField(default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date"]
+        verbose_name_plural = "tenant daily metrics"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tenant", "date"], name="unique_tenant_daily_metrics"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Metrics for tenant {self.tenant_id} on {self.date}"
+
+
+class RollupDirtyDay(models.Model):
+    """
+    A tenant day the next incremental rollup must recompute although no
+    source row on it moved its change field: the old day of a rescheduled
+    appointment, an edited payment, or a deleted row.
+    """
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tenant", "date"], name="unique_rollup_dirty_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Dirty rollup day for tenant {self.tenant_id} on {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """High-water mark of source changes already folded into a rollup."""
+
+    name = models.CharField(max_length=64, unique=True)
+    processed_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.processed_until}"
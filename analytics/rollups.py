@@ -0,0 +1,201 @@
+"""
+Daily per-tenant metrics rollup.
+Folds raw Patient/Appointment/ClinicalRecord/LabResult/Payment rows into
+TenantDailyMetrics so analytics charts read one row per day.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+
+from .models import RollupDirtyDay, RollupWatermark, TenantDailyMetrics
+
+logger = logging.getLogger(__name__)
+
+DAILY_METRICS_WATERMARK = "tenant_daily_metrics"
+# Re-read a little before the watermark so rows committed late by long
+# transactions are not skipped; recomputing a day twice is harmless.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# (model, field that places a row on a day, field that moves when a row changes, aggregates)
+ROLLUP_SOURCES = [
+    (Patient, "created_at", "updated_at", {"new_patients": Count("id")}),
+    (
+        Appointment,
+        "scheduled_for",
+        "updated_at",
+        {
+            "appointments_total": Count("id"),
+            "appointments_scheduled": Count("id", filter=Q(status="scheduled")),
+            "appointments_completed": Count("id", filter=Q(status="completed")),
+            "appointments_cancelled": Count("id", filter=Q(status="cancelled")),
+        },
+    ),
+    (ClinicalRecord, "created_at", "updated_at", {"clinical_records": Count("id")}),
+    (LabResult, "created_at", "updated_at", {"lab_results": Count("id")}),
+    (
+        Payment,
+        "timestamp",
+        "timestamp",
+        {"payment_count": Count("id"), "revenue": Sum("amount")},
+    ),
+]
+
+METRIC_FIELDS = [name for *_, aggregates in ROLLUP_SOURCES for name in aggregates]
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(filter_for):
+    """
+    Run one grouped query per source and merge the results by (tenant_id, day).
+    ``filter_for(date_field)`` returns the Q restricting each source.
+    """
+    rows = {}
+    for model, date_field, _, aggregates in ROLLUP_SOURCES:
+        qs = (
+            model.objects.filter(filter_for(date_field))
+            .annotate(day=TruncDate(date_field))
+            .values("tenant_id", "day")
+            .annotate(**aggregates)
+            .order_by()
+        )
+        for row in qs:
+            key = (row.pop("tenant_id"), row.pop("day"))
+            rows.setdefault(key, {}).update(
+                {name: value or 0 for name, value in row.items()}
+            )
+    return rows
+
+
+def _build(tenant_id, day, values):
+    return TenantDailyMetrics(tenant_id=tenant_id, date=day, **values)
+
+
+def rebuild_daily_metrics(start, end, tenant_ids=None):
+    """
+    Recompute every TenantDailyMetrics row from ``start`` to ``end`` (inclusive).
+    Existing rows in the range are replaced, so days whose source rows were
+    deleted drop back to zero. Returns the number of rows written.
+    """
+    range_start, range_end = _day_start(start), _day_start(end + timedelta(days=1))
+
+    def filter_for(date_field):
+        q = Q(**{f"{date_field}__gte": range_start, f"{date_field}__lt": range_end})
+        if tenant_ids is not None:
+            q &= Q(tenant_id__in=tenant_ids)
+        return q
+
+    rows = _aggregate(filter_for)
+    stale = TenantDailyMetrics.objects.filter(date__gte=start, date__lte=end)
+    if tenant_ids is not None:
+        stale = stale.filter(tenant_id__in=tenant_ids)
+
+    with transaction.atomic():
+        stale.delete()
+        TenantDailyMetrics.objects.bulk_create(
+            [
+                _build(tenant_id, day, values)
+                for (tenant_id, day), values in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def changed_days(since):
+    """Return the (tenant_id, day) pairs touched by source rows changed since ``since``."""
+    keys = set()
+    for model, date_field, changed_field, _ in ROLLUP_SOURCES:
+        keys.update(
+            model.objects.filter(**{f"{changed_field}__gte": since})
+            .annotate(day=TruncDate(date_field))
+            .values_list("tenant_id", "day")
+            .distinct()
+            .order_by()
+        )
+    return keys
+
+
+def mark_days_dirty(keys):
+    """Queue (tenant_id, day) pairs for the next incremental refresh."""
+    RollupDirtyDay.objects.bulk_create(
+        [RollupDirtyDay(tenant_id=tenant_id, date=day) for tenant_id, day in keys],
+        ignore_conflicts=True,
+    )
+
+
+def refresh_days(keys):
+    """Recompute the rollup rows for the given (tenant_id, day) pairs."""
+    if not keys:
+        return 0
+    tenant_ids = {tenant_id for tenant_id, _ in keys}
+    days = {day for _, day in keys}
+
+    def filter_for(date_field):
+        return Q(tenant_id__in=tenant_ids, **{f"{date_field}__date__in": days})
+
+    rows = _aggregate(filter_for)
+    # Keys with no remaining source rows are written back as zeros.
+    for key in keys:
+        rows.setdefault(key, {})
+
+    TenantDailyMetrics.objects.bulk_create(
+        [_build(tenant_id, day, values) for (tenant_id, day), values in rows.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["tenant", "date"],
+        update_fields=METRIC_FIELDS + ["updated_at"],
+    )
+    return len(rows)
+
+
+def refresh_daily_metrics_incremental(default_lookback=timedelta(days=1)):
+    """
+    Fold source changes made since the last watermark into the rollup.
+    Only the (tenant, day) pairs those changes touch are recomputed, plus
+    the days queued by ``mark_days_dirty`` (see analytics.signals). Bulk
+    ``QuerySet.update()`` calls bypass both; run ``backfill_daily_metrics``
+    after those or to rebuild history.
+    """
+    started = timezone.now()
+    with transaction.atomic():
+        watermark, created = RollupWatermark.objects.select_for_update().get_or_create(
+            name=DAILY_METRICS_WATERMARK,
+            defaults={"processed_until": started - default_lookback},
+        )
+        if created:
+            logger.info(
+                "No daily metrics watermark found; run backfill_daily_metrics for history",
+                extra={"since": watermark.processed_until.isoformat()},
+            )
+        dirty = list(RollupDirtyDay.objects.values_list("pk", "tenant_id", "date"))
+        keys = changed_days(watermark.processed_until - WATERMARK_OVERLAP)
+        keys.update((tenant_id, day) for _, tenant_id, day in dirty)
+        refreshed = refresh_days(keys)
+        RollupDirtyDay.objects.filter(pk__in=[pk for pk, *_ in dirty]).delete()
+        watermark.processed_until = started
+        watermark.save(update_fields=["processed_until"])
+    return refreshed
+
+
+def monthly_series(tenant, field, since):
+    """Sum a TenantDailyMetrics column per month for ``tenant`` from ``since`` on."""
+    return (
+        TenantDailyMetrics.objects.filter(tenant=tenant, date__gte=since)
+        .annotate(month=TruncMonth("date"))
+        .values("month")
+        .annotate(total=Sum(field))
+        .order_by("month")
+    )
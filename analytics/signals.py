@@ -0,0 +1,101 @@
+"""
+Invalidate cached analytics whenever a source row of a tenant changes, and
+queue the rollup days the incremental refresh cannot find on its own.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from tenants.models import Tenant
+
+from .cache import bump_tenant_generation
+from .rollups import ROLLUP_SOURCES, mark_days_dirty
+
+ANALYTICS_SOURCE_MODELS = (Patient, Appointment, ClinicalRecord, LabResult, Payment)
+
+
+def invalidate_tenant_analytics(sender, instance, **kwargs):
+    tenant_id = getattr(instance, "tenant_id", None)
+    if tenant_id:
+        bump_tenant_generation(tenant_id)
+
+
+for model in ANALYTICS_SOURCE_MODELS:
+    post_save.connect(
+        invalidate_tenant_analytics,
+        sender=model,
+        dispatch_uid=f"analytics_invalidate_save_{model._meta.label_lower}",
+    )
+    post_delete.connect(
+        invalidate_tenant_analytics,
+        sender=model,
+        dispatch_uid=f"analytics_invalidate_delete_{model._meta.label_lower}",
+    )
+
+
+# Field that places each rollup source row on a day.
+ROLLUP_DATE_FIELDS = {model: date_field for model, date_field, *_ in ROLLUP_SOURCES}
+
+
+def _rollup_day(instance, value):
+    return (instance.tenant_id, timezone.localdate(value))
+
+
+def remember_appointment_day(sender, instance, **kwargs):
+    """Keep the day a rescheduled appointment is moving away from."""
+    if instance.pk:
+        old = (
+            Appointment.objects.filter(pk=instance.pk)
+            .values_list("scheduled_for", flat=True)
+            .first()
+        )
+        if old and old != instance.scheduled_for:
+            instance._rollup_old_day = _rollup_day(instance, old)
+
+
+def mark_old_appointment_day(sender, instance, **kwargs):
+    old_day = instance.__dict__.pop("_rollup_old_day", None)
+    if old_day:
+        mark_days_dirty([old_day])
+
+
+def mark_edited_payment_day(sender, instance, created, **kwargs):
+    # Payment.timestamp never moves, so edits are invisible to changed_days().
+    if not created:
+        mark_days_dirty([_rollup_day(instance, instance.timestamp)])
+
+
+def mark_deleted_row_day(sender, instance, origin=None, **kwargs):
+    # A deleted tenant takes its rollup rows with it.
+    if isinstance(origin, Tenant):
+        return
+    mark_days_dirty(
+        [_rollup_day(instance, getattr(instance, ROLLUP_DATE_FIELDS[sender]))]
+    )
+
+
+pre_save.connect(
+    remember_appointment_day,
+    sender=Appointment,
+    dispatch_uid="analytics_rollup_remember_appointment_day",
+)
+post_save.connect(
+    mark_old_appointment_day,
+    sender=Appointment,
+    dispatch_uid="analytics_rollup_old_appointment_day",
+)
+post_save.connect(
+    mark_edited_payment_day,
+    sender=Payment,
+    dispatch_uid="analytics_rollup_edited_payment_day",
+)
+for model in ROLLUP_DATE_FIELDS:
+    post_delete.connect(
+        mark_deleted_row_day,
+        sender=model,
+        dispatch_uid=f"analytics_rollup_deleted_day_{model._meta.label_lower}",
+    )
@@ -0,0 +1,30 @@
+import logging
+
+from celery import shared_task
+
+from analytics.cache import compute_and_store, release_refresh_lock
+from analytics.rollups import refresh_daily_metrics_incremental
+from tenants.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_tenant_daily_metrics():
+    """Fold raw-table changes since the last run into TenantDailyMetrics."""
+    refreshed = refresh_daily_metrics_incremental()
+    logger.info("Tenant daily metrics refreshed", extra={"rows": refreshed})
+    return {"rows": refreshed}
+
+
+@shared_task
+def refresh_analytics_context(view_name, tenant_id, params=None):
+    """Recompute a stale analytics context in the background."""
+    # Importing the views registers their context builders with the cache.
+    import analytics.views  # noqa: F401
+
+    try:
+        tenant = Tenant.objects.get(pk=tenant_id)
+        compute_and_store(view_name, tenant, params)
+    finally:
+        release_refresh_lock(view_name, tenant_id, params or {})
@@ -1,8 +1,28 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
+from appointments.models import Appointment
+from billing.models import Payment
+from patients.models import Patient
 from tenants.models import Tenant
+from users.models import CustomUser
 
-from .models import AnalyticsEvent
+from .cache import get_cached_context, tenant_generation
+from .histograms import age_buckets, histogram, weekday_histogram
+from .kpis import compute_tenant_kpis, kpi_sources
+from .models import AnalyticsEvent, RollupDirtyDay, RollupWatermark, TenantDailyMetrics
+from .rollups import (
+    monthly_series,
+    rebuild_daily_metrics,
+    refresh_daily_metrics_incremental,
+)
 
 
 class AnalyticsEventModelTest(TestCase):
@@ -14,3 +34,274 @@ class AnalyticsEventModelTest(TestCase):
         event = AnalyticsEvent.objects.get(event_type="login")
         self.assertEqual(event.event_type, "login")
         self.assertEqual(event.tenant, self.tenant)
+
+
+class TenantKPIEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(
+            name="Test Tenant", subdomain="testtenant", plan="professional"
+        )
+        self.other_tenant = Tenant.objects.create(name="Other", subdomain="other")
+        self.user = CustomUser.objects.create_user(
+            username="admin", password="testpass", tenant=self.tenant, role="admin"
+        )
+        now = timezone.now()
+        patient = Patient.objects.create(
+            first_name="Jane",
+            last_name="Smith",
+            date_of_birth="1985-05-05",
+            tenant=self.tenant,
+        )
+        Patient.objects.create(
+            first_name="Other",
+            last_name="Patient",
+            date_of_birth="1985-05-05",
+            tenant=self.other_tenant,
+        )
+        Appointment.objects.create(
+            patient=patient,
+            scheduled_for=now + timedelta(days=1),
+            status="scheduled",
+            tenant=self.tenant,
+        )
+        Appointment.objects.create(
+            patient=patient,
+            scheduled_for=now - timedelta(days=1),
+            status="completed",
+            tenant=self.tenant,
+        )
+        Payment.objects.create(tenant=self.tenant, patient=patient, amount=100)
+        Payment.objects.create(tenant=self.tenant, patient=patient, amount=50)
+
+    def test_kpis_are_tenant_scoped_and_typed(self):
+        kpis = compute_tenant_kpis(self.tenant)
+        self.assertEqual(kpis.total_patients, 1)
+        self.assertEqual(kpis.new_patients_30d, 1)
+        self.assertEqual(kpis.total_appointments, 2)
+        self.assertEqual(kpis.upcoming_appointments, 1)
+        self.assertEqual(kpis.completed_appointments_30d, 1)
+        self.assertEqual(kpis.active_patients_90d, 1)
+        self.assertEqual(kpis.total_users, 1)
+        self.assertEqual(kpis.admin_count, 1)
+        self.assertEqual(kpis.payment_count, 2)
+        self.assertEqual(kpis.total_revenue, Decimal("150"))
+
+    def test_month_kpis_exclude_later_months(self):
+        now = timezone.make_aware(datetime(2025, 3, 15, 12))
+        patient = Patient.objects.get(tenant=self.tenant)
+        for scheduled_for, status in (
+            (datetime(2025, 3, 10, 9), "completed"),
+            (datetime(2025, 3, 20, 9), "scheduled"),
+            (datetime(2025, 4, 2, 9), "scheduled"),
+            (datetime(2025, 2, 27, 9), "completed"),
+        ):
+            Appointment.objects.create(
+                patient=patient,
+                scheduled_for=timezone.make_aware(scheduled_for),
+                status=status,
+                tenant=self.tenant,
+            )
+        kpis = compute_tenant_kpis(self.tenant, now=now)
+        self.assertEqual(kpis.appointments_this_month, 2)
+        self.assertEqual(kpis.completed_appointments_this_month, 1)
+
+    def test_empty_tenant_uses_defaults(self):
+        kpis = compute_tenant_kpis(self.other_tenant)
+        self.assertEqual(kpis.total_revenue, Decimal("0"))
+        self.assertEqual(kpis.revenue_growth_rate, 0)
+        self.assertEqual(kpis.completion_rate, 0)
+
+    def test_one_query_per_source_table(self):
+        with self.assertNumQueries(len(kpi_sources(timezone.now()))):
+            compute_tenant_kpis(self.tenant)
+        with self.assertNumQueries(1):
+            compute_tenant_kpis(self.tenant, only=["payments"])
+
+    def test_dashboard_query_count_is_fixed(self):
+        self.client.login(username="admin", password="testpass")
+        # session + user + tenant, then one aggregate per KPI source table
+        with self.assertNumQueries(3 + 6):
+            response = self.client.get(reverse("analytics_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Analytics")
+        # Served from the analytics cache afterwards
+        with self.assertNumQueries(3):
+            self.client.get(reverse("analytics_dashboard"))
+
+    def test_analytics_views_render(self):
+        self.client.login(username="admin", password="testpass")
+        for name in (
+            "patient_analytics",
+            "appointment_analytics",
+            "revenue_analytics",
+            "user_activity_analytics",
+            "executive_summary",
+        ):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+
+
+class AnalyticsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+
+    def _add_patient(self):
+        Patient.objects.create(
+            first_name="Jane",
+            last_name="Smith",
+            date_of_birth="1985-05-05",
+            tenant=self.tenant,
+        )
+
+    def test_source_change_bumps_tenant_generation(self):
+        generation = tenant_generation(self.tenant.id)
+        self._add_patient()
+        self.assertGreater(tenant_generation(self.tenant.id), generation)
+
+    def test_stale_entry_served_then_revalidated(self):
+        context = get_cached_context("executive_summary", self.tenant)
+        self.assertEqual(context["total_patients"], 0)
+        self._add_patient()
+        # The stale context is returned while the refresh task (eager in tests) runs
+        stale = get_cached_context("executive_summary", self.tenant)
+        self.assertEqual(stale["total_patients"], 0)
+        with self.assertNumQueries(0):
+            fresh = get_cached_context("executive_summary", self.tenant)
+        self.assertEqual(fresh["total_patients"], 1)
+
+
+class TenantDailyMetricsRollupTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.today = timezone.localdate()
+        self.patient = Patient.objects.create(
+            first_name="Jane",
+            last_name="Smith",
+            date_of_birth="1985-05-05",
+            tenant=self.tenant,
+        )
+        Appointment.objects.create(
+            patient=self.patient,
+            scheduled_for=timezone.now(),
+            status="completed",
+            tenant=self.tenant,
+        )
+        Payment.objects.create(tenant=self.tenant, patient=self.patient, amount=40)
+
+    def test_rebuild_aggregates_each_day(self):
+        written = rebuild_daily_metrics(self.today - timedelta(days=7), self.today)
+        self.assertEqual(written, 1)
+        row = TenantDailyMetrics.objects.get(tenant=self.tenant, date=self.today)
+        self.assertEqual(row.new_patients, 1)
+        self.assertEqual(row.appointments_total, 1)
+        self.assertEqual(row.appointments_completed, 1)
+        self.assertEqual(row.revenue, Decimal("40"))
+
+        series = list(monthly_series(self.tenant, "revenue", self.today))
+        self.assertEqual(series[0]["total"], Decimal("40"))
+
+    def test_incremental_refresh_only_touches_changed_days(self):
+        rebuild_daily_metrics(self.today, self.today)
+        RollupWatermark.objects.create(
+            name="tenant_daily_metrics", processed_until=timezone.now()
+        )
+        Patient.objects.create(
+            first_name="John",
+            last_name="Doe",
+            date_of_birth="1990-01-01",
+            tenant=self.tenant,
+        )
+        refresh_daily_metrics_incremental()
+        row = TenantDailyMetrics.objects.get(tenant=self.tenant, date=self.today)
+        self.assertEqual(row.new_patients, 2)
+        self.assertEqual(row.payment_count, 1)
+
+    def test_incremental_refresh_sees_moves_edits_and_deletes(self):
+        yesterday = self.today - timedelta(days=1)
+        Appointment.objects.create(
+            patient=self.patient,
+            scheduled_for=timezone.now() - timedelta(days=1),
+            tenant=self.tenant,
+        )
+        rebuild_daily_metrics(yesterday, self.today)
+        RollupWatermark.objects.create(
+            name="tenant_daily_metrics", processed_until=timezone.now()
+        )
+
+        moved = Appointment.objects.get(scheduled_for__date=self.today)
+        moved.scheduled_for -= timedelta(days=1)
+        moved.save()
+        payment = Payment.objects.get()
+        payment.amount = 55
+        payment.save()
+        refresh_daily_metrics_incremental()
+        today = TenantDailyMetrics.objects.get(tenant=self.tenant, date=self.today)
+        self.assertEqual((today.appointments_total, today.revenue), (0, Decimal("55")))
+        self.assertEqual(
+            TenantDailyMetrics.objects.get(date=yesterday).appointments_total, 2
+        )
+
+        Appointment.objects.filter(scheduled_for__date=yesterday).delete()
+        refresh_daily_metrics_incremental()
+        self.assertEqual(
+            TenantDailyMetrics.objects.get(date=yesterday).appointments_total, 0
+        )
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+    def test_backfill_command_rebuilds_in_chunks(self):
+        call_command(
+            "backfill_daily_metrics",
+            start=self.today - timedelta(days=10),
+            end=self.today,
+            chunk_days=3,
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            TenantDailyMetrics.objects.filter(tenant=self.tenant).count(), 1
+        )
+        self.assertTrue(
+            RollupWatermark.objects.filter(name="tenant_daily_metrics").exists()
+        )
+
+
+class HistogramTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.today = timezone.localdate()
+        for dob in ("2020-01-01", "1990-06-15", "1991-03-03", "1940-02-02"):
+            Patient.objects.create(
+                first_name="P", last_name="Q", date_of_birth=dob, tenant=self.tenant
+            )
+
+    def test_age_histogram_single_query(self):
+        buckets = age_buckets(
+            [("young", 0, 18), ("adult", 19, 64), ("senior", 65, None)],
+            today=self.today,
+        )
+        with self.assertNumQueries(1):
+            result = histogram(
+                Patient.objects.filter(tenant=self.tenant), "date_of_birth", buckets
+            )
+        self.assertEqual(
+            result,
+            [
+                {"label": "young", "count": 1},
+                {"label": "adult", "count": 2},
+                {"label": "senior", "count": 1},
+            ],
+        )
+
+    def test_weekday_histogram_returns_all_days(self):
+        patient = Patient.objects.first()
+        monday = timezone.now() - timedelta(days=timezone.now().weekday())
+        Appointment.objects.create(
+            patient=patient, scheduled_for=monday, tenant=self.tenant
+        )
+        with self.assertNumQueries(1):
+            result = weekday_histogram(Appointment.objects.all(), "scheduled_for")
+        self.assertEqual(len(result), 7)
+        self.assertEqual(result[0], {"label": "Monday", "count": 1})
+        self.assertEqual(sum(day["count"] for day in result), 1)
@@ -0,0 +1,132 @@
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from django.test import TestCase
+
+from appointments.models import Appointment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+from .v1.views import StandardResultsSetPagination
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        for i in range(5):
+            Patient.objects.create(
+                first_name=f"P{i}",
+                last_name="Doe",
+                date_of_birth="1990-01-01",
+                tenant=self.tenant,
+            )
+        self.factory = APIRequestFactory()
+
+    def _page(self, url):
+        paginator = StandardResultsSetPagination()
+        request = Request(self.factory.get(url))
+        page = paginator.paginate_queryset(
+            Patient.objects.order_by("-created_at"), request
+        )
+        return page, paginator.get_paginated_response([p.pk for p in page]).data
+
+    def test_cursor_walks_every_row_once_without_count(self):
+        seen = []
+        url = "/api/v1/patients/?cursor=&page_size=2"
+        while url:
+            with self.assertNumQueries(1):
+                page, data = self._page(url)
+            self.assertNotIn("count", data)
+            seen.extend(data["results"])
+            url = data["next"]
+        expected = list(
+            Patient.objects.order_by("-created_at", "-id").values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_page_number_mode_is_default(self):
+        page, data = self._page("/api/v1/patients/?page_size=2")
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(len(data["results"]), 2)
+
+
+class ConditionalRetrieveTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.user = CustomUser.objects.create_user(
+            username="poller", password="pw", tenant=self.tenant
+        )
+        self.patient = Patient.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth="1815-12-10",
+            tenant=self.tenant,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/v1/patients/{self.patient.pk}/"
+
+    def test_unchanged_patient_returns_304_from_one_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.patient.phone = "555-0000"
+        self.patient.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_other_detail_routes_answer_200_then_304(self):
+        routes = {
+            "appointments": Appointment.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                scheduled_for="2025-03-10T09:00:00Z",
+            ),
+            "clinical-records": ClinicalRecord.objects.create(
+                tenant=self.tenant, patient=self.patient, note="Follow-up"
+            ),
+            "lab-results": LabResult.objects.create(
+                tenant=self.tenant, patient=self.patient, result="Normal"
+            ),
+        }
+        for route, obj in routes.items():
+            with self.subTest(route=route):
+                url = f"/api/v1/{route}/{obj.pk}/"
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["id"], obj.pk)
+                self.assertEqual(response.data["patient_name"], "Ada Lovelace")
+
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304)
+
+    def test_patient_changes_invalidate_nested_routes(self):
+        appointment = Appointment.objects.create(
+            tenant=self.tenant,
+            patient=self.patient,
+            scheduled_for="2025-03-10T09:00:00Z",
+        )
+        url = f"/api/v1/appointments/{appointment.pk}/"
+        etag = self.client.get(url)["ETag"]
+
+        self.patient.last_name = "King"
+        self.patient.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["patient_name"], "Ada King")
+        self.assertNotEqual(response["ETag"], etag)
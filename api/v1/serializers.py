@@ -29,10 +29,8 @@ class PatientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Patient
         fields = [
-            'id', 'full_name', 'date_of_birth', 'gender', 
-            'email', 'phone', 'address', 'city', 'state', 
-            'zip_code', 'insurance_provider', 'insurance_id',
-            'medical_record_number', 'is_active', 'created_at', 'updated_at'
+            'id', 'full_name', 'first_name', 'last_name', 'date_of_birth',
+            'gender', 'email', 'phone', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
@@ -42,44 +40,44 @@ class PatientSerializer(serializers.ModelSerializer):
 
 class AppointmentSerializer(serializers.ModelSerializer):
     """Appointment serializer"""
-    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
-    provider_name = serializers.CharField(source='provider.get_full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient', read_only=True)
     
     class Meta:
         model = Appointment
         fields = [
-            'id', 'patient', 'patient_name', 'provider', 'provider_name',
-            'appointment_date', 'appointment_time', 'duration_minutes',
-            'appointment_type', 'status', 'notes', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'scheduled_for', 'status',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
 class ClinicalRecordSerializer(serializers.ModelSerializer):
     """Clinical Record (SOAP notes) serializer"""
-    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
-    provider_name = serializers.CharField(source='provider.get_full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient', read_only=True)
     
     class Meta:
         model = ClinicalRecord
         fields = [
-            'id', 'patient', 'patient_name', 'provider', 'provider_name',
-            'visit_date', 'subjective', 'objective', 'assessment', 'plan',
-            'is_locked', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'note_type', 'note',
+            'chief_complaint', 'history_of_present_illness',
+            'past_medical_history', 'medications_history', 'allergy_history',
+            'physical_exam_inspection', 'physical_exam_palpation',
+            'physical_exam_percussion', 'physical_exam_auscultation',
+            'provisional_diagnosis', 'investigations_ordered',
+            'investigation_results', 'assessment_diagnosis', 'plan',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
 class LabResultSerializer(serializers.ModelSerializer):
     """Lab Result serializer"""
-    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient', read_only=True)
     
     class Meta:
         model = LabResult
         fields = [
-            'id', 'patient', 'patient_name', 'test_name', 'test_code',
-            'result_value', 'result_unit', 'reference_range', 'status',
-            'lab_date', 'result_date', 'notes', 'created_at', 'updated_at'
+            'id', 'patient', 'patient_name', 'result', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -3,31 +3,170 @@ API ViewSets for CRUD operations
 Implements proper filtering, pagination, and permissions
 """
 
+import base64
+import binascii
+import json
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.utils.urls import replace_query_param
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 from django.db.models import Q
 
 from patients.models import Patient
+from patients.search import search_patients
 from appointments.models import Appointment
 from clinical_records.models import ClinicalRecord
 from labs.models import LabResult
 from users.models import CustomUser
 from common.audit import log_audit
+from common.conditional import not_modified_response, set_validators
 from .serializers import (
     PatientSerializer, AppointmentSerializer, ClinicalRecordSerializer,
     LabResultSerializer, UserSerializer, DashboardStatsSerializer
 )
 
 
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on a stable (created_at, id) ordering.
+    Each page is a `WHERE (created_at, id) < cursor ... LIMIT n` range read,
+    so its cost does not grow with depth, and no COUNT query is issued.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        payload = json.dumps({'t': obj.created_at.isoformat(), 'id': obj.pk})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(payload['t'])
+            pk = int(payload['id'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
 class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default; passing `?cursor=` (empty for the first
+    page) switches to KeysetPagination for deep, count-free traversal.
+    """
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class PatientSearchFilter(SearchFilter):
+    """
+    SearchFilter backed by the patient search index (patients.search).
+    Results are ranked by relevance unless `?ordering=` is given explicitly.
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        ranked = search_patients(queryset, query)
+        if request.query_params.get(OrderingFilter.ordering_param):
+            return ranked.order_by(*queryset.query.order_by)
+        return ranked
+
+
+class ConditionalRetrieveMixin:
+    """
+    Detail GETs carry ETag/Last-Modified derived from `updated_at` and answer
+    If-None-Match / If-Modified-Since with 304 after a single
+    `values('updated_at')` lookup, before the object is loaded or serialized.
+    Views that serialize related rows list their `updated_at` too, and the
+    newest of them versions the response.
+    """
+    validator_fields = ('updated_at',)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        versions = (
+            self.get_queryset()
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .order_by()
+            .values_list(*self.validator_fields)
+            .first()
+        )
+        if versions is None:
+            return super().retrieve(request, *args, **kwargs)
+        updated_at = max(versions)
+        not_modified = not_modified_response(request, updated_at)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, updated_at)
 
 
 class IsAuthenticatedAndTenantOwner(permissions.BasePermission):
@@ -37,7 +176,7 @@ class IsAuthenticatedAndTenantOwner(permissions.BasePermission):
         return getattr(obj, 'tenant_id', None) == request.user.tenant_id
 
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """
     ViewSet for Patient CRUD operations
     - List all patients (with search, filter, sort)
@@ -48,8 +187,9 @@ class PatientViewSet(viewsets.ModelViewSet):
     """
     serializer_class = PatientSerializer
     pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
+    # Ordering runs first so an explicit ?ordering= survives the ranked search
+    filter_backends = [OrderingFilter, PatientSearchFilter]
+    search_fields = ['search_text']
     ordering_fields = ['created_at', 'first_name']
     ordering = ['-created_at']
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
@@ -87,7 +227,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         appointments = Appointment.objects.filter(
             patient=patient,
             tenant=request.user.tenant
-        ).order_by('-appointment_date')
+        ).order_by('-scheduled_for')
         serializer = AppointmentSerializer(appointments, many=True)
         return Response(serializer.data)
     
@@ -98,12 +238,12 @@ class PatientViewSet(viewsets.ModelViewSet):
         records = ClinicalRecord.objects.filter(
             patient=patient,
             tenant=request.user.tenant
-        ).order_by('-visit_date')
+        ).order_by('-created_at')
         serializer = ClinicalRecordSerializer(records, many=True)
         return Response(serializer.data)
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """
     ViewSet for Appointment scheduling
     - List appointments with filtering by date, status
@@ -114,10 +254,12 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'appointment_type']
-    ordering_fields = ['appointment_date', 'appointment_time']
-    ordering = ['appointment_date', 'appointment_time']
+    search_fields = ['patient__first_name', 'patient__last_name', 'status']
+    ordering_fields = ['scheduled_for', 'created_at']
+    ordering = ['-scheduled_for']
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
+    # patient_name is serialized alongside the row.
+    validator_fields = ('updated_at', 'patient__updated_at')
     
     def get_queryset(self):
         """Filter appointments by tenant"""
@@ -128,8 +270,8 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         date_to = self.request.query_params.get('date_to')
         if date_from and date_to:
             queryset = queryset.filter(
-                appointment_date__gte=date_from,
-                appointment_date__lte=date_to
+                scheduled_for__date__gte=date_from,
+                scheduled_for__date__lte=date_to
             )
         
         # Filter by status
@@ -137,7 +279,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset.order_by('-appointment_date')
+        return queryset.order_by('-scheduled_for')
     
     def perform_create(self, serializer):
         """Create appointment with conflict detection"""
@@ -147,7 +289,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             action='CREATE',
             model='Appointment',
             object_id=appointment.id,
-            changes={'created': f'Appointment scheduled for {appointment.appointment_date}'}
+            changes={'created': f'Appointment scheduled for {appointment.scheduled_for}'}
         )
     
     @action(detail=False, methods=['get'])
@@ -155,8 +297,8 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         """Get today's appointments"""
         today = timezone.now().date()
         appointments = self.get_queryset().filter(
-            appointment_date=today
-        ).order_by('appointment_time')
+            scheduled_for__date=today
+        ).order_by('scheduled_for')
         serializer = self.get_serializer(appointments, many=True)
         return Response(serializer.data)
     
@@ -166,15 +308,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
         upcoming_date = today + timedelta(days=7)
         appointments = self.get_queryset().filter(
-            appointment_date__gte=today,
-            appointment_date__lte=upcoming_date,
+            scheduled_for__date__gte=today,
+            scheduled_for__date__lte=upcoming_date,
             status__in=['scheduled', 'confirmed']
-        ).order_by('appointment_date')
+        ).order_by('scheduled_for')
         serializer = self.get_serializer(appointments, many=True)
         return Response(serializer.data)
 
 
-class ClinicalRecordViewSet(viewsets.ModelViewSet):
+class ClinicalRecordViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """
     ViewSet for Clinical Records (SOAP notes)
     - List records with filtering
@@ -185,14 +327,16 @@ class ClinicalRecordViewSet(viewsets.ModelViewSet):
     serializer_class = ClinicalRecordSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'assessment']
-    ordering_fields = ['visit_date', 'created_at']
-    ordering = ['-visit_date']
+    search_fields = ['patient__first_name', 'patient__last_name', 'assessment_diagnosis']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
+    # patient_name is serialized alongside the row.
+    validator_fields = ('updated_at', 'patient__updated_at')
     
     def get_queryset(self):
         """Filter records by tenant"""
-        return ClinicalRecord.objects.filter(tenant=self.request.user.tenant).order_by('-visit_date')
+        return ClinicalRecord.objects.filter(tenant=self.request.user.tenant).order_by('-created_at')
     
     def perform_create(self, serializer):
         """Create clinical record"""
@@ -234,7 +378,7 @@ class ClinicalRecordViewSet(viewsets.ModelViewSet):
         return Response({'status': 'Record locked'})
 
 
-class LabResultViewSet(viewsets.ModelViewSet):
+class LabResultViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """
     ViewSet for Lab Results
     - List lab results with filtering
@@ -243,14 +387,16 @@ class LabResultViewSet(viewsets.ModelViewSet):
     serializer_class = LabResultSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['patient__first_name', 'patient__last_name', 'test_name']
-    ordering_fields = ['lab_date', 'result_date']
-    ordering = ['-result_date']
+    search_fields = ['patient__first_name', 'patient__last_name', 'result']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     permission_classes = [permissions.IsAuthenticated, IsAuthenticatedAndTenantOwner]
+    # patient_name is serialized alongside the row.
+    validator_fields = ('updated_at', 'patient__updated_at')
     
     def get_queryset(self):
         """Filter results by tenant"""
-        return LabResult.objects.filter(tenant=self.request.user.tenant).order_by('-result_date')
+        return LabResult.objects.filter(tenant=self.request.user.tenant).order_by('-created_at')
     
     def perform_create(self, serializer):
         """Create lab result"""
@@ -278,7 +424,7 @@ class DashboardViewSet(viewsets.ViewSet):
             'total_patients': Patient.objects.filter(tenant=tenant).count(),
             'appointments_today': Appointment.objects.filter(
                 tenant=tenant,
-                appointment_date=today
+                scheduled_for__date=today
             ).count(),
             'pending_appointments': Appointment.objects.filter(
                 tenant=tenant,
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("appointments", "0003_alter_appointment_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["tenant", "scheduled_for", "status"],
+                name="appointment_tenant__a35829_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["tenant", "patient", "scheduled_for"],
+                name="appointment_tenant__ea4af8_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["tenant", "created_at"], name="appointment_tenant__b7b4b9_idx"
+            ),
+        ),
+    ]
@@ -18,6 +18,13 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "scheduled_for", "status"]),
+            models.Index(fields=["tenant", "patient", "scheduled_for"]),
+            models.Index(fields=["tenant", "created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.patient} @ {self.scheduled_for}"
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audit_logs", "0003_alter_auditlog_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["tenant", "timestamp"], name="audit_logs__tenant__fd98ef_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audit_logs", "0004_auditlog_audit_logs__tenant__fd98ef_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auditlog",
+            name="timestamp",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
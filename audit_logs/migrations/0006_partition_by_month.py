@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:21
+
+from django.db import migrations
+
+from common.partitions import convert_to_partitioned
+
+
+def partition_table(apps, schema_editor):
+    # Monthly range partitions on PostgreSQL; a no-op on other backends.
+    convert_to_partitioned(schema_editor, "audit_logs_auditlog", "timestamp")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("audit_logs", "0005_auditlog_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from tenants.models import Tenant
 from users.models import CustomUser
@@ -12,7 +13,8 @@ class AuditLog(models.Model):
         ("login_success", "Login Success"),
         # Add more as needed
     ]
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the action happens, not when a buffered writer inserts the row.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     user = models.ForeignKey(
         CustomUser, null=True, blank=True, on_delete=models.SET_NULL
     )
@@ -20,5 +22,10 @@ class AuditLog(models.Model):
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
     details = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "timestamp"]),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.action} by {self.user} ({self.tenant})"
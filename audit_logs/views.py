@@ -1,23 +1,54 @@
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from django.shortcuts import render
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.utils.dateparse import parse_datetime
 
 from audit_logs.models import AuditLog
+from common.partitions import archive_cutoff
 from common.tenant_scope import scope_queryset
 
+PAGE_SIZE = 10
+
+
+def _parse_cursor(value):
+    """Decode ``<iso timestamp>_<id>`` from the ``before`` query parameter."""
+    timestamp, _, pk = (value or "").rpartition("_")
+    moment = parse_datetime(timestamp)
+    if moment is None or not pk.isdigit():
+        return None
+    return moment, int(pk)
+
 
 @login_required
 def audit_log_list(request):
-    logs = scope_queryset(AuditLog.objects.all(), request.user).order_by("-timestamp")
-    
-    # Pagination
-    paginator = Paginator(logs, 10)  # 10 logs per page
-    page = request.GET.get('page')
-    try:
-        logs = paginator.page(page)
-    except PageNotAnInteger:
-        logs = paginator.page(1)
-    except EmptyPage:
-        logs = paginator.page(paginator.num_pages)
-    
-    return render(request, "audit_logs/list.html", {"logs": logs})
+    # Months before the archive cutoff have been (or are about to be) moved
+    # out of the table by common.partitions; bounding the scan there keeps
+    # PostgreSQL to the live partitions.
+    since = archive_cutoff()
+    logs = scope_queryset(
+        AuditLog.objects.select_related("user", "tenant").filter(timestamp__gte=since),
+        request.user,
+    ).order_by("-timestamp", "-id")
+
+    # Keyset pagination: no COUNT and no OFFSET over the whole table.
+    cursor = _parse_cursor(request.GET.get("before"))
+    if cursor:
+        moment, pk = cursor
+        logs = logs.filter(Q(timestamp__lt=moment) | Q(timestamp=moment, id__lt=pk))
+    rows = list(logs[: PAGE_SIZE + 1])
+    page, has_more = rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = f"{last.timestamp.isoformat()}_{last.pk}"
+
+    return render(
+        request,
+        "audit_logs/list.html",
+        {
+            "logs": page,
+            "next_cursor": next_cursor,
+            "is_first_page": cursor is None,
+            "since": since,
+        },
+    )
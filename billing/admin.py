@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from .invoices import allocate_invoice_numbers, save_line_items
 from .models import Payment, SubscriptionPlan, TenantSubscription, PatientInvoice, InvoiceLineItem
 
 
@@ -43,7 +44,7 @@ class PatientInvoiceAdmin(admin.ModelAdmin):
     list_display = ("invoice_number", "patient", "issued_date", "due_date", "status", "total")
     list_filter = ("status", "issued_date", "currency")
     search_fields = ("invoice_number", "patient__first_name", "patient__last_name")
-    readonly_fields = ("created_at", "updated_at", "subtotal", "total")
+    readonly_fields = ("invoice_number", "issued_date", "created_at", "updated_at", "subtotal", "total")
     inlines = [InvoiceLineItemInline]
     fields = (
         "invoice_number",
@@ -61,3 +62,15 @@ class PatientInvoiceAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     )
+
+    def save_model(self, request, obj, form, change):
+        if not obj.invoice_number:
+            obj.invoice_number = allocate_invoice_numbers(obj.tenant)[0]
+        super().save_model(request, obj, form, change)
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not InvoiceLineItem:
+            return super().save_formset(request, form, formset, change)
+        # One bulk insert/update and one totals update for all line items.
+        line_items = formset.save(commit=False)
+        save_line_items(form.instance, line_items, deleted=formset.deleted_objects)
@@ -1,9 +1,12 @@
+import uuid
+from collections import defaultdict
 from datetime import timedelta
 
-from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 
+from billing.models import TrialNotice
+from common.outbox import enqueue_email
 from patients.models import Patient
 from tenants.models import Tenant
 from users.models import CustomUser
@@ -11,6 +14,7 @@ from users.models import CustomUser
 FREE_TRIAL_DAYS = 90
 MAX_FREE_USERS = 2
 MAX_FREE_PATIENTS = 5
+TRIAL_NOTICE_ROLES = ["admin", "owner"]
 
 
 def is_tenant_in_free_trial(tenant):
@@ -30,8 +34,21 @@ def is_free_patient_limit_reached(tenant):
     return Patient.objects.filter(tenant=tenant).count() >= MAX_FREE_PATIENTS
 
 
-def send_trial_expiry_notification(tenant):
-    admin_users = CustomUser.objects.filter(tenant=tenant, role__in=["admin", "owner"])
+def trial_expiring_tenants(max_days_left, min_days_left=1, now=None):
+    """
+    Free-trial tenants with ``min_days_left``..``max_days_left`` days left (as
+    ``free_trial_days_left`` counts them), as a single ``created_at`` range.
+    """
+    now = now or timezone.now()
+    return Tenant.objects.filter(
+        plan="free_trial",
+        created_at__gt=now - timedelta(days=FREE_TRIAL_DAYS + 1 - min_days_left),
+        created_at__lte=now - timedelta(days=FREE_TRIAL_DAYS - max_days_left),
+    )
+
+
+def trial_expiry_email(tenant):
+    """Subject and body of the expiry warning for ``tenant``."""
     days_left = free_trial_days_left(tenant)
     subject = f"ClinicCloud Free Trial Expiry Warning"
     message = (
@@ -39,5 +56,57 @@ def send_trial_expiry_notification(tenant):
         f"Upgrade soon to avoid loss of data and service interruption. "
         f"Limits: max {MAX_FREE_USERS} users, {MAX_FREE_PATIENTS} patients."
     )
-    for admin in admin_users:
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [admin.email])
+    return subject, message
+
+
+def _admin_emails(tenant_ids):
+    emails = defaultdict(list)
+    admins = (
+        CustomUser.objects.filter(tenant_id__in=tenant_ids, role__in=TRIAL_NOTICE_ROLES)
+        .exclude(email="")
+        .values_list("tenant_id", "email")
+    )
+    for tenant_id, email in admins:
+        emails[tenant_id].append(email)
+    return emails
+
+
+def send_trial_expiry_notification(tenant):
+    subject, body = trial_expiry_email(tenant)
+    enqueue_email(subject, body, _admin_emails([tenant.pk])[tenant.pk])
+
+
+def send_trial_notices(kind, period, tenant_ids):
+    """
+    Queue the ``kind`` trial notice for ``period`` to the admins of
+    ``tenant_ids``. Each tenant's unique TrialNotice row is created in the same
+    transaction as its outbox messages, so tenants already notified (or being
+    notified by another worker) are skipped and a retried batch queues nothing
+    twice. Returns the number of tenants notified.
+    """
+    claim = uuid.uuid4()
+    with transaction.atomic():
+        TrialNotice.objects.bulk_create(
+            [
+                TrialNotice(
+                    tenant_id=tenant_id,
+                    kind=kind,
+                    period=period,
+                    claim=claim,
+                    sent_at=timezone.now(),
+                )
+                for tenant_id in tenant_ids
+            ],
+            ignore_conflicts=True,
+        )
+        claimed = TrialNotice.objects.filter(kind=kind, period=period, claim=claim)
+        tenants = list(
+            Tenant.objects.filter(pk__in=claimed.values("tenant_id")).only(
+                "id", "name", "created_at"
+            )
+        )
+        recipients = _admin_emails([tenant.pk for tenant in tenants])
+        for tenant in tenants:
+            subject, body = trial_expiry_email(tenant)
+            enqueue_email(subject, body, recipients[tenant.pk])
+    return len(tenants)
@@ -0,0 +1,199 @@
+"""
+Invoice PDFs, rendered by Celery and cached on disk by content.
+``invoice_content`` collects everything printed on the PDF; its SHA-256 names
+the file (INVOICE_PDF_ROOT/<tenant id>/<digest>.pdf), so an invoice is only
+re-rendered when what it shows changes, and the digest doubles as the
+download's ETag. Nothing is rendered inside a web request.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from django.conf import settings
+from django.utils import timezone
+
+from billing.models import PatientInvoice
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so every PDF is rendered again.
+PDF_LAYOUT_VERSION = 1
+# Invoices that are rendered as soon as they are saved.
+FINAL_STATUSES = ("sent", "overdue", "paid")
+
+
+def pdf_root():
+    return Path(
+        getattr(
+            settings, "INVOICE_PDF_ROOT", Path(settings.BASE_DIR) / "var" / "invoices"
+        )
+    )
+
+
+def invoice_content(invoice, items=None):
+    """Everything the PDF shows, as JSON-serializable values."""
+    if items is None:
+        items = invoice.items.all()
+    patient = invoice.patient
+    return {
+        "layout": PDF_LAYOUT_VERSION,
+        "tenant": invoice.tenant.name,
+        "number": invoice.invoice_number,
+        "status": invoice.get_status_display(),
+        "issued": str(invoice.issued_date),
+        "due": str(invoice.due_date),
+        "paid": str(invoice.paid_date) if invoice.paid_date else "",
+        "patient": f"{patient.first_name} {patient.last_name}",
+        "items": [
+            [
+                item.description,
+                item.get_service_type_display(),
+                str(item.quantity),
+                str(item.unit_price),
+                str(item.total),
+            ]
+            for item in sorted(items, key=lambda item: item.pk)
+        ],
+        "subtotal": str(invoice.subtotal),
+        "tax": str(invoice.tax),
+        "total": str(invoice.total),
+        "notes": invoice.notes,
+    }
+
+
+def content_digest(content):
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def invoice_digest(invoice):
+    return content_digest(invoice_content(invoice))
+
+
+def pdf_path(invoice, digest):
+    return pdf_root() / str(invoice.tenant_id) / f"{digest}.pdf"
+
+
+def write_pdf(fh, content):
+    """Lay out ``content`` (see invoice_content) as an A4 PDF into ``fh``."""
+    styles = getSampleStyleSheet()
+    cell = styles["BodyText"]
+    doc = SimpleDocTemplate(
+        fh,
+        pagesize=A4,
+        title=f"Invoice {content['number']}",
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+    )
+    details = [
+        f"<b>Patient:</b> {escape(content['patient'])}",
+        f"<b>Issued:</b> {content['issued']}",
+        f"<b>Due:</b> {content['due']}",
+        f"<b>Status:</b> {escape(content['status'])}",
+    ]
+    if content["paid"]:
+        details.append(f"<b>Paid:</b> {content['paid']}")
+    story = [
+        Paragraph(escape(content["tenant"]), styles["Title"]),
+        Paragraph(f"Invoice {escape(content['number'])}", styles["Heading2"]),
+        *(Paragraph(line, cell) for line in details),
+        Spacer(1, 8 * mm),
+    ]
+
+    rows = [["Description", "Type", "Qty", "Unit price", "Total"]]
+    for description, service_type, quantity, unit_price, total in content["items"]:
+        rows.append(
+            [
+                Paragraph(escape(description), cell),
+                service_type,
+                quantity,
+                f"£{unit_price}",
+                f"£{total}",
+            ]
+        )
+    for label, value in (
+        ("Subtotal", content["subtotal"]),
+        ("Tax", content["tax"]),
+        ("Total", content["total"]),
+    ):
+        rows.append(["", "", "", label, f"£{value}"])
+    table = Table(
+        rows, colWidths=[70 * mm, 30 * mm, 15 * mm, 30 * mm, 29 * mm], repeatRows=1
+    )
+    table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e5e7eb")),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTNAME", (3, -1), (-1, -1), "Helvetica-Bold"),
+                ("ALIGN", (2, 0), (-1, -1), "RIGHT"),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                ("LINEBELOW", (0, 0), (-1, -4), 0.25, colors.HexColor("#cbd5e1")),
+            ]
+        )
+    )
+    story.append(table)
+    if content["notes"]:
+        story += [
+            Spacer(1, 8 * mm),
+            Paragraph("Notes", styles["Heading4"]),
+            Paragraph(escape(content["notes"]).replace("\n", "<br/>"), cell),
+        ]
+    doc.build(story)
+
+
+def ensure_pdf(invoice, items=None):
+    """
+    Make sure the PDF for ``invoice``'s current content exists, rendering it
+    if needed; returns ``(path, rendered)``. The previous file is removed
+    when the content changed.
+    """
+    content = invoice_content(invoice, items)
+    digest = content_digest(content)
+    path = pdf_path(invoice, digest)
+    rendered = False
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Render next to the target and rename, so readers never see half a file.
+        partial = path.with_name(f".{digest}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(partial, "wb") as fh:
+                write_pdf(fh, content)
+            os.replace(partial, path)
+        finally:
+            partial.unlink(missing_ok=True)
+        rendered = True
+    if invoice.pdf_sha256 != digest:
+        # update() skips the post_save hook that queued this render.
+        PatientInvoice.objects.filter(pk=invoice.pk).update(
+            pdf_sha256=digest, pdf_rendered_at=timezone.now()
+        )
+        if invoice.pdf_sha256:
+            pdf_path(invoice, invoice.pdf_sha256).unlink(missing_ok=True)
+        invoice.pdf_sha256 = digest
+    return path, rendered
+
+
+def render_invoices(invoice_ids):
+    """Ensure the PDFs of ``invoice_ids``; returns rendered/unchanged counts."""
+    invoices = (
+        PatientInvoice.objects.filter(pk__in=invoice_ids)
+        .select_related("tenant", "patient")
+        .prefetch_related("items")
+    )
+    result = {"rendered": 0, "unchanged": 0}
+    for invoice in invoices:
+        _, rendered = ensure_pdf(invoice)
+        result["rendered" if rendered else "unchanged"] += 1
+    return result
@@ -0,0 +1,178 @@
+"""
+Invoice builder: create an invoice and its line items in one transaction,
+inserting the items with a single ``bulk_create`` and recalculating the
+invoice totals with one ``Sum`` aggregate instead of once per item.
+Invoice numbers come from each tenant's InvoiceSequence. Also the
+set-based overdue sweep and its reminder emails.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from billing.ledger import refresh_balances
+from billing.models import InvoiceLineItem, InvoiceSequence, PatientInvoice
+from common.outbox import enqueue_email
+
+TRAILING_DIGITS = re.compile(r"\d+$")
+
+
+def _first_sequence_value(tenant):
+    """The value after the highest numeric suffix among the tenant's invoices."""
+    highest = 0
+    numbers = PatientInvoice.objects.filter(tenant=tenant).values_list(
+        "invoice_number", flat=True
+    )
+    for number in numbers.iterator():
+        match = TRAILING_DIGITS.search(number)
+        if match:
+            highest = max(highest, int(match.group()))
+    return highest + 1
+
+
+def _take_invoice_numbers(tenant, count):
+    sequence, _ = InvoiceSequence.objects.get_or_create(
+        tenant=tenant, defaults={"next_value": _first_sequence_value(tenant)}
+    )
+    number_format = sequence.number_format or settings.INVOICE_NUMBER_FORMAT
+    year = timezone.localdate().year
+    numbers = []
+    while len(numbers) < count:
+        wanted = count - len(numbers)
+        InvoiceSequence.objects.filter(pk=sequence.pk).update(
+            next_value=F("next_value") + wanted
+        )
+        sequence.refresh_from_db(fields=["next_value"])
+        start = sequence.next_value - wanted
+        candidates = [
+            number_format.format(number=number, year=year, tenant=tenant.subdomain)
+            for number in range(start, start + wanted)
+        ]
+        # Numbers typed in before sequences existed may already be in use.
+        taken = set(
+            PatientInvoice.objects.filter(
+                tenant=tenant, invoice_number__in=candidates
+            ).values_list("invoice_number", flat=True)
+        )
+        numbers += [number for number in candidates if number not in taken]
+    return numbers
+
+
+def allocate_invoice_numbers(tenant, count=1):
+    """
+    Take the next ``count`` invoice numbers for ``tenant`` and return them
+    formatted. Must run inside the transaction that creates the invoices:
+    the sequence row stays locked until it commits and a rollback hands the
+    numbers back.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise transaction.TransactionManagementError(
+            "Invoice numbers must be allocated inside a transaction."
+        )
+    return _take_invoice_numbers(tenant, count)
+
+
+def reserve_invoice_numbers(tenant, count):
+    """
+    Reserve a block of ``count`` numbers for a bulk job in a transaction of
+    its own, so the sequence row is only locked for the reservation and not
+    for the whole job. Reserved numbers are not handed back: a job should
+    retry failed invoices with the numbers it reserved, or leave gaps.
+    """
+    if transaction.get_connection().in_atomic_block:
+        raise transaction.TransactionManagementError(
+            "Invoice number blocks must be reserved outside a transaction."
+        )
+    with transaction.atomic():
+        return _take_invoice_numbers(tenant, count)
+
+
+def save_line_items(invoice, line_items, deleted=()):
+    """
+    Save ``line_items`` (new or changed InvoiceLineItem instances) and delete
+    ``deleted`` ones for ``invoice``, then update its totals once.
+    """
+    new, changed = [], []
+    for item in line_items:
+        item.invoice = invoice
+        item.calculate_total()
+        (changed if item.pk else new).append(item)
+    with transaction.atomic():
+        if deleted:
+            InvoiceLineItem.objects.filter(
+                invoice=invoice, pk__in=[item.pk for item in deleted]
+            ).delete()
+        InvoiceLineItem.objects.bulk_create(new)
+        InvoiceLineItem.objects.bulk_update(
+            changed, ["description", "service_type", "quantity", "unit_price", "total"]
+        )
+        invoice.update_totals()
+    return new + changed
+
+
+def create_invoice(tenant, patient, line_items=(), **fields):
+    """
+    Create a PatientInvoice with ``line_items`` (dicts of InvoiceLineItem
+    fields) and correct totals, all or nothing. Without an
+    ``invoice_number`` the tenant's next number is allocated.
+    """
+    with transaction.atomic():
+        if not fields.get("invoice_number"):
+            fields["invoice_number"] = allocate_invoice_numbers(tenant)[0]
+        invoice = PatientInvoice.objects.create(
+            tenant=tenant, patient=patient, **fields
+        )
+        save_line_items(invoice, [InvoiceLineItem(**item) for item in line_items])
+    return invoice
+
+
+def mark_overdue(tenant_ids, today=None):
+    """
+    Move ``tenant_ids``' sent invoices due before ``today`` to overdue with a
+    single UPDATE, refresh the affected balances and return the flipped
+    invoices as ``(pk, tenant_id)`` pairs.
+    """
+    today = today or timezone.localdate()
+    # The exact timestamp tags this sweep's rows, so they can be read back
+    # without shipping their ids into the UPDATE.
+    swept_at = timezone.now()
+    with transaction.atomic():
+        count = PatientInvoice.objects.filter(
+            tenant_id__in=tenant_ids, status="sent", due_date__lt=today
+        ).update(status="overdue", updated_at=swept_at)
+        if not count:
+            return []
+        swept = PatientInvoice.objects.filter(
+            tenant_id__in=tenant_ids, status="overdue", updated_at=swept_at
+        )
+        refresh_balances(swept.values("patient_id"))
+        return list(swept.order_by("pk").values_list("pk", "tenant_id"))
+
+
+def queue_overdue_reminders(invoice_ids):
+    """Queue a reminder email for each still-overdue invoice in ``invoice_ids``."""
+    invoices = (
+        PatientInvoice.objects.filter(pk__in=invoice_ids, status="overdue")
+        .exclude(patient__email__isnull=True)
+        .exclude(patient__email="")
+        .select_related("patient", "tenant")
+    )
+    queued = 0
+    with transaction.atomic():
+        for invoice in invoices:
+            subject = f"[ClinicCloud] Invoice {invoice.invoice_number} is overdue"
+            body = (
+                f"Dear {invoice.patient.first_name} {invoice.patient.last_name},\n\n"
+                f"Invoice {invoice.invoice_number} from {invoice.tenant.name} for "
+                f"£{invoice.total} was due on {invoice.due_date:%B %d, %Y} and is "
+                f"now overdue.\n\n"
+                f"If you have already paid, please ignore this message. Otherwise, "
+                f"please contact {invoice.tenant.name} to settle your balance.\n\n"
+                f"Best regards,\n"
+                f"{invoice.tenant.name}"
+            )
+            enqueue_email(subject, body, [invoice.patient.email])
+            queued += 1
+    return queued
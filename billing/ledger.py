@@ -0,0 +1,168 @@
+"""
+Patient balances: bulk reconciliation and receivables reports.
+``reconcile_balances`` recomputes every patient's PatientBalance with two
+grouped aggregates per tenant, rewrites the rows that drifted and reports
+them. The report helpers only read PatientBalance rows, through the partial
+index on owing patients.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, Sum, Value, When
+from django.utils import timezone
+
+from billing.models import PatientBalance, PatientInvoice, Payment
+from tenants.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+# (label, days past due of the oldest open invoice: lower bound, upper bound)
+AGING_BUCKETS = [
+    ("Current", None, 0),
+    ("1-30 days", 1, 30),
+    ("31-60 days", 31, 60),
+    ("61-90 days", 61, 90),
+    ("Over 90 days", 91, None),
+]
+
+
+def expected_balances(tenant_id=None, patients=None):
+    """
+    PatientBalance instances computed from invoices and payments, for one
+    tenant and/or ``patients`` (patient ids or a subquery), keyed by patient.
+    """
+    balances = {}
+    invoices = PatientInvoice.objects.order_by()
+    payments = Payment.objects.filter(patient__isnull=False).order_by()
+    if tenant_id is not None:
+        invoices = invoices.filter(tenant_id=tenant_id)
+        payments = payments.filter(tenant_id=tenant_id)
+    if patients is not None:
+        invoices = invoices.filter(patient_id__in=patients)
+        payments = payments.filter(patient_id__in=patients)
+
+    for rows in (
+        invoices.values("tenant_id", "patient_id").annotate(
+            **PatientBalance.invoice_totals()
+        ),
+        payments.values("tenant_id", "patient_id").annotate(
+            **PatientBalance.payment_totals()
+        ),
+    ):
+        for row in rows:
+            tenant_id, patient_id = row.pop("tenant_id"), row.pop("patient_id")
+            if patient_id not in balances:
+                balances[patient_id] = PatientBalance(
+                    tenant_id=tenant_id, patient_id=patient_id
+                )
+            for field, value in row.items():
+                setattr(balances[patient_id], field, value)
+    return balances
+
+
+def refresh_balances(patients):
+    """
+    Rewrite the balances of ``patients`` (patient ids or a subquery) after a
+    bulk change that bypassed the model signals.
+    """
+    with transaction.atomic():
+        list(PatientBalance.objects.select_for_update().filter(patient_id__in=patients))
+        balances = list(expected_balances(patients=patients).values())
+        PatientBalance.upsert(balances)
+    return len(balances)
+
+
+def _values(balance):
+    return tuple(getattr(balance, field) for field in PatientBalance.FIELDS)
+
+
+def reconcile_tenant(tenant_id, fix=True):
+    """
+    Compare a tenant's stored balances with ``expected_balances``; with
+    ``fix`` rewrite the ones that differ. Returns the drifted patient ids.
+    """
+    expected = expected_balances(tenant_id)
+    stored = {
+        balance.patient_id: balance
+        for balance in PatientBalance.objects.filter(tenant_id=tenant_id)
+    }
+    drifted = [
+        patient_id
+        for patient_id in expected.keys() | stored.keys()
+        if _values(expected.get(patient_id, PatientBalance()))
+        != _values(stored.get(patient_id, PatientBalance()))
+    ]
+    if fix and drifted:
+        PatientBalance.upsert(
+            [
+                expected.get(patient_id)
+                or PatientBalance(tenant_id=tenant_id, patient_id=patient_id)
+                for patient_id in drifted
+            ]
+        )
+        # Patients without invoices or payments keep no row.
+        PatientBalance.objects.filter(
+            patient_id__in=[pid for pid in drifted if pid not in expected]
+        ).delete()
+    return drifted
+
+
+def reconcile_balances(fix=True):
+    """Reconcile every tenant; logs and returns the drift found."""
+    result = {"tenants": 0, "drifted": 0}
+    for tenant_id in Tenant.objects.order_by("pk").values_list("pk", flat=True):
+        drifted = reconcile_tenant(tenant_id, fix=fix)
+        result["tenants"] += 1
+        result["drifted"] += len(drifted)
+        if drifted:
+            logger.warning(
+                "Patient balances drifted",
+                extra={
+                    "tenant_id": tenant_id,
+                    "patients": len(drifted),
+                    "sample": sorted(drifted)[:20],
+                },
+            )
+    return result
+
+
+def owing_balances(tenant):
+    """Balances of a tenant's patients who owe money, oldest debt first."""
+    return (
+        PatientBalance.objects.filter(tenant=tenant, outstanding__gt=0)
+        .select_related("patient")
+        .order_by("oldest_due_date")
+    )
+
+
+def aging_report(tenant, today=None):
+    """
+    Outstanding amounts in AGING_BUCKETS, each patient's balance aged by
+    their oldest open invoice. Returns [{label, patients, amount}].
+    """
+    today = today or timezone.localdate()
+    whens = []
+    for label, low, high in AGING_BUCKETS:
+        # days past due = today - oldest_due_date
+        condition = {}
+        if low is not None:
+            condition["oldest_due_date__lte"] = today - timedelta(days=low)
+        if high is not None:
+            condition["oldest_due_date__gte"] = today - timedelta(days=high)
+        whens.append(When(**condition, then=Value(label)))
+    rows = (
+        PatientBalance.objects.filter(tenant=tenant, outstanding__gt=0)
+        .annotate(bucket=Case(*whens, default=Value(AGING_BUCKETS[0][0])))
+        .values("bucket")
+        .annotate(patients=Count("pk"), amount=Sum("outstanding"))
+    )
+    totals = {row["bucket"]: row for row in rows}
+    return [
+        {
+            "label": label,
+            "patients": totals.get(label, {}).get("patients", 0),
+            "amount": totals.get(label, {}).get("amount") or 0,
+        }
+        for label, _, _ in AGING_BUCKETS
+    ]
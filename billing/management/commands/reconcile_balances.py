@@ -0,0 +1,28 @@
+"""
+Management command to rebuild PatientBalance rows from invoices and payments.
+Usage: python manage.py reconcile_balances [--check]
+"""
+from django.core.management.base import BaseCommand
+
+from billing.ledger import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute patient balances and report the ones that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drift; do not rewrite balances",
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile_balances(fix=not options["check"])
+        verb = "found" if options["check"] else "fixed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['tenants']} tenants checked, "
+                f"{result['drifted']} drifted balances {verb}"
+            )
+        )
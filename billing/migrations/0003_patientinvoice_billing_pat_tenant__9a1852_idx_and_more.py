@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0002_patientinvoice_invoicelineitem"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patientinvoice",
+            index=models.Index(
+                fields=["tenant", "issued_date"], name="billing_pat_tenant__9a1852_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patientinvoice",
+            index=models.Index(
+                fields=["tenant", "patient", "issued_date"],
+                name="billing_pat_tenant__d5ce97_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patientinvoice",
+            index=models.Index(
+                fields=["tenant", "status", "due_date"],
+                name="billing_pat_tenant__1ff7fc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["tenant", "timestamp"], name="billing_pay_tenant__8189db_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+        ("billing", "0003_patientinvoice_billing_pat_tenant__9a1852_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrialNotice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("weekly", "Weekly"), ("daily", "Daily")],
+                        max_length=10,
+                    ),
+                ),
+                ("period", models.CharField(max_length=10)),
+                ("claim", models.UUIDField()),
+                ("claimed_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trial_notices",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "period", "claim"],
+                        name="billing_tri_kind_5a0b91_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="trialnotice",
+            constraint=models.UniqueConstraint(
+                fields=("tenant", "kind", "period"), name="unique_trial_notice"
+            ),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:59
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+import django.db.models.deletion
+
+
+def backfill_balances(apps, schema_editor):
+    """Seed a balance for every patient who already has invoices or payments."""
+    PatientInvoice = apps.get_model("billing", "PatientInvoice")
+    Payment = apps.get_model("billing", "Payment")
+    PatientBalance = apps.get_model("billing", "PatientBalance")
+    open_invoice = Q(status__in=("sent", "overdue"))
+    invoice_rows = PatientInvoice.objects.values("tenant_id", "patient_id").annotate(
+        outstanding=Sum("total", filter=open_invoice, default=0),
+        overdue=Sum("total", filter=Q(status="overdue"), default=0),
+        open_invoices=Count("pk", filter=open_invoice),
+        oldest_due_date=Min("due_date", filter=open_invoice),
+    )
+    payment_rows = (
+        Payment.objects.filter(patient__isnull=False)
+        .values("tenant_id", "patient_id")
+        .annotate(
+            payments_total=Sum("amount", default=0), last_payment_at=Max("timestamp")
+        )
+    )
+    balances = {}
+    for rows in (invoice_rows, payment_rows):
+        for row in rows.order_by().iterator():
+            balances.setdefault(row["patient_id"], {}).update(row)
+    PatientBalance.objects.bulk_create(
+        (PatientBalance(**values) for values in balances.values()), batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0008_fhir_search_indexes"),
+        ("tenants", "0006_tenant_plan_created_index"),
+        ("billing", "0004_trial_notice"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PatientBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "outstanding",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "overdue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("open_invoices", models.PositiveIntegerField(default=0)),
+                ("oldest_due_date", models.DateField(blank=True, null=True)),
+                (
+                    "payments_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("last_payment_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "patient",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="billing_balance",
+                        to="patients.patient",
+                    ),
+                ),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="patient_balances",
+                        to="tenants.tenant",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("outstanding__gt", 0)),
+                        fields=["tenant", "oldest_due_date"],
+                        name="billing_balance_owing_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
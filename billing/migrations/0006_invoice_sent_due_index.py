@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0005_patient_balance"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patientinvoice",
+            index=models.Index(
+                condition=models.Q(("status", "sent")),
+                fields=["tenant", "due_date"],
+                name="billing_invoice_sent_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:06
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each tenant's sequence after its highest numeric invoice suffix."""
+    PatientInvoice = apps.get_model("billing", "PatientInvoice")
+    InvoiceSequence = apps.get_model("billing", "InvoiceSequence")
+    highest = {}
+    rows = PatientInvoice.objects.values_list("tenant_id", "invoice_number")
+    for tenant_id, number in rows.iterator():
+        match = re.search(r"\d+$", number)
+        value = int(match.group()) if match else 0
+        highest[tenant_id] = max(highest.get(tenant_id, 0), value)
+    InvoiceSequence.objects.bulk_create(
+        InvoiceSequence(tenant_id=tenant_id, next_value=value + 1)
+        for tenant_id, value in highest.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0006_tenant_plan_created_index"),
+        ("billing", "0006_invoice_sent_due_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("next_value", models.PositiveBigIntegerField(default=1)),
+                ("number_format", models.CharField(blank=True, max_length=50)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="patientinvoice",
+            name="invoice_number",
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name="patientinvoice",
+            constraint=models.UniqueConstraint(
+                fields=("tenant", "invoice_number"), name="unique_tenant_invoice_number"
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoicesequence",
+            name="tenant",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="invoice_sequence",
+                to="tenants.tenant",
+            ),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0007_invoice_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patientinvoice",
+            name="pdf_rendered_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="patientinvoice",
+            name="pdf_sha256",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
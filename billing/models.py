@@ -1,4 +1,8 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
 
 from patients.models import Patient
 from tenants.models import Tenant
@@ -50,6 +54,11 @@ class Payment(models.Model):
     is_subscription = models.BooleanField(default=False)
     external_id = models.CharField(max_length=100, blank=True)  # For gateway reference
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "timestamp"]),
+        ]
+
     def __str__(self):
         return f"{self.tenant} - {self.amount} {self.currency} ({'Subscription' if self.is_subscription else 'One-time'})"
 
@@ -67,7 +76,8 @@ class PatientInvoice(models.Model):
     
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="patient_invoices")
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="invoices")
-    invoice_number = models.CharField(max_length=50, unique=True)
+    # Allocated per tenant by InvoiceSequence (see billing.invoices).
+    invoice_number = models.CharField(max_length=50)
     status = models.CharField(max_length=20, choices=INVOICE_STATUS, default="draft")
     issued_date = models.DateField(auto_now_add=True)
     due_date = models.DateField()
@@ -77,21 +87,70 @@ class PatientInvoice(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     currency = models.CharField(max_length=10, default="GBP")
     notes = models.TextField(blank=True)
+    # Content hash of the last rendered PDF (billing.invoice_pdf).
+    pdf_sha256 = models.CharField(max_length=64, blank=True, editable=False)
+    pdf_rendered_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ["-issued_date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tenant", "invoice_number"], name="unique_tenant_invoice_number"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["tenant", "issued_date"]),
+            models.Index(fields=["tenant", "patient", "issued_date"]),
+            models.Index(fields=["tenant", "status", "due_date"]),
+            # Only unpaid sent invoices: keeps the overdue sweep cheap.
+            models.Index(
+                fields=["tenant", "due_date"],
+                condition=Q(status="sent"),
+                name="billing_invoice_sent_due_idx",
+            ),
+        ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.patient} - £{self.total}"
     
     def calculate_total(self):
-        """Calculate total from line items."""
-        self.subtotal = sum(item.total for item in self.items.all())
+        """Calculate total from line items (one SUM query)."""
+        self.subtotal = self.items.aggregate(subtotal=Sum("total"))["subtotal"] or 0
         self.total = self.subtotal + self.tax
         return self.total
 
+    def update_totals(self):
+        """Recalculate and store subtotal/total without a full save()."""
+        self.calculate_total()
+        self.updated_at = timezone.now()
+        PatientInvoice.objects.filter(pk=self.pk).update(
+            subtotal=self.subtotal, total=self.total, updated_at=self.updated_at
+        )
+        PatientBalance.refresh(self.tenant_id, self.patient_id)
+
+
+class InvoiceSequence(models.Model):
+    """
+    A tenant's invoice number counter. Numbers are taken by incrementing
+    ``next_value`` inside the invoice's transaction, which holds the row lock
+    until commit, so numbers are unique and a rolled-back invoice returns its
+    number (no gaps). Bulk jobs reserve a block up front instead (see
+    billing.invoices.reserve_invoice_numbers).
+    """
+
+    tenant = models.OneToOneField(
+        Tenant, on_delete=models.CASCADE, related_name="invoice_sequence"
+    )
+    next_value = models.PositiveBigIntegerField(default=1)
+    # str.format() pattern with {number}, {year} and {tenant} (the subdomain);
+    # blank uses settings.INVOICE_NUMBER_FORMAT.
+    number_format = models.CharField(max_length=50, blank=True)
+
+    def __str__(self):
+        return f"{self.tenant} invoice sequence (next {self.next_value})"
+
 
 class InvoiceLineItem(models.Model):
     """Line item for a patient invoice."""
@@ -115,12 +174,165 @@ class InvoiceLineItem(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    def calculate_total(self):
+        """quantity * unit_price, rounded to pennies."""
+        quantity, unit_price = (
+            value if isinstance(value, Decimal) else Decimal(str(value))
+            for value in (self.quantity, self.unit_price)
+        )
+        self.total = (quantity * unit_price).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+        return self.total
+
     def save(self, *args, **kwargs):
-        self.total = self.quantity * self.unit_price
+        # Saving items one by one recalculates the invoice every time; use
+        # billing.invoices to add many at once.
+        self.calculate_total()
         super().save(*args, **kwargs)
-        # Update invoice total
-        self.invoice.calculate_total()
-        self.invoice.save()
+        self.invoice.update_totals()
     
     def __str__(self):
         return f"{self.description} - £{self.total}"
+
+
+class TrialNotice(models.Model):
+    """
+    A trial-expiry reminder queued for a tenant's admins.
+    The unique (tenant, kind, period) row is created together with the outbox
+    messages, so a retried or duplicated task never notifies a tenant twice
+    per period.
+    """
+
+    WEEKLY = "weekly"
+    DAILY = "daily"
+    KIND_CHOICES = [(WEEKLY, "Weekly"), (DAILY, "Daily")]
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="trial_notices"
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # ISO week ("2025-W07") for weekly notices, ISO date for daily ones.
+    period = models.CharField(max_length=10)
+    claim = models.UUIDField()
+    claimed_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tenant", "kind", "period"], name="unique_trial_notice"
+            )
+        ]
+        indexes = [models.Index(fields=["kind", "period", "claim"])]
+
+    def __str__(self):
+        return f"{self.kind} trial notice for {self.tenant} ({self.period})"
+
+    @classmethod
+    def period_for(cls, kind, day):
+        if kind == cls.WEEKLY:
+            year, week, _ = day.isocalendar()
+            return f"{year}-W{week:02d}"
+        return day.isoformat()
+
+
+class PatientBalance(models.Model):
+    """
+    A patient's denormalized billing position, so balance lookups and
+    receivables reports read one row per patient instead of every invoice.
+    Refreshed inside the transaction that changes an invoice or payment
+    (billing.signals) and rebuilt in bulk by billing.ledger.reconcile_balances.
+    """
+
+    # Invoices the patient still has to pay.
+    OPEN_STATUSES = ("sent", "overdue")
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="patient_balances"
+    )
+    patient = models.OneToOneField(
+        Patient, on_delete=models.CASCADE, related_name="billing_balance"
+    )
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    overdue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    open_invoices = models.PositiveIntegerField(default=0)
+    oldest_due_date = models.DateField(null=True, blank=True)
+    payments_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_payment_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    FIELDS = (
+        "outstanding",
+        "overdue",
+        "open_invoices",
+        "oldest_due_date",
+        "payments_total",
+        "last_payment_at",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["tenant", "oldest_due_date"],
+                condition=Q(outstanding__gt=0),
+                name="billing_balance_owing_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.patient} owes £{self.outstanding}"
+
+    @classmethod
+    def invoice_totals(cls):
+        """Aggregates over PatientInvoice rows that make up a balance."""
+        open_invoice = Q(status__in=cls.OPEN_STATUSES)
+        return {
+            "outstanding": Sum("total", filter=open_invoice, default=0),
+            "overdue": Sum("total", filter=Q(status="overdue"), default=0),
+            "open_invoices": Count("pk", filter=open_invoice),
+            "oldest_due_date": Min("due_date", filter=open_invoice),
+        }
+
+    @classmethod
+    def payment_totals(cls):
+        """Aggregates over Payment rows that make up a balance."""
+        return {
+            "payments_total": Sum("amount", default=0),
+            "last_payment_at": Max("timestamp"),
+        }
+
+    @classmethod
+    def upsert(cls, balances, batch_size=500):
+        """Insert or overwrite ``balances`` (unsaved instances) by patient."""
+        now = timezone.now()
+        for balance in balances:
+            balance.updated_at = now
+        cls.objects.bulk_create(
+            balances,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["patient"],
+            update_fields=[*cls.FIELDS, "updated_at"],
+        )
+
+    @classmethod
+    def refresh(cls, tenant_id, patient_id):
+        """Recompute one patient's balance from their invoices and payments."""
+        if not (tenant_id and patient_id):
+            return None
+        with transaction.atomic():
+            # Lock the row first so a concurrent refresh aggregates after we commit.
+            list(cls.objects.select_for_update().filter(patient_id=patient_id))
+            balance = cls(
+                tenant_id=tenant_id,
+                patient_id=patient_id,
+                **PatientInvoice.objects.filter(patient_id=patient_id).aggregate(
+                    **cls.invoice_totals()
+                ),
+                **Payment.objects.filter(patient_id=patient_id).aggregate(
+                    **cls.payment_totals()
+                ),
+            )
+            cls.upsert([balance])
+        return balance
@@ -1,12 +1,22 @@
 """Views for patient billing (invoices for services/procedures)."""
+from decimal import Decimal
+
 from django.contrib.auth.decorators import login_required
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 
 from common.tenant_scope import enforce_tenant, scope_queryset
 from patients.models import Patient
-from .models import PatientInvoice, InvoiceLineItem
+from .invoice_pdf import invoice_digest, pdf_path
+from .invoices import create_invoice
+from .ledger import aging_report, owing_balances
+from .models import PatientBalance, PatientInvoice
+from .tasks import render_invoice_pdfs
+
+RECEIVABLES_PAGE_SIZE = 200
 
 
 @login_required
@@ -20,9 +30,8 @@ def patient_billing(request, patient_pk):
         request.user,
     )
     
-    total_owed = sum(
-        inv.total for inv in invoices if inv.status in ["sent", "overdue"]
-    )
+    balance = PatientBalance.objects.filter(patient=patient).first()
+    total_owed = balance.outstanding if balance else 0
     
     context = {
         "patient": patient,
@@ -32,6 +41,24 @@ def patient_billing(request, patient_pk):
     return render(request, "billing/patient_invoices.html", context)
 
 
+@login_required
+@require_http_methods(["GET"])
+def accounts_receivable(request):
+    """Patients with an outstanding balance and an aging summary."""
+    if not request.user.has_perm("billing.view_patientinvoice"):
+        messages.error(request, "You don't have permission to view receivables.")
+        return redirect("dashboard")
+    
+    tenant = request.user.tenant
+    aging = aging_report(tenant)
+    context = {
+        "aging": aging,
+        "total_outstanding": sum(bucket["amount"] for bucket in aging),
+        "balances": owing_balances(tenant)[:RECEIVABLES_PAGE_SIZE],
+    }
+    return render(request, "billing/receivables.html", context)
+
+
 @login_required
 @require_http_methods(["GET"])
 def patient_invoice_detail(request, invoice_pk):
@@ -47,6 +74,36 @@ def patient_invoice_detail(request, invoice_pk):
     return render(request, "billing/patient_invoice_detail.html", context)
 
 
+@login_required
+@require_http_methods(["GET"])
+def patient_invoice_pdf(request, invoice_pk):
+    """Download the invoice PDF rendered in the background."""
+    invoice = get_object_or_404(
+        PatientInvoice.objects.select_related("tenant", "patient"), pk=invoice_pk
+    )
+    enforce_tenant(invoice, request.user)
+    
+    digest = invoice_digest(invoice)
+    etag = f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    path = pdf_path(invoice, digest)
+    if response is None and not path.exists():
+        render_invoice_pdfs.delay([invoice.pk])
+        messages.info(request, "The PDF is being prepared. Please try again in a moment.")
+        return redirect("patient_invoice_detail", invoice_pk=invoice_pk)
+    
+    if response is None:
+        response = FileResponse(
+            open(path, "rb"),
+            content_type="application/pdf",
+            filename=f"invoice-{invoice.invoice_number}.pdf",
+        )
+    response["ETag"] = etag
+    # Revalidate every time: the URL stays the same when the content changes.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
 def patient_invoice_create(request, patient_pk):
@@ -63,38 +120,39 @@ def patient_invoice_create(request, patient_pk):
     
     # POST: Create invoice
     try:
-        invoice_number = request.POST.get("invoice_number")
         due_date = request.POST.get("due_date")
-        tax = request.POST.get("tax", 0)
+        tax = request.POST.get("tax") or 0
         notes = request.POST.get("notes", "")
         
-        invoice = PatientInvoice.objects.create(
-            tenant=request.user.tenant,
-            patient=patient,
-            invoice_number=invoice_number,
-            due_date=due_date,
-            tax=float(tax),
-            notes=notes,
-        )
-        
-        # Add line items
+        # Collect line items
+        line_items = []
         item_count = int(request.POST.get("item_count", 0))
         for i in range(item_count):
             description = request.POST.get(f"item_{i}_description")
             service_type = request.POST.get(f"item_{i}_service_type", "other")
-            quantity = request.POST.get(f"item_{i}_quantity", 1)
+            quantity = request.POST.get(f"item_{i}_quantity") or 1
             unit_price = request.POST.get(f"item_{i}_unit_price", 0)
             
             if description and unit_price:
-                InvoiceLineItem.objects.create(
-                    invoice=invoice,
-                    description=description,
-                    service_type=service_type,
-                    quantity=float(quantity),
-                    unit_price=float(unit_price),
+                line_items.append(
+                    {
+                        "description": description,
+                        "service_type": service_type,
+                        "quantity": Decimal(quantity),
+                        "unit_price": Decimal(unit_price),
+                    }
                 )
         
-        messages.success(request, f"Invoice {invoice_number} created successfully.")
+        invoice = create_invoice(
+            request.user.tenant,
+            patient,
+            line_items,
+            due_date=due_date,
+            tax=Decimal(tax),
+            notes=notes,
+        )
+        
+        messages.success(request, f"Invoice {invoice.invoice_number} created successfully.")
         return redirect("patient_invoice_detail", invoice_pk=invoice.pk)
     
     except Exception as e:
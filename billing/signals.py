@@ -0,0 +1,52 @@
+"""
+Keep PatientBalance rows in step with invoices and payments, inside the
+transaction that changed them, and queue PDF renders of finalized invoices.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+
+from .invoice_pdf import FINAL_STATUSES
+from .models import PatientBalance, PatientInvoice, Payment
+from .tasks import render_invoice_pdfs
+
+LEDGER_SOURCE_MODELS = (PatientInvoice, Payment)
+
+
+def refresh_patient_balance(sender, instance, **kwargs):
+    PatientBalance.refresh(instance.tenant_id, instance.patient_id)
+
+
+def refresh_patient_balance_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a patient or tenant cascades here; their balance goes with them.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if model in LEDGER_SOURCE_MODELS:
+        refresh_patient_balance(sender, instance)
+
+
+for model in LEDGER_SOURCE_MODELS:
+    post_save.connect(
+        refresh_patient_balance,
+        sender=model,
+        dispatch_uid=f"billing_balance_save_{model._meta.label_lower}",
+    )
+    post_delete.connect(
+        refresh_patient_balance_on_delete,
+        sender=model,
+        dispatch_uid=f"billing_balance_delete_{model._meta.label_lower}",
+    )
+
+
+def queue_invoice_pdf(sender, instance, **kwargs):
+    # After commit, so the task sees the line items saved with the invoice.
+    if instance.status in FINAL_STATUSES:
+        transaction.on_commit(partial(render_invoice_pdfs.delay, [instance.pk]))
+
+
+post_save.connect(
+    queue_invoice_pdf,
+    sender=PatientInvoice,
+    dispatch_uid="billing_invoice_pdf_save",
+)
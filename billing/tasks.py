@@ -1,42 +1,82 @@
 import logging
+from collections import Counter
+from itertools import islice
 
 from celery import shared_task
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
-from billing.free_trial import (
-    free_trial_days_left,
-    is_tenant_in_free_trial,
-    send_trial_expiry_notification,
-)
+from billing.free_trial import send_trial_notices, trial_expiring_tenants
+from billing.invoice_pdf import render_invoices
+from billing.invoices import mark_overdue, queue_overdue_reminders
+from billing.ledger import reconcile_balances
+from billing.models import PatientBalance, PatientInvoice, TrialNotice
+from common.audit import log_audit
 from tenants.models import Tenant
 
 logger = logging.getLogger(__name__)
 
+# Tenants per send_trial_notice_batch subtask.
+TRIAL_NOTICE_BATCH_SIZE = 200
+# Tenants per overdue-sweep UPDATE, and invoices per reminder subtask.
+OVERDUE_TENANT_CHUNK_SIZE = 500
+OVERDUE_REMINDER_BATCH_SIZE = 200
+# Invoices per render_invoice_pdfs subtask.
+INVOICE_PDF_BATCH_SIZE = 100
+
+
+def _fan_out_trial_notices(kind, max_days_left):
+    """Queue one send_trial_notice_batch per chunk of tenants in the window."""
+    now = timezone.now()
+    period = TrialNotice.period_for(kind, timezone.localdate(now))
+    tenant_ids = (
+        trial_expiring_tenants(max_days_left, now=now)
+        .exclude(
+            Exists(
+                TrialNotice.objects.filter(
+                    tenant=OuterRef("pk"),
+                    kind=kind,
+                    period=period,
+                    sent_at__isnull=False,
+                )
+            )
+        )
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=TRIAL_NOTICE_BATCH_SIZE * 10)
+    )
+    batches = tenants = 0
+    while batch := list(islice(tenant_ids, TRIAL_NOTICE_BATCH_SIZE)):
+        send_trial_notice_batch.delay(kind, period, batch)
+        batches += 1
+        tenants += len(batch)
+    logger.info(
+        "Queued trial expiry notices",
+        extra={"kind": kind, "tenants": tenants, "batches": batches},
+    )
+    return {"tenants": tenants, "batches": batches}
+
 
 @shared_task
 def weekly_trial_expiry_notifications():
-    for tenant in Tenant.objects.all():
-        if is_tenant_in_free_trial(tenant):
-            days_left = free_trial_days_left(tenant)
-            if days_left <= 21:  # Notify in last 3 weeks
-                send_trial_expiry_notification(tenant)
-                logger.info(
-                    "Sent weekly trial expiry notification",
-                    extra={"tenant_id": tenant.id, "days_left": days_left},
-                )
+    # Notify in the last 3 weeks of the trial
+    return _fan_out_trial_notices(TrialNotice.WEEKLY, max_days_left=21)
 
 
 @shared_task
 def daily_trial_expiry_soft_reminder():
     """Lightweight daily reminder when trials are close to ending."""
-    notified = 0
-    for tenant in Tenant.objects.all():
-        if is_tenant_in_free_trial(tenant):
-            days_left = free_trial_days_left(tenant)
-            if 0 < days_left <= 7:
-                send_trial_expiry_notification(tenant)
-                notified += 1
-    logger.info("Daily trial reminders processed", extra={"notified": notified})
+    return _fan_out_trial_notices(TrialNotice.DAILY, max_days_left=7)
+
+
+@shared_task
+def send_trial_notice_batch(kind, period, tenant_ids):
+    """Notify one chunk of tenants; safe to retry (see send_trial_notices)."""
+    notified = send_trial_notices(kind, period, tenant_ids)
+    logger.info(
+        "Trial expiry emails enqueued",
+        extra={"kind": kind, "period": period, "notified": notified},
+    )
     return {"notified": notified}
 
 
@@ -51,3 +91,71 @@ def nightly_subscription_health_check():
         extra={"plans": plans, "timestamp": timezone.now().isoformat()},
     )
     return plans
+
+
+@shared_task
+def reconcile_patient_balances():
+    """Rebuild PatientBalance rows that drifted from invoices and payments."""
+    return reconcile_balances()
+
+
+@shared_task
+def mark_overdue_invoices():
+    """
+    Nightly: move sent invoices past their due date to overdue, one UPDATE per
+    chunk of tenants, and queue reminder emails in batches.
+    """
+    today = timezone.localdate()
+    tenant_ids = list(Tenant.objects.order_by("pk").values_list("pk", flat=True))
+    result = {"tenants": 0, "invoices": 0, "reminder_batches": 0}
+    for start in range(0, len(tenant_ids), OVERDUE_TENANT_CHUNK_SIZE):
+        swept = mark_overdue(
+            tenant_ids[start : start + OVERDUE_TENANT_CHUNK_SIZE], today
+        )
+        counts = Counter(tenant_id for _, tenant_id in swept)
+        for tenant in Tenant.objects.filter(pk__in=counts):
+            log_audit(
+                "invoices_marked_overdue",
+                tenant=tenant,
+                details=f"{counts[tenant.pk]} invoice(s) marked overdue.",
+            )
+        invoice_ids = iter([pk for pk, _ in swept])
+        while batch := list(islice(invoice_ids, OVERDUE_REMINDER_BATCH_SIZE)):
+            send_overdue_invoice_reminders.delay(batch)
+            result["reminder_batches"] += 1
+        result["tenants"] += len(counts)
+        result["invoices"] += len(swept)
+    logger.info("Overdue invoices swept", extra=result)
+    return result
+
+
+@shared_task
+def send_overdue_invoice_reminders(invoice_ids):
+    """Queue overdue reminders for one batch of invoices."""
+    return {"queued": queue_overdue_reminders(invoice_ids)}
+
+
+@shared_task
+def render_invoice_pdfs(invoice_ids):
+    """Render the PDFs of one batch of invoices whose content changed."""
+    return render_invoices(invoice_ids)
+
+
+@shared_task
+def render_statement_pdfs():
+    """Month-end statement run: queue PDF renders of every open invoice."""
+    invoice_ids = (
+        PatientInvoice.objects.filter(status__in=PatientBalance.OPEN_STATUSES)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=INVOICE_PDF_BATCH_SIZE * 10)
+    )
+    batches = invoices = 0
+    while batch := list(islice(invoice_ids, INVOICE_PDF_BATCH_SIZE)):
+        render_invoice_pdfs.delay(batch)
+        batches += 1
+        invoices += len(batch)
+    logger.info(
+        "Queued statement PDFs", extra={"invoices": invoices, "batches": batches}
+    )
+    return {"invoices": invoices, "batches": batches}
@@ -1,10 +1,10 @@
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.conf import settings
 from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 
 from billing.constants import PLAN_DETAILS
+from common.outbox import enqueue_email
 from tenants.models import Tenant
 from .forms import OfficeEmailRequestForm
 
@@ -76,9 +76,9 @@ def office_email_request(request):
         form = OfficeEmailRequestForm(request.POST)
         if form.is_valid():
             data = form.cleaned_data
-            send_mail(
+            enqueue_email(
                 subject=f"Office Email Setup Request: {data['organization']}",
-                message=(
+                body=(
                     f"Contact Name: {data['contact_name']}\n"
                     f"Contact Email: {data['contact_email']}\n"
                     f"Organization: {data['organization']}\n"
@@ -87,7 +87,7 @@ def office_email_request(request):
                     f"Notes: {data['notes']}\n"
                 ),
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[getattr(settings, "SUPPORT_EMAIL", "support@example.com")],
+                recipients=[getattr(settings, "SUPPORT_EMAIL", "support@example.com")],
             )
             submitted = True
             form = None
@@ -60,11 +60,16 @@ def clinic_note_create(request):
             specialization, CLINIC_NOTE_TEMPLATES.get("general_practice", [])
         )
 
+    # Only the chosen patient is rendered; the picker loads others on demand.
+    selected_patient = None
+    if patient_id and str(patient_id).isdigit():
+        selected_patient = patients.filter(pk=patient_id).first()
+
     return render(
         request,
         "clinical_records/clinic_note_form.html",
         {
-            "patients": patients,
+            "selected_patient": selected_patient,
             "specialization_choices": specialization_choices,
             "template": template,
             "values": values,
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("clinical_records", "0004_alter_clinicalrecord_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="clinicalrecord",
+            index=models.Index(
+                fields=["tenant", "created_at"], name="clinical_re_tenant__7943fe_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="clinicalrecord",
+            index=models.Index(
+                fields=["tenant", "patient", "created_at"],
+                name="clinical_re_tenant__0f35c2_idx",
+            ),
+        ),
+    ]
@@ -41,5 +41,11 @@ class ClinicalRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "created_at"]),
+            models.Index(fields=["tenant", "patient", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Record for {self.patient} at {self.created_at}"
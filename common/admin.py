@@ -0,0 +1,31 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "to_email",
+        "subject",
+        "status",
+        "attempts",
+        "sent_at",
+    )
+    list_filter = ("status", "domain")
+    search_fields = ("to_email", "subject")
+    ordering = ("-created_at",)
+    actions = ["requeue"]
+
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status=EmailOutbox.SENT).update(
+            status=EmailOutbox.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            locked_until=None,
+        )
+        self.message_user(request, f"{count} message(s) queued for delivery.")
+
+    requeue.short_description = "Requeue selected messages"
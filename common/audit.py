@@ -1,7 +1,305 @@
+"""
+Audit log writer.
+
+``log_audit`` records an AuditLog entry. In "sync" mode (tests, or
+``AUDIT_LOG_MODE=sync``) the row is inserted immediately inside the caller's
+transaction. In "buffered" mode, entries are queued in process once the
+caller's transaction commits and a background thread flushes them with
+``bulk_create`` every AUDIT_FLUSH_INTERVAL seconds or as soon as
+AUDIT_BUFFER_SIZE entries are waiting. Whatever is still queued is flushed at
+exit, and by Celery's worker_process_shutdown in prefork children, which exit
+without running atexit hooks.
+
+Entries that cannot be written (database errors, shutdown flush failures) are
+spooled to JSONL files in AUDIT_SPOOL_DIR. The spool is on the writing host's
+disk, so each process's flusher thread replays it once a minute; the
+``common.tasks.replay_audit_spool`` Celery task replays it as well where
+AUDIT_SPOOL_DIR is a volume the workers share (or a process exited with a
+spool left behind). Entries that can never be inserted are set aside in
+``.dead`` files rather than retried forever.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+from celery.signals import worker_process_shutdown
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
 from audit_logs.models import AuditLog
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0
+# Beyond this many queued entries the caller flushes inline (backpressure).
+MAX_BUFFERED = 10_000
+SPOOL_SUFFIX = ".jsonl"
+DEAD_LETTER_SUFFIX = ".dead"
+# How often each process's flusher retries its own host's spool.
+SPOOL_REPLAY_INTERVAL = 60.0
+
+
+def _details(details, model=None, object_id=None, changes=None):
+    if details is not None:
+        return details
+    if model is None and changes is None:
+        return ""
+    subject = f"{model} #{object_id}" if object_id is not None else str(model or "")
+    if changes is None:
+        return subject
+    return f"{subject}: {json.dumps(changes, default=str, sort_keys=True)}"
+
+
+def _spool_dir():
+    return Path(
+        getattr(settings, "AUDIT_SPOOL_DIR", settings.BASE_DIR / "var" / "audit_spool")
+    )
+
+
+def _spool_line(entry):
+    return json.dumps(
+        {
+            "action": entry.action,
+            "user_id": entry.user_id,
+            "tenant_id": entry.tenant_id,
+            "details": entry.details,
+            "timestamp": entry.timestamp.isoformat(),
+        }
+    )
+
+
+def _spooled_entry(line):
+    row = json.loads(line)
+    return AuditLog(
+        action=row["action"],
+        user_id=row["user_id"],
+        tenant_id=row["tenant_id"],
+        details=row["details"],
+        timestamp=parse_datetime(row["timestamp"]),
+    )
+
+
+def _write_lines(path, lines, mode="w"):
+    with open(path, mode, encoding="utf-8") as fh:
+        fh.writelines(line + "\n" for line in lines)
+
+
+def _dead_letter(path, lines):
+    """Set aside spooled ``lines`` that can never be inserted."""
+    if not lines:
+        return
+    dead_path = path.with_suffix(DEAD_LETTER_SUFFIX)
+    _write_lines(dead_path, lines, mode="a")
+    logger.error(
+        "Audit entries could not be replayed",
+        extra={"count": len(lines), "path": str(dead_path)},
+    )
+
+
+def spool_entries(entries):
+    """Append ``entries`` to a new spool file for later replay."""
+    directory = _spool_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{os.getpid()}-{uuid.uuid4().hex}{SPOOL_SUFFIX}"
+    _write_lines(path, [_spool_line(entry) for entry in entries])
+    logger.warning(
+        "Spooled audit entries for replay",
+        extra={"count": len(entries), "path": str(path)},
+    )
+    return path
+
+
+def _insert_each(path, lines):
+    """
+    Insert spooled ``lines`` one at a time and return those the database
+    rejects. If the database goes away midway, every line not yet written
+    goes back to ``path`` before the error is raised.
+    """
+    rejected = []
+    for index, line in enumerate(lines):
+        try:
+            with transaction.atomic():
+                _spooled_entry(line).save(force_insert=True)
+        except (IntegrityError, DataError):
+            rejected.append(line)
+        except Exception:
+            _write_lines(path, rejected + lines[index:])
+            raise
+    return rejected
+
+
+def replay_spool(batch_size=1000):
+    """
+    Insert every spooled entry and delete the spool files. Returns the row count.
+    Lines that can never be inserted (unparseable, or rejected by the database,
+    e.g. for a user that no longer exists) are moved to a ``.dead`` file next
+    to the spool instead of blocking the replay.
+    """
+    directory = _spool_dir()
+    if not directory.exists():
+        return 0
+    total = 0
+    for path in sorted(directory.glob(f"*{SPOOL_SUFFIX}")):
+        claimed = path.with_suffix(".replaying")
+        try:
+            path.rename(claimed)  # another replayer may have claimed it first
+        except FileNotFoundError:
+            continue
+        with open(claimed, encoding="utf-8") as fh:
+            lines = [line.strip() for line in fh if line.strip()]
+        entries, unparseable = [], []
+        for line in lines:
+            try:
+                entries.append((line, _spooled_entry(line)))
+            except (ValueError, KeyError, TypeError):
+                unparseable.append(line)
+        _dead_letter(path, unparseable)
+        written = len(entries)
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(
+                    [entry for _, entry in entries], batch_size=batch_size
+                )
+        except (IntegrityError, DataError):
+            rejected = _insert_each(path, [line for line, _ in entries])
+            _dead_letter(path, rejected)
+            written -= len(rejected)
+        except Exception:
+            _write_lines(path, [line for line, _ in entries])
+            raise
+        finally:
+            claimed.unlink()
+        total += written
+    return total
+
+
+class AuditBuffer:
+    """Process-local queue of pending AuditLog rows with a background flusher."""
+
+    def __init__(self, max_size=None, interval=None, background=True):
+        self.max_size = max_size or getattr(
+            settings, "AUDIT_BUFFER_SIZE", DEFAULT_BUFFER_SIZE
+        )
+        self.interval = interval or getattr(
+            settings, "AUDIT_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL
+        )
+        # Without a background thread, full buffers are flushed by the caller.
+        self.background = background
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._next_replay = 0.0
+
+    def add(self, entry):
+        if self.background:
+            self._ensure_thread()
+        with self._lock:
+            self._entries.append(entry)
+            pending = len(self._entries)
+        if pending >= MAX_BUFFERED or (
+            not self.background and pending >= self.max_size
+        ):
+            self.flush()
+        elif pending >= self.max_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued entry; spool them if the database write fails."""
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._entries)
+                self._entries.clear()
+            if not entries:
+                return 0
+            try:
+                AuditLog.objects.bulk_create(entries, batch_size=self.max_size)
+            except Exception:
+                logger.exception("Audit flush failed", extra={"count": len(entries)})
+                spool_entries(entries)
+            return len(entries)
+
+    def _ensure_thread(self):
+        # Threads do not survive fork; prefork servers start one per child.
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._entries.clear()  # inherited from the parent, flushed there
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+                if time.monotonic() >= self._next_replay:
+                    self._next_replay = time.monotonic() + SPOOL_REPLAY_INTERVAL
+                    replay_spool()
+            except Exception:
+                logger.exception("Audit flusher iteration failed")
+
+
+_buffer = AuditBuffer()
+
+
+# Flush (or spool) whatever is still queued when the process exits cleanly.
+atexit.register(_buffer.flush)
+
+
+def flush_audit_buffer(**kwargs):
+    return _buffer.flush()
+
+
+# Celery prefork children leave through os._exit(), which skips atexit.
+worker_process_shutdown.connect(
+    flush_audit_buffer, dispatch_uid="common_audit_flush_on_worker_shutdown"
+)
+
 
-def log_audit(action, user=None, tenant=None, details=None):
-    AuditLog.objects.create(
-        action=action, user=user, tenant=tenant, details=details or ""
+def log_audit(
+    action,
+    user=None,
+    tenant=None,
+    details=None,
+    model=None,
+    object_id=None,
+    changes=None,
+):
+    """
+    Record an audit entry. ``model``/``object_id``/``changes`` describe the
+    affected object and are folded into ``details`` when it is not given.
+    The tenant defaults to the user's tenant.
+    """
+    if tenant is None and user is not None:
+        tenant = getattr(user, "tenant", None)
+    entry = AuditLog(
+        action=action,
+        user=user,
+        tenant=tenant,
+        details=_details(details, model, object_id, changes),
+        timestamp=timezone.now(),
     )
+    if getattr(settings, "AUDIT_LOG_MODE", "sync") == "sync":
+        entry.save()
+        return
+    # Only audit work that actually committed.
+    transaction.on_commit(lambda: _buffer.add(entry))
@@ -0,0 +1,36 @@
+"""
+Conditional GET support for detail endpoints.
+A resource's version is its ``updated_at`` in microseconds. It is exposed as
+a weak ETag (and FHIR ``meta.versionId``) and as Last-Modified, so a polling
+client that sends If-None-Match / If-Modified-Since gets a bodiless 304 after
+a single ``values('updated_at')`` lookup (plus the updated_at of any
+related rows the response embeds).
+"""
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def resource_version(updated_at):
+    return str(int(updated_at.timestamp() * 1_000_000))
+
+
+def resource_etag(updated_at):
+    return f'W/"{resource_version(updated_at)}"'
+
+
+def set_validators(response, updated_at):
+    response["ETag"] = resource_etag(updated_at)
+    response["Last-Modified"] = http_date(updated_at.timestamp())
+    return response
+
+
+def not_modified_response(request, updated_at):
+    """Return a 304 (or 412) response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request,
+        etag=resource_etag(updated_at),
+        last_modified=int(updated_at.timestamp()),
+    )
+    if response is not None:
+        set_validators(response, updated_at)
+    return response
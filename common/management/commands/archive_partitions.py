@@ -0,0 +1,51 @@
+"""
+Management command to archive old AuditLog/AnalyticsEvent months to compressed JSONL.
+Usage: python manage.py archive_partitions [--older-than-months 12] [--model audit_logs.AuditLog]
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from common.partitions import (
+    PARTITIONED_MODELS,
+    add_months,
+    archive_before,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export months older than the retention window to ARCHIVE_ROOT and remove them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-months",
+            type=int,
+            default=settings.ARCHIVE_AFTER_MONTHS,
+            help="Archive months that ended more than this many months ago",
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            choices=[label for label, _ in PARTITIONED_MODELS],
+            help="Only archive this model (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        if options["older_than_months"] < 1:
+            raise CommandError("--older-than-months must be at least 1")
+        cutoff = add_months(month_start(timezone.now()), -options["older_than_months"])
+        labels = options["models"] or [label for label, _ in PARTITIONED_MODELS]
+
+        total = 0
+        for label in labels:
+            for month, rows, path in archive_before(apps.get_model(label), cutoff):
+                total += rows
+                self.stdout.write(f"  {label} {month:%Y-%m}: {rows} rows → {path}")
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Archived {total} rows older than {cutoff:%Y-%m}")
+        )
@@ -0,0 +1,331 @@
+"""
+Management command to benchmark the hot tenant-scoped queries.
+Seeds synthetic tenants, then prints EXPLAIN plans and timings with the
+composite tenant indexes dropped ("before") and restored ("after").
+Usage: python manage.py benchmark_tenant_queries [--rows 1000000] [--tenants 10] [--repeat 5] [--skip-seed] [--analyze]
+
+Run it against a throwaway database only: it writes --rows rows and
+temporarily drops indexes.
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from analytics.kpis import compute_tenant_kpis
+from appointments.models import Appointment
+from audit_logs.models import AuditLog
+from billing.models import Payment
+from clinical_records.models import ClinicalRecord
+from labs.models import LabResult
+from patients.models import Patient
+from patients.search import build_search_text, search_patients
+from tenants.models import Tenant
+
+BATCH_SIZE = 5000
+HISTORY_DAYS = 365
+TENANT_PREFIX = "bench"
+
+# Share of --rows seeded into each table.
+ROW_SHARES = [
+    (Patient, 0.10),
+    (Appointment, 0.40),
+    (ClinicalRecord, 0.20),
+    (LabResult, 0.15),
+    (Payment, 0.10),
+    (AuditLog, 0.05),
+]
+
+# Auto-populated timestamps are rewritten after insert to spread the history.
+AUTO_TIMESTAMP_FIELD = {
+    Patient: "created_at",
+    ClinicalRecord: "created_at",
+    LabResult: "created_at",
+    Payment: "timestamp",
+    AuditLog: "timestamp",
+}
+
+
+def hot_queries(tenant, patient, now):
+    """Return ``(label, queryset)`` pairs for the list and analytics hot paths."""
+    month_ago = now - timedelta(days=30)
+    return [
+        (
+            "patient list",
+            Patient.objects.filter(tenant=tenant).order_by("-created_at")[:20],
+        ),
+        (
+            "patient search",
+            search_patients(Patient.objects.filter(tenant=tenant), "last123")[:20],
+        ),
+        (
+            "upcoming appointments",
+            Appointment.objects.filter(
+                tenant=tenant, scheduled_for__gte=now, status="scheduled"
+            ).order_by("scheduled_for")[:20],
+        ),
+        (
+            "patient appointments",
+            Appointment.objects.filter(tenant=tenant, patient=patient).order_by(
+                "-scheduled_for"
+            )[:20],
+        ),
+        (
+            "patient clinical records",
+            ClinicalRecord.objects.filter(tenant=tenant, patient=patient).order_by(
+                "-created_at"
+            )[:20],
+        ),
+        (
+            "lab results list",
+            LabResult.objects.filter(tenant=tenant).order_by("-created_at")[:20],
+        ),
+        (
+            "audit log list",
+            AuditLog.objects.filter(tenant=tenant).order_by("-timestamp")[:50],
+        ),
+        (
+            "appointment status (30d)",
+            Appointment.objects.filter(tenant=tenant, scheduled_for__gte=month_ago)
+            .values("status")
+            .annotate(count=Count("id"))
+            .order_by(),
+        ),
+        (
+            "monthly revenue (1y)",
+            Payment.objects.filter(
+                tenant=tenant, timestamp__gte=now - timedelta(days=HISTORY_DAYS)
+            )
+            .annotate(month=TruncMonth("timestamp"))
+            .values("month")
+            .annotate(total=Sum("amount"))
+            .order_by("month"),
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic tenants and compare hot query plans with and without the tenant indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1_000_000, help="Total rows to seed"
+        )
+        parser.add_argument(
+            "--tenants", type=int, default=10, help="Number of benchmark tenants"
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed runs per query (median is reported)",
+        )
+        parser.add_argument(
+            "--skip-seed",
+            action="store_true",
+            help="Reuse benchmark tenants seeded by a previous run",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Use EXPLAIN ANALYZE (PostgreSQL only)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Allow running with DEBUG=False",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError(
+                "Refusing to seed benchmark data with DEBUG=False; pass --force on a throwaway database."
+            )
+        if options["tenants"] < 1 or options["repeat"] < 1:
+            raise CommandError("--tenants and --repeat must be at least 1")
+
+        if options["skip_seed"]:
+            tenants = list(
+                Tenant.objects.filter(subdomain__startswith=TENANT_PREFIX).order_by(
+                    "id"
+                )
+            )
+            if not tenants:
+                raise CommandError(
+                    "No benchmark tenants found; run without --skip-seed first."
+                )
+        else:
+            tenants = self._seed(options["rows"], options["tenants"])
+
+        tenant = tenants[0]
+        patient = (
+            Appointment.objects.filter(tenant=tenant)
+            .values("patient")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .first()
+        )
+        patient = Patient.objects.get(pk=patient["patient"]) if patient else None
+        explain_options = {"analyze": True} if options["analyze"] else {}
+        if options["analyze"] and connection.vendor != "postgresql":
+            raise CommandError("--analyze is only supported on PostgreSQL")
+
+        indexes = self._tenant_indexes()
+        self.stdout.write(
+            f"Dropping {len(indexes)} tenant indexes for the baseline run…"
+        )
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        try:
+            before = self._run(
+                tenant, patient, options["repeat"], explain_options, "before"
+            )
+        finally:
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+        after = self._run(tenant, patient, options["repeat"], explain_options, "after")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nSummary (median ms)"))
+        self.stdout.write(
+            f"  {'query':<30} {'before':>10} {'after':>10} {'speedup':>9}"
+        )
+        for label, before_ms in before.items():
+            after_ms = after[label]
+            speedup = before_ms / after_ms if after_ms else float("inf")
+            self.stdout.write(
+                f"  {label:<30} {before_ms:>10.2f} {after_ms:>10.2f} {speedup:>8.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark complete"))
+
+    def _tenant_indexes(self):
+        """Return the composite indexes that lead with ``tenant`` on the seeded models."""
+        return [
+            (model, index)
+            for model, _ in ROW_SHARES
+            for index in model._meta.indexes
+            if index.fields and index.fields[0] == "tenant"
+        ]
+
+    def _time(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _run(self, tenant, patient, repeat, explain_options, phase):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {phase} ==="))
+        now = timezone.now()
+        results = {}
+        for label, queryset in hot_queries(tenant, patient, now):
+            results[label] = self._time(queryset, repeat)
+            self.stdout.write(
+                self.style.MIGRATE_LABEL(f"\n{label}: {results[label]:.2f} ms")
+            )
+            self.stdout.write(queryset.explain(**explain_options))
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            compute_tenant_kpis(tenant, now=now)
+            timings.append((time.perf_counter() - started) * 1000)
+        results["KPI engine"] = statistics.median(timings)
+        self.stdout.write(
+            self.style.MIGRATE_LABEL(f"\nKPI engine: {results['KPI engine']:.2f} ms")
+        )
+        return results
+
+    def _seed(self, rows, tenant_count):
+        rng = random.Random(42)
+        now = timezone.now()
+        tenants = [
+            Tenant.objects.get_or_create(
+                subdomain=f"{TENANT_PREFIX}{n}",
+                defaults={"name": f"Benchmark Tenant {n}"},
+            )[0]
+            for n in range(tenant_count)
+        ]
+        patient_ids = {tenant.id: [] for tenant in tenants}
+
+        for model, share in ROW_SHARES:
+            target = max(int(rows * share), tenant_count)
+            self.stdout.write(f"Seeding {target} {model._meta.verbose_name_plural}…")
+            created = 0
+            while created < target:
+                size = min(BATCH_SIZE, target - created)
+                # Interleave tenants so their rows share pages, as in production.
+                batch = [
+                    self._build(
+                        model,
+                        tenants[(created + i) % tenant_count],
+                        patient_ids,
+                        rng,
+                        now,
+                    )
+                    for i in range(size)
+                ]
+                batch = model.objects.bulk_create(batch)
+                if model is Patient:
+                    for obj in batch:
+                        patient_ids[obj.tenant_id].append(obj.pk)
+                if model in AUTO_TIMESTAMP_FIELD:
+                    model.objects.filter(
+                        pk__gte=batch[0].pk, pk__lte=batch[-1].pk
+                    ).update(
+                        **{
+                            AUTO_TIMESTAMP_FIELD[model]: now
+                            - timedelta(
+                                days=rng.randrange(HISTORY_DAYS),
+                                seconds=rng.randrange(86400),
+                            )
+                        }
+                    )
+                created += size
+        return tenants
+
+    def _build(self, model, tenant, patient_ids, rng, now):
+        if model is Patient:
+            patient = Patient(
+                tenant=tenant,
+                first_name=f"First{rng.randrange(5000)}",
+                last_name=f"Last{rng.randrange(20000)}",
+                date_of_birth=date(1940, 1, 1) + timedelta(days=rng.randrange(30000)),
+            )
+            # bulk_create skips Patient.save(), which maintains the search column.
+            patient.search_text = build_search_text(patient)
+            return patient
+        patient_id = rng.choice(patient_ids[tenant.id])
+        if model is Appointment:
+            return Appointment(
+                tenant=tenant,
+                patient_id=patient_id,
+                scheduled_for=now
+                + timedelta(minutes=rng.randrange(-HISTORY_DAYS, 60) * 1440),
+                status=rng.choice(["scheduled", "completed", "completed", "cancelled"]),
+            )
+        if model is ClinicalRecord:
+            return ClinicalRecord(
+                tenant=tenant, patient_id=patient_id, note="Benchmark note"
+            )
+        if model is LabResult:
+            return LabResult(
+                tenant=tenant, patient_id=patient_id, result="Within range"
+            )
+        if model is Payment:
+            return Payment(
+                tenant=tenant,
+                patient_id=patient_id,
+                amount=Decimal(rng.randrange(1000, 50000)) / 100,
+            )
+        return AuditLog(tenant=tenant, action="login_success", details="benchmark")
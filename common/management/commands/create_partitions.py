@@ -0,0 +1,27 @@
+"""
+Management command to create upcoming monthly table partitions (PostgreSQL).
+Usage: python manage.py create_partitions [--months-ahead 3]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from common.partitions import DEFAULT_MONTHS_AHEAD, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Create monthly partitions for AuditLog and AnalyticsEvent ahead of time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=DEFAULT_MONTHS_AHEAD,
+            help="Number of future months to create besides the current one",
+        )
+
+    def handle(self, *args, **options):
+        if options["months_ahead"] < 0:
+            raise CommandError("--months-ahead must not be negative")
+        created = ensure_partitions(months_ahead=options["months_ahead"])
+        for name in created:
+            self.stdout.write(f"  created {name}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Created {len(created)} partitions"))
@@ -0,0 +1,44 @@
+"""
+Management command to export archived AuditLog/AnalyticsEvent rows as JSON lines.
+Usage: python manage.py read_archive --model audit_logs.AuditLog [--start 2024-01-01] [--end 2024-07-01] [--tenant 3]
+"""
+import json
+from datetime import datetime, time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from common.partitions import PARTITIONED_MODELS, read_archive
+
+
+def _day(value):
+    return timezone.make_aware(
+        datetime.combine(datetime.fromisoformat(value), time.min)
+    )
+
+
+class Command(BaseCommand):
+    help = "Stream archived rows to stdout, filtered by date range and tenant"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            required=True,
+            choices=[label for label, _ in PARTITIONED_MODELS],
+        )
+        parser.add_argument(
+            "--start", type=_day, help="First day (YYYY-MM-DD), inclusive"
+        )
+        parser.add_argument("--end", type=_day, help="Last day (YYYY-MM-DD), exclusive")
+        parser.add_argument("--tenant", type=int, help="Only rows of this tenant ID")
+
+    def handle(self, *args, **options):
+        rows = read_archive(
+            apps.get_model(options["model"]),
+            start=options["start"],
+            end=options["end"],
+            tenant_id=options["tenant"],
+        )
+        for row in rows:
+            self.stdout.write(json.dumps(row))
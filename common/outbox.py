@@ -0,0 +1,211 @@
+"""
+Transactional email outbox.
+``enqueue_email`` stores one EmailOutbox row per recipient inside the caller's
+transaction and kicks the ``drain_email_outbox`` task once it commits (one
+drain per transaction), so no request waits on the mail server. ``drain``
+claims due messages in batches, holds each recipient domain to
+``EMAIL_OUTBOX_DOMAIN_RATE`` messages a minute, sends over a single connection
+and reschedules failures with exponential backoff until
+``EMAIL_OUTBOX_MAX_ATTEMPTS``, after which they are dead-lettered.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from common.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_BATCHES = 20
+MAX_ATTEMPTS = 6
+DOMAIN_RATE = 60
+RATE_WINDOW = timedelta(minutes=1)
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=6)
+# How long a claimed batch may take before other drainers retake it.
+LEASE = timedelta(minutes=5)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """
+    Queue ``subject``/``body`` for each address in ``recipients`` and return
+    the created rows. Delivery starts after the current transaction commits.
+    """
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    rows = [
+        EmailOutbox(
+            from_email=from_email,
+            to_email=address,
+            domain=address.rpartition("@")[2].lower(),
+            subject=subject,
+            body=body,
+        )
+        for address in dict.fromkeys(filter(None, recipients))
+    ]
+    if not rows:
+        return []
+    EmailOutbox.objects.bulk_create(rows)
+    schedule_drain()
+    return rows
+
+
+def schedule_drain():
+    """
+    Start ``drain_email_outbox`` once the current transaction commits. Only one
+    drain is registered per transaction, however many emails it queues.
+    """
+    from common.tasks import drain_email_outbox
+
+    connection = transaction.get_connection()
+    pending = getattr(connection, "_email_outbox_drain", None)
+    # A rolled back transaction drops its callbacks, and the pending drain
+    # with them.
+    if pending is not None and any(
+        entry[1] is pending for entry in connection.run_on_commit
+    ):
+        return
+
+    def drain_after_commit():
+        connection._email_outbox_drain = None
+        drain_email_outbox.delay()
+
+    connection._email_outbox_drain = drain_after_commit
+    transaction.on_commit(drain_after_commit)
+
+
+def domain_rate(domain):
+    """Messages per RATE_WINDOW allowed to ``domain``."""
+    rates = _setting("EMAIL_OUTBOX_DOMAIN_RATES", {})
+    return rates.get(domain, _setting("EMAIL_OUTBOX_DOMAIN_RATE", DOMAIN_RATE))
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: 1, 2, 4, ... minutes, capped."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def claim_batch(limit, now=None):
+    """
+    Claim up to ``limit`` due messages for sending and return them. Messages
+    over their domain's rate budget are pushed back by one RATE_WINDOW instead.
+    """
+    now = now or timezone.now()
+    due = EmailOutbox.objects.filter(
+        Q(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+        | Q(status=EmailOutbox.SENDING, locked_until__lt=now)
+    ).order_by("next_attempt_at", "pk")
+    with transaction.atomic():
+        candidates = list(
+            due.select_for_update(skip_locked=True).values_list("pk", "domain")[:limit]
+        )
+        if not candidates:
+            return []
+        recent = (
+            EmailOutbox.objects.filter(
+                domain__in={domain for _, domain in candidates},
+                sent_at__gt=now - RATE_WINDOW,
+            )
+            .values_list("domain")
+            .annotate(sent=Count("pk"))
+        )
+        budget = {domain: domain_rate(domain) for _, domain in candidates}
+        for domain, sent in recent:
+            budget[domain] -= sent
+        claimed, deferred = [], []
+        for pk, domain in candidates:
+            if budget[domain] > 0:
+                budget[domain] -= 1
+                claimed.append(pk)
+            else:
+                deferred.append(pk)
+        if deferred:
+            EmailOutbox.objects.filter(pk__in=deferred).update(
+                status=EmailOutbox.PENDING,
+                next_attempt_at=now + RATE_WINDOW,
+                locked_until=None,
+            )
+        EmailOutbox.objects.filter(pk__in=claimed).update(
+            status=EmailOutbox.SENDING, locked_until=now + LEASE
+        )
+    return list(EmailOutbox.objects.filter(pk__in=claimed).order_by("pk"))
+
+
+def deliver(connection, messages):
+    """Send claimed ``messages`` over ``connection`` and record the outcome."""
+    sent, failed = [], []
+    for message in messages:
+        email = EmailMessage(
+            message.subject, message.body, message.from_email, [message.to_email]
+        )
+        try:
+            connection.send_messages([email])
+        except Exception as exc:
+            # Drop a possibly broken SMTP session; the next send reopens it.
+            connection.close()
+            message.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            failed.append(message)
+        else:
+            sent.append(message.pk)
+
+    now = timezone.now()
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", MAX_ATTEMPTS)
+    dead = 0
+    for message in failed:
+        message.attempts += 1
+        message.locked_until = None
+        if message.attempts >= max_attempts:
+            message.status = EmailOutbox.DEAD
+            dead += 1
+            logger.error(
+                "Email dead-lettered",
+                extra={"outbox_id": message.pk, "error": message.last_error},
+            )
+        else:
+            message.status = EmailOutbox.PENDING
+            message.next_attempt_at = now + backoff(message.attempts)
+    EmailOutbox.objects.bulk_update(
+        failed,
+        ["attempts", "status", "next_attempt_at", "locked_until", "last_error"],
+    )
+    EmailOutbox.objects.filter(pk__in=sent).update(
+        status=EmailOutbox.SENT, sent_at=now, locked_until=None, last_error=""
+    )
+    return {"sent": len(sent), "retried": len(failed) - dead, "dead": dead}
+
+
+def drain(batch_size=None, max_batches=MAX_BATCHES):
+    """Send due messages batch by batch over one connection; returns totals."""
+    batch_size = batch_size or _setting("EMAIL_OUTBOX_BATCH_SIZE", BATCH_SIZE)
+    totals = Counter(sent=0, retried=0, dead=0)
+    connection = None
+    try:
+        for _ in range(max_batches):
+            messages = claim_batch(batch_size)
+            if not messages:
+                break
+            # Opened lazily so an empty run never touches the mail server.
+            connection = connection or get_connection()
+            totals.update(deliver(connection, messages))
+    finally:
+        if connection is not None:
+            connection.close()
+    return dict(totals)
+
+
+def purge_sent(older_than):
+    """Delete messages sent before ``now - older_than``."""
+    deleted, _ = EmailOutbox.objects.filter(
+        status=EmailOutbox.SENT, sent_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
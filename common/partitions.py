@@ -0,0 +1,349 @@
+"""
+Monthly partitioning and archival for append-only tables.
+
+On PostgreSQL, AuditLog and AnalyticsEvent are range-partitioned by month on
+their ``timestamp`` column (see the audit_logs and analytics migrations);
+``ensure_partitions`` creates upcoming months ahead of time and a DEFAULT
+partition catches anything outside them.
+
+``archive_before`` exports every month older than a cutoff to
+``ARCHIVE_ROOT/<app_label>.<model>/<YYYY-MM>.jsonl.gz`` and then removes it:
+partitions are detached and dropped, while old rows in the DEFAULT partition
+(and every row on other backends) are deleted.
+``read_archive`` streams archived rows back for exports and investigations.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# (model label, partition column)
+PARTITIONED_MODELS = [
+    ("audit_logs.AuditLog", "timestamp"),
+    ("analytics.AnalyticsEvent", "timestamp"),
+]
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    """Return midnight UTC on the first day of ``value``'s month."""
+    value = value.astimezone(dt_timezone.utc) if timezone.is_aware(value) else value
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def archive_cutoff(now=None):
+    """Start of the oldest month kept in the database (ARCHIVE_AFTER_MONTHS)."""
+    return add_months(
+        month_start(now or timezone.now()), -settings.ARCHIVE_AFTER_MONTHS
+    )
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(table, db=connection):
+    if db.vendor != "postgresql":
+        return False
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table, db=connection):
+    """Return ``{month: partition_name}`` for the monthly partitions of ``table``."""
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{table}_p"
+    months = {}
+    for name in names:
+        suffix = name[len(prefix) :]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            months[
+                datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+            ] = name
+    return months
+
+
+def _create_partition(cursor, table, column, month, qn):
+    """Create one monthly partition, moving matching rows out of DEFAULT first."""
+    name, default = partition_name(table, month), f"{table}_default"
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    cursor.execute(
+        f"SELECT 1 FROM {qn(default)} WHERE {qn(column)} >= %s AND {qn(column)} < %s LIMIT 1",
+        bounds,
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+        return
+    # Rows landed in DEFAULT; attaching a range it already holds would fail.
+    cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(column)} >= %s "
+        f"AND {qn(column)} < %s RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved",
+        bounds,
+    )
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+
+
+def ensure_partitions(months_ahead=DEFAULT_MONTHS_AHEAD, now=None, db=connection):
+    """
+    Create the monthly partitions from the current month to ``months_ahead``
+    months ahead for every partitioned table. Returns the partitions created.
+    """
+    now = now or timezone.now()
+    created = []
+    qn = db.ops.quote_name
+    for label, column in PARTITIONED_MODELS:
+        table = apps.get_model(label)._meta.db_table
+        if not is_partitioned(table, db):
+            continue
+        existing = list_partitions(table, db)
+        with transaction.atomic(using=db.alias), db.cursor() as cursor:
+            for offset in range(months_ahead + 1):
+                month = add_months(month_start(now), offset)
+                if month not in existing:
+                    _create_partition(cursor, table, column, month, qn)
+                    created.append(partition_name(table, month))
+    if created:
+        logger.info("Created table partitions", extra={"partitions": created})
+    return created
+
+
+def convert_to_partitioned(
+    schema_editor, table, column, months_ahead=DEFAULT_MONTHS_AHEAD
+):
+    """
+    Rebuild ``table`` as a monthly range-partitioned table (PostgreSQL only).
+    Used by migrations; index and foreign key names are preserved so later
+    Django migrations keep working. The primary key becomes (id, column).
+    """
+    db = schema_editor.connection
+    if db.vendor != "postgresql" or is_partitioned(table, db):
+        return
+    qn, legacy = schema_editor.quote_name, f"{table}_legacy"
+    execute = schema_editor.execute
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))",
+            [table, table],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) "
+            "AND attname = 'id'",
+            [table],
+        )
+        identity = cursor.fetchone()[0] in ("a", "d")
+        cursor.execute(f"SELECT min({qn(column)}) FROM {qn(table)}")
+        oldest = cursor.fetchone()[0]
+
+    execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+    execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS "
+        f"INCLUDING IDENTITY) PARTITION BY RANGE ({qn(column)})"
+    )
+    execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(column)})")
+    execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+    if not identity:
+        # serial column: keep the sequence alive when the old table goes away.
+        with db.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+            sequence = cursor.fetchone()[0]
+        if sequence:
+            execute(f"ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id")
+
+    now = timezone.now()
+    first = month_start(oldest or now)
+    with db.cursor() as cursor:
+        month = first
+        while month <= add_months(month_start(now), months_ahead):
+            _create_partition(cursor, table, column, month, qn)
+            month = add_months(month, 1)
+
+    execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+    execute(f"DROP TABLE {qn(legacy)}")
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT max(id) FROM {qn(table)}), 0) + 1, false)"
+    )
+    # The legacy indexes are gone, so the original names can be reused.
+    for definition in index_defs:
+        execute(definition)
+    for name, definition in foreign_keys:
+        execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+def archive_dir(model):
+    root = Path(
+        getattr(settings, "ARCHIVE_ROOT", Path(settings.BASE_DIR) / "var" / "archives")
+    )
+    return root / model._meta.label_lower
+
+
+def archive_path(model, month):
+    return archive_dir(model) / f"{month:%Y-%m}.jsonl.gz"
+
+
+def _months_to_archive(model, column, cutoff, db):
+    """
+    Return ``[(month, partition name or None)]`` for the months to archive
+    before ``cutoff``. Months without a partition of their own (every month
+    of an unpartitioned table, DEFAULT-partition rows otherwise) have their
+    rows deleted instead.
+    """
+    table = model._meta.db_table
+    if is_partitioned(table, db):
+        months = {
+            m: name for m, name in list_partitions(table, db).items() if m < cutoff
+        }
+        # Rows that arrived before their month's partition existed sit in DEFAULT.
+        qn = db.ops.quote_name
+        with db.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', {qn(column)} AT TIME ZONE 'UTC') "
+                f"FROM {qn(table + '_default')} WHERE {qn(column)} < %s",
+                [cutoff],
+            )
+            for (month,) in cursor.fetchall():
+                months.setdefault(month.replace(tzinfo=dt_timezone.utc), None)
+        return sorted(months.items())
+    oldest = (
+        model.objects.filter(**{f"{column}__lt": cutoff})
+        .order_by(column)
+        .values_list(column, flat=True)
+        .first()
+    )
+    months, month = [], month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append((month, None))
+        month = add_months(month, 1)
+    return months
+
+
+def _export_month(model, column, month):
+    """Write one month of rows to its archive file; returns (path, row_count)."""
+    path = archive_path(model, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    rows = (
+        model.objects.filter(
+            **{f"{column}__gte": month, f"{column}__lt": add_months(month, 1)}
+        )
+        .order_by(column, "pk")
+        .values()
+    )
+    count = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        for row in rows.iterator(chunk_size=5000):
+            fh.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+            count += 1
+    if path.exists():
+        # A month archived again (rows arrived late) is appended as a new gzip member.
+        with open(path, "ab") as out, open(tmp, "rb") as extra:
+            out.write(extra.read())
+        tmp.unlink()
+    else:
+        os.replace(tmp, path)
+    return path, count
+
+
+def archive_before(model, cutoff, db=connection):
+    """
+    Archive and remove every month of ``model`` that ends on or before ``cutoff``.
+    Returns a list of ``(month, row_count, path)``.
+    """
+    column = dict(PARTITIONED_MODELS)[model._meta.label]
+    cutoff = month_start(cutoff)
+    table = model._meta.db_table
+    qn = db.ops.quote_name
+    archived = []
+    for month, name in _months_to_archive(model, column, cutoff, db):
+        with transaction.atomic(using=db.alias):
+            path, count = _export_month(model, column, month)
+            if name:
+                with db.cursor() as cursor:
+                    cursor.execute(
+                        f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}"
+                    )
+                    cursor.execute(f"DROP TABLE {qn(name)}")
+            else:
+                model.objects.filter(
+                    **{f"{column}__gte": month, f"{column}__lt": add_months(month, 1)}
+                ).delete()
+        archived.append((month, count, path))
+        logger.info(
+            "Archived month",
+            extra={
+                "model": model._meta.label,
+                "month": f"{month:%Y-%m}",
+                "rows": count,
+            },
+        )
+    return archived
+
+
+def read_archive(model, start=None, end=None, tenant_id=None):
+    """
+    Yield archived rows of ``model`` (as dicts) with ``start <= timestamp < end``
+    (aware datetimes), optionally for a single tenant. Only the month files in
+    range are opened.
+    """
+    column = dict(PARTITIONED_MODELS)[model._meta.label]
+    directory = archive_dir(model)
+    if not directory.exists():
+        return
+    for path in sorted(directory.glob("*.jsonl.gz")):
+        month = datetime.strptime(path.name[:7], "%Y-%m").replace(
+            tzinfo=dt_timezone.utc
+        )
+        if (start and add_months(month, 1) <= start) or (end and month >= end):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                row = json.loads(line)
+                moment = parse_datetime(row[column])
+                if start and moment < start or end and moment >= end:
+                    continue
+                if tenant_id is not None and row.get("tenant_id") != tenant_id:
+                    continue
+                yield row
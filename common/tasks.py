@@ -0,0 +1,62 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+
+from django.apps import apps
+from django.conf import settings
+
+from common import outbox
+from common.audit import replay_spool
+from common.partitions import (
+    PARTITIONED_MODELS,
+    archive_before,
+    archive_cutoff,
+    ensure_partitions,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def replay_audit_spool():
+    """Insert audit entries that were spooled to disk after a failed flush."""
+    replayed = replay_spool()
+    if replayed:
+        logger.info("Audit spool replayed", extra={"rows": replayed})
+    return {"rows": replayed}
+
+
+@shared_task
+def maintain_table_partitions():
+    """Keep the monthly AuditLog/AnalyticsEvent partitions created ahead of time."""
+    created = ensure_partitions()
+    return {"created": created}
+
+
+@shared_task
+def archive_old_partitions():
+    """Archive AuditLog/AnalyticsEvent months older than ARCHIVE_AFTER_MONTHS."""
+    cutoff = archive_cutoff()
+    rows = 0
+    for label, _ in PARTITIONED_MODELS:
+        for _, count, _ in archive_before(apps.get_model(label), cutoff):
+            rows += count
+    logger.info("Old partitions archived", extra={"rows": rows})
+    return {"rows": rows}
+
+
+@shared_task
+def drain_email_outbox():
+    """Deliver due EmailOutbox messages (see common.outbox)."""
+    result = outbox.drain()
+    if result["retried"] or result["dead"]:
+        logger.warning("Email outbox delivery failures", extra=result)
+    return result
+
+
+@shared_task
+def purge_sent_emails():
+    """Delete delivered EmailOutbox rows past EMAIL_OUTBOX_RETENTION_DAYS."""
+    deleted = outbox.purge_sent(timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS))
+    return {"deleted": deleted}
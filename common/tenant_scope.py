@@ -1,11 +1,15 @@
 from django.core.exceptions import PermissionDenied
 
 
-def scope_queryset(queryset, user):
-    """Return queryset scoped to user's tenant unless platform admin."""
+def scope_queryset(queryset, user, field="tenant"):
+    """Return queryset scoped to user's tenant unless platform admin.
+
+    ``field`` is the lookup path to the tenant for models without their own
+    ``tenant`` (e.g. ``"invoice__tenant"``).
+    """
     if getattr(user, "platform_admin", False):
         return queryset
-    return queryset.filter(tenant=user.tenant)
+    return queryset.filter(**{field: user.tenant})
 
 
 def enforce_tenant(obj, user):
@@ -0,0 +1,19 @@
+"""Helpers shared by the test suites."""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import override_settings
+
+
+class TempRootMixin:
+    """TestCase mixin for pointing file-storage settings at throwaway directories."""
+
+    def temp_root(self, setting):
+        """Override ``setting`` with a new temporary directory for this test."""
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(**{setting: root})
+        override.enable()
+        self.addCleanup(override.disable)
+        return root
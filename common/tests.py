@@ -1,9 +1,250 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
+from celery.signals import worker_process_shutdown
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from audit_logs.models import AuditLog
+from tenants.models import Tenant
+from users.models import CustomUser
+
+from . import audit, outbox, partitions
+from .models import EmailOutbox
 from .permissions import has_permission
+from .testing import TempRootMixin
 
 
 class PermissionsTest(TestCase):
     def test_has_permission_callable(self):
         # The helper should be importable and callable
         self.assertTrue(callable(has_permission))
+
+
+class AuditWriterTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+
+    def entry(self, action="login_success"):
+        return AuditLog(action=action, user=self.user, tenant=self.tenant)
+
+    def test_sync_mode_writes_immediately_with_api_style_kwargs(self):
+        audit.log_audit(
+            user=self.user,
+            action="UPDATE",
+            model="Patient",
+            object_id=7,
+            changes={"phone": "123"},
+        )
+        log = AuditLog.objects.get()
+        self.assertEqual(log.tenant, self.tenant)
+        self.assertEqual(log.details, 'Patient #7: {"phone": "123"}')
+
+    @override_settings(AUDIT_LOG_MODE="buffered")
+    def test_buffered_mode_queues_after_commit(self):
+        buffer = audit.AuditBuffer(max_size=2, background=False)
+        with mock.patch.object(audit, "_buffer", buffer):
+            with self.captureOnCommitCallbacks(execute=True):
+                audit.log_audit("login_success", user=self.user)
+            self.assertFalse(AuditLog.objects.exists())
+            with self.captureOnCommitCallbacks(execute=True):
+                audit.log_audit("login_failed", user=self.user)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_flush_writes_in_one_insert(self):
+        buffer = audit.AuditBuffer(max_size=100, background=False)
+        for _ in range(50):
+            buffer.add(self.entry())
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 50)
+        self.assertEqual(AuditLog.objects.count(), 50)
+
+    @override_settings(AUDIT_LOG_MODE="buffered")
+    def test_worker_process_shutdown_flushes_the_buffer(self):
+        buffer = audit.AuditBuffer(max_size=100, background=False)
+        with mock.patch.object(audit, "_buffer", buffer):
+            with self.captureOnCommitCallbacks(execute=True):
+                audit.log_audit("invoices_marked_overdue", tenant=self.tenant)
+            self.assertFalse(AuditLog.objects.exists())
+            worker_process_shutdown.send(sender=None, pid=1, exitcode=0)
+        self.assertEqual(AuditLog.objects.get().action, "invoices_marked_overdue")
+
+    def test_failed_flush_is_spooled_and_replayed(self):
+        buffer = audit.AuditBuffer(max_size=100, background=False)
+        buffer.add(self.entry("user_approved"))
+        with tempfile.TemporaryDirectory() as spool, override_settings(
+            AUDIT_SPOOL_DIR=spool
+        ):
+            with mock.patch.object(
+                AuditLog.objects, "bulk_create", side_effect=DatabaseError
+            ), self.assertLogs("common.audit", "WARNING"):
+                buffer.flush()
+            self.assertEqual(len(list(Path(spool).iterdir())), 1)
+            self.assertFalse(AuditLog.objects.exists())
+
+            self.assertEqual(audit.replay_spool(), 1)
+            self.assertEqual(list(Path(spool).iterdir()), [])
+        log = AuditLog.objects.get()
+        self.assertEqual((log.action, log.tenant_id), ("user_approved", self.tenant.id))
+
+    def test_unreplayable_entries_are_dead_lettered(self):
+        good = self.entry("user_approved")
+        with tempfile.TemporaryDirectory() as spool, override_settings(
+            AUDIT_SPOOL_DIR=spool
+        ):
+            with self.assertLogs("common.audit", "WARNING"):
+                path = audit.spool_entries([good, self.entry(None), good])
+            with path.open("a") as fh:
+                fh.write("{not json\n")
+
+            with self.assertLogs("common.audit", "ERROR"):
+                self.assertEqual(audit.replay_spool(), 2)
+            dead = path.with_suffix(audit.DEAD_LETTER_SUFFIX)
+            self.assertEqual(list(Path(spool).iterdir()), [dead])
+            self.assertEqual(len(dead.read_text().splitlines()), 2)
+            self.assertEqual(audit.replay_spool(), 0)
+        self.assertEqual(AuditLog.objects.filter(action="user_approved").count(), 2)
+
+
+class PartitionArchiveTest(TempRootMixin, TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.other = Tenant.objects.create(name="Other Tenant", subdomain="other")
+        self.temp_root("ARCHIVE_ROOT")
+
+    def log(self, when, tenant=None, action="login_success"):
+        return AuditLog.objects.create(
+            action=action, tenant=tenant or self.tenant, timestamp=when
+        )
+
+    def test_month_helpers(self):
+        jan = datetime(2024, 1, 31, 23, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(
+            partitions.month_start(jan), datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            partitions.add_months(partitions.month_start(jan), -2),
+            datetime(2023, 11, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            partitions.partition_name(
+                "audit_logs_auditlog", partitions.month_start(jan)
+            ),
+            "audit_logs_auditlog_p202401",
+        )
+
+    def test_archive_exports_old_months_and_reader_streams_them(self):
+        self.log(datetime(2024, 1, 5, tzinfo=dt_timezone.utc), action="jan")
+        self.log(datetime(2024, 1, 20, tzinfo=dt_timezone.utc), tenant=self.other)
+        self.log(datetime(2024, 3, 2, tzinfo=dt_timezone.utc), action="mar")
+        recent = self.log(datetime(2024, 5, 1, tzinfo=dt_timezone.utc), action="may")
+
+        archived = partitions.archive_before(
+            AuditLog, datetime(2024, 4, 10, tzinfo=dt_timezone.utc)
+        )
+
+        self.assertEqual(
+            [(f"{month:%Y-%m}", rows) for month, rows, _ in archived],
+            [("2024-01", 2), ("2024-02", 0), ("2024-03", 1)],
+        )
+        self.assertEqual(list(AuditLog.objects.all()), [recent])
+        rows = list(partitions.read_archive(AuditLog, tenant_id=self.tenant.id))
+        self.assertEqual([row["action"] for row in rows], ["jan", "mar"])
+        rows = partitions.read_archive(
+            AuditLog, start=datetime(2024, 2, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual([row["action"] for row in rows], ["mar"])
+
+    def test_commands(self):
+        self.log(timezone.now() - timedelta(days=800), action="old")
+        out = StringIO()
+        call_command("archive_partitions", "--older-than-months", "12", stdout=out)
+        self.assertIn("Archived 1 rows", out.getvalue())
+        self.assertFalse(AuditLog.objects.exists())
+
+        out = StringIO()
+        call_command("read_archive", "--model", "audit_logs.AuditLog", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["action"], "old")
+
+        # Partitions only exist on PostgreSQL; elsewhere the command is a no-op.
+        out = StringIO()
+        call_command("create_partitions", stdout=out)
+        self.assertIn("Created", out.getvalue())
+
+
+class EmailOutboxTest(TestCase):
+    def test_queued_mail_is_sent_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.enqueue_email(
+                "Hello", "Body", ["a@example.com", "b@example.com", "a@example.com"]
+            )
+            self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), ["a@example.com", "b@example.com"]
+        )
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.SENT).count(), 2)
+        self.assertEqual(outbox.drain(), {"sent": 0, "retried": 0, "dead": 0})
+
+    def test_one_drain_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for i in range(3):
+                outbox.enqueue_email("Hi", "Body", [f"user{i}@example.com"])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(mail.outbox), 3)
+        # The next transaction gets its own drain.
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            outbox.enqueue_email("Hi", "Body", ["again@example.com"])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(mail.outbox), 4)
+
+    @override_settings(EMAIL_OUTBOX_DOMAIN_RATE=2)
+    def test_domain_rate_limit_defers_the_excess(self):
+        outbox.enqueue_email(
+            "Hi", "Body", [f"user{i}@busy.example.com" for i in range(3)]
+        )
+        outbox.enqueue_email("Hi", "Body", ["someone@quiet.example.com"])
+        self.assertEqual(outbox.drain()["sent"], 3)
+        deferred = EmailOutbox.objects.get(status=EmailOutbox.PENDING)
+        self.assertEqual(deferred.domain, "busy.example.com")
+        self.assertGreater(deferred.next_attempt_at, timezone.now())
+        self.assertEqual(deferred.attempts, 0)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_dead_letter(self):
+        send_messages = EmailBackend.send_messages
+
+        def refuse_bounce(backend, messages):
+            if messages[0].to == ["bounce@example.com"]:
+                raise OSError("connection refused")
+            return send_messages(backend, messages)
+
+        outbox.enqueue_email("Hi", "Body", ["bounce@example.com", "ok@example.com"])
+        with mock.patch.object(EmailBackend, "send_messages", refuse_bounce):
+            self.assertEqual(outbox.drain(), {"sent": 1, "retried": 1, "dead": 0})
+            failed = EmailOutbox.objects.get(to_email="bounce@example.com")
+            self.assertEqual(failed.attempts, 1)
+            self.assertIn("connection refused", failed.last_error)
+            self.assertGreater(
+                failed.next_attempt_at, timezone.now() + timedelta(seconds=30)
+            )
+
+            EmailOutbox.objects.filter(pk=failed.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertEqual(outbox.drain(), {"sent": 0, "retried": 0, "dead": 1})
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (EmailOutbox.DEAD, 2))
+        self.assertEqual(len(mail.outbox), 1)
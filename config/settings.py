@@ -1,5 +1,6 @@
 LOGOUT_REDIRECT_URL = '/'
 import os
+import sys
 from pathlib import Path
 import dj_database_url
 from celery.schedules import crontab
@@ -19,6 +20,51 @@ CELERY_BEAT_SCHEDULE = {
         "task": "billing.tasks.nightly_subscription_health_check",
         "schedule": crontab(minute=45, hour=1),  # 01:45 UTC daily
     },
+    "mark-overdue-invoices": {
+        "task": "billing.tasks.mark_overdue_invoices",
+        "schedule": crontab(minute=5, hour=0),
+    },
+    "reconcile-patient-balances": {
+        "task": "billing.tasks.reconcile_patient_balances",
+        "schedule": crontab(minute=10, hour=2),
+    },
+    "render-statement-pdfs": {
+        "task": "billing.tasks.render_statement_pdfs",
+        "schedule": crontab(minute=0, hour=4, day_of_month=1),
+    },
+    "refresh-tenant-daily-metrics": {
+        "task": "analytics.tasks.refresh_tenant_daily_metrics",
+        "schedule": crontab(minute="*/15"),
+    },
+    "replay-audit-spool": {
+        "task": "common.tasks.replay_audit_spool",
+        "schedule": crontab(minute="*/5"),
+    },
+    "maintain-table-partitions": {
+        "task": "common.tasks.maintain_table_partitions",
+        "schedule": crontab(minute=30, hour=0),
+    },
+    "archive-old-partitions": {
+        "task": "common.tasks.archive_old_partitions",
+        "schedule": crontab(minute=0, hour=3, day_of_month=1),
+    },
+    "purge-expired-fhir-exports": {
+        "task": "fhir.tasks.purge_expired_exports",
+        "schedule": crontab(minute=20),
+    },
+    "purge-expired-data-exports": {
+        "task": "exports.tasks.purge_expired_exports",
+        "schedule": crontab(minute=25),
+    },
+    # Catches retries and anything queued while no worker was listening.
+    "drain-email-outbox": {
+        "task": "common.tasks.drain_email_outbox",
+        "schedule": crontab(minute="*"),
+    },
+    "purge-sent-emails": {
+        "task": "common.tasks.purge_sent_emails",
+        "schedule": crontab(minute=40, hour=2),
+    },
 }
 
 # Celery broker/result backend (use Redis or other broker in production)
@@ -43,7 +89,45 @@ CELERY_BROKER_USE_SSL = (
 )
 CELERY_RESULT_BACKEND_USE_SSL = CELERY_BROKER_USE_SSL
 
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# Test runs (manage.py test / pytest) use in-process cache and eager Celery tasks
+TESTING = sys.argv[1:2] == ["test"] or "pytest" in sys.modules
+CELERY_TASK_ALWAYS_EAGER = TESTING
+
+# Cache: Redis when REDIS_URL is configured, local memory otherwise and in tests
+if os.environ.get("REDIS_URL") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": _redis_url,
+            "OPTIONS": (
+                {"ssl_cert_reqs": None} if _redis_url.startswith("rediss://") else {}
+            ),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Analytics view contexts: fresh for ANALYTICS_CACHE_TTL seconds, then served
+# stale (while refreshing in the background) for up to ANALYTICS_CACHE_STALE_TTL.
+ANALYTICS_CACHE_TTL = int(os.environ.get("ANALYTICS_CACHE_TTL", 15 * 60))
+ANALYTICS_CACHE_STALE_TTL = int(os.environ.get("ANALYTICS_CACHE_STALE_TTL", 24 * 60 * 60))
+
+# Audit log writer (common.audit): "sync" inserts inside the request, "buffered"
+# batches inserts from a background thread and spools failures for replay.
+AUDIT_LOG_MODE = os.environ.get("AUDIT_LOG_MODE", "sync" if TESTING else "buffered")
+AUDIT_BUFFER_SIZE = int(os.environ.get("AUDIT_BUFFER_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 2.0))
+
+EMAIL_BACKEND = os.environ.get(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.locmem.EmailBackend"
+    if TESTING
+    else "django.core.mail.backends.console.EmailBackend",
+)
 # For production, use SMTP:
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.example.com')
@@ -53,6 +137,19 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # EMAIL_USE_TLS = True
 # DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'webmaster@example.com')
 
+# Patient invoice numbers (billing.invoices): a str.format() pattern with
+# {number}, {year} and {tenant}; tenants can override it on their InvoiceSequence.
+INVOICE_NUMBER_FORMAT = os.environ.get("INVOICE_NUMBER_FORMAT", "INV-{number:06d}")
+
+# Transactional email outbox (common.outbox): messages are queued in the
+# database and sent by the drain_email_outbox task.
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+# Messages per minute to any one recipient domain, with per-domain overrides.
+EMAIL_OUTBOX_DOMAIN_RATE = int(os.environ.get("EMAIL_OUTBOX_DOMAIN_RATE", 60))
+EMAIL_OUTBOX_DOMAIN_RATES = {}
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get("EMAIL_OUTBOX_RETENTION_DAYS", 30))
+
 AUTHENTICATION_BACKENDS = [
     "users.auth_backend.TenantAwareAuthBackend",
     "django.contrib.auth.backends.ModelBackend",
@@ -97,6 +194,7 @@ INSTALLED_APPS = [
     "analytics",
     "ai",
     "fhir",
+    "exports",
     "admin_dashboard",
     "api",
 ]
@@ -175,6 +273,27 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Audit entries that failed to insert (common.audit). Each web process replays its
+# own host's spool; mount a shared volume here for the Celery replay task to help.
+AUDIT_SPOOL_DIR = Path(os.environ.get("AUDIT_SPOOL_DIR", BASE_DIR / "var" / "audit_spool"))
+# AuditLog/AnalyticsEvent months older than ARCHIVE_AFTER_MONTHS are exported to
+# ARCHIVE_ROOT (common.partitions). Do not let a web server expose this directory.
+ARCHIVE_ROOT = Path(os.environ.get("ARCHIVE_ROOT", BASE_DIR / "var" / "archives"))
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", 12))
+# FHIR $export output (fhir.bulk_export), served only through the authenticated
+# download endpoint and deleted FHIR_EXPORT_TTL hours after completion.
+FHIR_EXPORT_ROOT = Path(os.environ.get("FHIR_EXPORT_ROOT", BASE_DIR / "var" / "fhir_exports"))
+FHIR_EXPORT_TTL = int(os.environ.get("FHIR_EXPORT_TTL", 24))
+# Uploaded FHIR $import files; each job's directory is removed when it ends.
+FHIR_IMPORT_ROOT = Path(os.environ.get("FHIR_IMPORT_ROOT", BASE_DIR / "var" / "fhir_imports"))
+# CSV/XLSX data exports (exports app): datasets over EXPORT_SYNC_MAX_ROWS rows
+# are written here by Celery and deleted EXPORTS_TTL hours after completion.
+EXPORTS_ROOT = Path(os.environ.get("EXPORTS_ROOT", BASE_DIR / "var" / "exports"))
+EXPORTS_TTL = int(os.environ.get("EXPORTS_TTL", 24))
+EXPORT_SYNC_MAX_ROWS = int(os.environ.get("EXPORT_SYNC_MAX_ROWS", 10_000))
+# Rendered patient invoice PDFs (billing.invoice_pdf), named by content hash and
+# served only through the authenticated invoice PDF view.
+INVOICE_PDF_ROOT = Path(os.environ.get("INVOICE_PDF_ROOT", BASE_DIR / "var" / "invoices"))
 
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY", "")
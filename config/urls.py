@@ -47,10 +47,12 @@ from billing.upgrade_views import upgrade_plan, upgrade_success, upgrade_cancel
 from billing.views import billing_dashboard, office_email_request
 from billing.webhook_views import stripe_webhook
 from billing.patient_billing_views import (
+    accounts_receivable,
     patient_billing,
     patient_invoice_detail,
     patient_invoice_create,
     patient_invoice_mark_paid,
+    patient_invoice_pdf,
 )
 from clinical_records.ai_note_views import ai_note
 from clinical_records.clinic_note_views import clinic_note_create
@@ -63,8 +65,16 @@ from clinical_records.views import (
     clinicalrecord_list,
 )
 from documents.views import document_detail, upload_document
+from exports.views import export_dataset, export_download, export_index
+from fhir.bulk_views import (
+    ExportFileView,
+    ExportKickoffView,
+    ExportStatusView,
+    ImportKickoffView,
+    ImportStatusView,
+)
 from fhir.info_views import fhir_info
-from fhir.views import patient_read
+from fhir.views import EverythingView, SearchView, patient_read
 from labs.views import (
     labresult_create,
     labresult_delete,
@@ -73,6 +83,8 @@ from labs.views import (
     labresult_list,
 )
 from patients.views import (
+    patient_autocomplete,
+    patient_chart_section,
     patient_create,
     patient_delete,
     patient_detail,
@@ -140,13 +152,17 @@ urlpatterns = [
     path("accounts/logout/", auth_views.LogoutView.as_view(), name="logout"),
     path("patients/", patient_list, name="patient_list"),
     path("patients/add/", patient_create, name="patient_create"),
+    path("patients/autocomplete/", patient_autocomplete, name="patient_autocomplete"),
     path("patients/<int:pk>/", patient_detail, name="patient_detail"),
+    path("patients/<int:pk>/chart/<str:section>/", patient_chart_section, name="patient_chart_section"),
     path("patients/<int:pk>/edit/", patient_edit, name="patient_edit"),
     path("patients/<int:pk>/delete/", patient_delete, name="patient_delete"),
+    path("billing/receivables/", accounts_receivable, name="accounts_receivable"),
     path("patients/<int:patient_pk>/billing/", patient_billing, name="patient_billing"),
     path("patients/<int:patient_pk>/billing/invoice/add/", patient_invoice_create, name="patient_invoice_create"),
     path("patients/billing/invoice/<int:invoice_pk>/", patient_invoice_detail, name="patient_invoice_detail"),
     path("patients/billing/invoice/<int:invoice_pk>/mark-paid/", patient_invoice_mark_paid, name="patient_invoice_mark_paid"),
+    path("patients/billing/invoice/<int:invoice_pk>/pdf/", patient_invoice_pdf, name="patient_invoice_pdf"),
     path("appointments/", appointment_list, name="appointment_list"),
     path("appointments/add/", appointment_create, name="appointment_create"),
     path("appointments/<int:pk>/", appointment_detail, name="appointment_detail"),
@@ -199,7 +215,25 @@ urlpatterns = [
     path("analytics/revenue/", revenue_analytics, name="revenue_analytics"),
     path("analytics/users/", user_activity_analytics, name="user_activity_analytics"),
     path("analytics/executive/", executive_summary, name="executive_summary"),
+    # Data exports (admins)
+    path("exports/", export_index, name="export_index"),
+    path(
+        "exports/jobs/<uuid:job_id>/download/",
+        export_download,
+        name="export_download",
+    ),
+    path("exports/<str:name>.<str:fmt>", export_dataset, name="export_dataset"),
+    path("fhir/Patient", SearchView.as_view(resource_type="Patient"), name="fhir_patient_search"),
+    path("fhir/Encounter", SearchView.as_view(resource_type="Encounter"), name="fhir_encounter_search"),
+    path("fhir/Observation", SearchView.as_view(resource_type="Observation"), name="fhir_observation_search"),
     path("fhir/Patient/<int:pk>/", patient_read, name="fhir_patient_read"),
+    path("fhir/Patient/<int:pk>/$everything", EverythingView.as_view(), name="fhir_patient_everything"),
+    path("fhir/$export", ExportKickoffView.as_view(), name="fhir_export"),
+    path("fhir/Patient/$export", ExportKickoffView.as_view(), name="fhir_patient_export"),
+    path("fhir/$export-status/<uuid:job_id>/", ExportStatusView.as_view(), name="fhir_export_status"),
+    path("fhir/$export-files/<uuid:job_id>/<str:filename>", ExportFileView.as_view(), name="fhir_export_file"),
+    path("fhir/$import", ImportKickoffView.as_view(), name="fhir_import"),
+    path("fhir/$import-status/<uuid:job_id>/", ImportStatusView.as_view(), name="fhir_import_status"),
     path("fhir/", fhir_info, name="fhir_info"),
     # Add to urlpatterns:
     path("register-organization/", create_tenant, name="create_tenant"),
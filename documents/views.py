@@ -53,4 +53,14 @@ def upload_document(request):
         # Pre-select patient if provided
         if patient:
             form.fields["patient"].initial = patient
-    return render(request, "documents/upload.html", {"form": form, "patient": patient})
+    # The picker renders only the selected patient and looks up others lazily.
+    selected_patient = patient
+    if request.method == "POST" and str(form["patient"].value()).isdigit():
+        selected_patient = (
+            form.fields["patient"].queryset.filter(pk=form["patient"].value()).first()
+        )
+    return render(
+        request,
+        "documents/upload.html",
+        {"form": form, "patient": patient, "selected_patient": selected_patient},
+    )
@@ -0,0 +1,272 @@
+"""
+Exportable datasets.
+Model datasets read ``.values_list()`` rows through ``.iterator()`` from a
+queryset scoped with ``common.tenant_scope.scope_queryset``, so rows are
+never held in memory. Report datasets flatten an analytics view's (cached)
+context into ``(section, label, value)`` rows.
+"""
+import json
+
+import analytics.views  # noqa: F401  (registers the analytics report builders)
+from analytics.cache import get_cached_context
+from appointments.models import Appointment
+from billing.models import InvoiceLineItem, PatientInvoice
+from clinical_records.models import ClinicalRecord
+from common.tenant_scope import scope_queryset
+from patients.models import Patient
+
+CHUNK_SIZE = 2000
+
+
+class ModelDataset:
+    """A tenant-scoped table of model rows."""
+
+    # Analytics reports are plan-restricted; model tables are not.
+    requires_analytics = False
+
+    def __init__(self, name, title, model, columns, tenant_field="tenant"):
+        self.name = name
+        self.title = title
+        self.model = model
+        # [(header, values_list path)]
+        self.columns = columns
+        self.tenant_field = tenant_field
+
+    @property
+    def header(self):
+        return [header for header, _ in self.columns]
+
+    def queryset(self, user):
+        queryset = scope_queryset(
+            self.model.objects.all(), user, field=self.tenant_field
+        )
+        return queryset.order_by("pk").values_list(*(f for _, f in self.columns))
+
+    def exceeds(self, user, limit):
+        """Whether the export has more than ``limit`` rows (without a full COUNT)."""
+        return self.queryset(user).order_by()[: limit + 1].count() > limit
+
+    def rows(self, user):
+        return self.queryset(user).iterator(chunk_size=CHUNK_SIZE)
+
+
+class ReportDataset:
+    """An analytics view's dataset as ``(section, label, value)`` rows."""
+
+    requires_analytics = True
+    header = ["Section", "Label", "Value"]
+
+    def __init__(self, name, title, view_name, flatten):
+        self.name = name
+        self.title = title
+        self.view_name = view_name
+        self.flatten = flatten
+
+    def exceeds(self, user, limit):
+        return False
+
+    def rows(self, user):
+        return self.flatten(get_cached_context(self.view_name, user.tenant))
+
+
+def _series(context, section, labels_key, data_key):
+    labels = json.loads(context[labels_key])
+    data = json.loads(context[data_key])
+    return [(section, label, value) for label, value in zip(labels, data)]
+
+
+def _counts(section, items, label_key, value_key="count"):
+    return [(section, item[label_key], item[value_key]) for item in items]
+
+
+def _summary(context, keys):
+    return [
+        ("Summary", key.replace("_", " ").capitalize(), context[key]) for key in keys
+    ]
+
+
+def _kpi_rows(context):
+    return _summary(context, list(context))
+
+
+def _patient_rows(context):
+    return [
+        *_summary(context, ["total_patients"]),
+        *_series(
+            context, "New patients", "patient_growth_labels", "patient_growth_data"
+        ),
+        *_counts("Age distribution", context["age_distribution"], "label"),
+    ]
+
+
+def _appointment_rows(context):
+    return [
+        *_summary(context, ["total_appointments"]),
+        *_counts("By status", context["status_distribution"], "status"),
+        *_counts("By weekday (90 days)", context["appointments_by_day"], "label"),
+        *_series(context, "Monthly appointments", "monthly_labels", "monthly_data"),
+        *_counts("By type", context["type_distribution"], "appointment_type"),
+    ]
+
+
+def _revenue_rows(context):
+    top_patients = [
+        (
+            "Top patients",
+            f"{row['patient__first_name']} {row['patient__last_name']}",
+            row["total"],
+        )
+        for row in context["top_patients"]
+    ]
+    return [
+        *_summary(context, ["total_revenue", "avg_payment", "payment_count"]),
+        *_series(context, "Monthly revenue", "revenue_labels", "revenue_data"),
+        *_counts("By currency", context["payment_methods"], "currency", "total"),
+        *top_patients,
+    ]
+
+
+def _user_activity_rows(context):
+    users = context["users"]
+    active_users = [
+        (
+            "Most active users",
+            str(users.get(row["user_id"], row["user_id"])),
+            row["count"],
+        )
+        for row in context["user_activity"]
+    ]
+    return [
+        *_summary(context, ["total_events"]),
+        *_counts("Events by type", context["event_counts"], "event_type"),
+        *active_users,
+        *_series(context, "Daily activity", "activity_labels", "activity_data"),
+    ]
+
+
+DATASETS = {
+    dataset.name: dataset
+    for dataset in (
+        ModelDataset(
+            "patients",
+            "Patients",
+            Patient,
+            [
+                ("ID", "id"),
+                ("Tenant ID", "tenant_id"),
+                ("First name", "first_name"),
+                ("Last name", "last_name"),
+                ("Date of birth", "date_of_birth"),
+                ("Gender", "gender"),
+                ("Email", "email"),
+                ("Phone", "phone"),
+                ("Created", "created_at"),
+                ("Updated", "updated_at"),
+            ],
+        ),
+        ModelDataset(
+            "appointments",
+            "Appointments",
+            Appointment,
+            [
+                ("ID", "id"),
+                ("Tenant ID", "tenant_id"),
+                ("Patient ID", "patient_id"),
+                ("Patient first name", "patient__first_name"),
+                ("Patient last name", "patient__last_name"),
+                ("Scheduled for", "scheduled_for"),
+                ("Status", "status"),
+                ("Created", "created_at"),
+                ("Updated", "updated_at"),
+            ],
+        ),
+        # Metadata only: note contents stay out of bulk exports.
+        ModelDataset(
+            "clinical_records",
+            "Clinical record metadata",
+            ClinicalRecord,
+            [
+                ("ID", "id"),
+                ("Tenant ID", "tenant_id"),
+                ("Patient ID", "patient_id"),
+                ("Note type", "note_type"),
+                ("Created", "created_at"),
+                ("Updated", "updated_at"),
+            ],
+        ),
+        ModelDataset(
+            "invoices",
+            "Patient invoices",
+            PatientInvoice,
+            [
+                ("ID", "id"),
+                ("Tenant ID", "tenant_id"),
+                ("Invoice number", "invoice_number"),
+                ("Patient ID", "patient_id"),
+                ("Status", "status"),
+                ("Issued", "issued_date"),
+                ("Due", "due_date"),
+                ("Paid", "paid_date"),
+                ("Subtotal", "subtotal"),
+                ("Tax", "tax"),
+                ("Total", "total"),
+                ("Currency", "currency"),
+                ("Created", "created_at"),
+                ("Updated", "updated_at"),
+            ],
+        ),
+        ModelDataset(
+            "invoice_line_items",
+            "Invoice line items",
+            InvoiceLineItem,
+            [
+                ("ID", "id"),
+                ("Invoice ID", "invoice_id"),
+                ("Invoice number", "invoice__invoice_number"),
+                ("Description", "description"),
+                ("Service type", "service_type"),
+                ("Quantity", "quantity"),
+                ("Unit price", "unit_price"),
+                ("Total", "total"),
+                ("Created", "created_at"),
+            ],
+            tenant_field="invoice__tenant",
+        ),
+        ReportDataset(
+            "analytics_dashboard",
+            "Analytics: dashboard KPIs",
+            "analytics_dashboard",
+            _kpi_rows,
+        ),
+        ReportDataset(
+            "analytics_patients",
+            "Analytics: patients",
+            "patient_analytics",
+            _patient_rows,
+        ),
+        ReportDataset(
+            "analytics_appointments",
+            "Analytics: appointments",
+            "appointment_analytics",
+            _appointment_rows,
+        ),
+        ReportDataset(
+            "analytics_revenue",
+            "Analytics: revenue",
+            "revenue_analytics",
+            _revenue_rows,
+        ),
+        ReportDataset(
+            "analytics_user_activity",
+            "Analytics: user activity",
+            "user_activity_analytics",
+            _user_activity_rows,
+        ),
+        ReportDataset(
+            "analytics_executive",
+            "Analytics: executive summary",
+            "executive_summary",
+            _kpi_rows,
+        ),
+    )
+}
@@ -0,0 +1,84 @@
+"""
+Background exports. Datasets above EXPORT_SYNC_MAX_ROWS rows are written to
+EXPORTS_ROOT/<job id>/ by a Celery task instead of being streamed in the
+request, and downloaded from there by the user who asked for them. Files are
+deleted EXPORTS_TTL hours after the job finishes.
+"""
+import logging
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .datasets import DATASETS
+from .models import ExportJob
+from .writers import write_csv, write_xlsx
+
+logger = logging.getLogger(__name__)
+
+
+def exports_root():
+    return Path(
+        getattr(settings, "EXPORTS_ROOT", settings.BASE_DIR / "var" / "exports")
+    )
+
+
+def job_dir(job):
+    return exports_root() / str(job.pk)
+
+
+def export_filename(dataset_name, fmt):
+    return f"{dataset_name}-{timezone.localdate():%Y%m%d}.{fmt}"
+
+
+def run_job(job):
+    """Write the export file of ``job`` and mark it completed."""
+    started = ExportJob.objects.filter(pk=job.pk, status=ExportJob.PENDING).update(
+        status=ExportJob.RUNNING
+    )
+    if not started:
+        return
+    dataset = DATASETS[job.dataset]
+    directory = job_dir(job)
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = export_filename(job.dataset, job.format)
+    rows = dataset.rows(job.requested_by)
+    try:
+        if job.format == "xlsx":
+            with open(directory / filename, "wb") as fh:
+                count = write_xlsx(fh, dataset.title, dataset.header, rows)
+        else:
+            with open(directory / filename, "w", encoding="utf-8", newline="") as fh:
+                count = write_csv(fh, dataset.header, rows)
+    except Exception as exc:
+        shutil.rmtree(directory, ignore_errors=True)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.FAILED, error=str(exc), completed_at=timezone.now()
+        )
+        raise
+    ExportJob.objects.filter(pk=job.pk).update(
+        status=ExportJob.COMPLETED,
+        filename=filename,
+        row_count=count,
+        completed_at=timezone.now(),
+    )
+    logger.info(
+        "Export completed",
+        extra={"job_id": str(job.pk), "dataset": job.dataset, "rows": count},
+    )
+
+
+def purge_expired():
+    """Delete finished jobs (and their files) older than EXPORTS_TTL hours."""
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, "EXPORTS_TTL", 24))
+    purged = 0
+    expired = ExportJob.objects.filter(
+        status__in=(ExportJob.COMPLETED, ExportJob.FAILED), completed_at__lt=cutoff
+    )
+    for job in expired.iterator():
+        shutil.rmtree(job_dir(job), ignore_errors=True)
+        job.delete()
+        purged += 1
+    return purged
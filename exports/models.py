@@ -0,0 +1,50 @@
+import uuid
+
+from django.db import models
+
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class ExportJob(models.Model):
+    """A dataset export too large to stream, written to disk by Celery."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    ]
+    FORMAT_CHOICES = [("csv", "CSV"), ("xlsx", "Excel (XLSX)")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="export_jobs",
+    )
+    requested_by = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    dataset = models.CharField(max_length=50)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    row_count = models.PositiveIntegerField(default=0)
+    # File name under EXPORTS_ROOT/<job id>/ once completed.
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["requested_by", "created_at"])]
+
+    def __str__(self):
+        return f"{self.dataset}.{self.format} export ({self.status})"
@@ -0,0 +1,28 @@
+import logging
+
+from celery import shared_task
+
+from .jobs import purge_expired, run_job
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_export_job(job_id):
+    """Write the file of a background dataset export."""
+    job = (
+        ExportJob.objects.select_related("requested_by__tenant")
+        .filter(pk=job_id)
+        .first()
+    )
+    if job is None:
+        logger.warning("Export job vanished", extra={"job_id": str(job_id)})
+        return
+    run_job(job)
+
+
+@shared_task
+def purge_expired_exports():
+    """Remove export jobs and files older than EXPORTS_TTL hours."""
+    return {"purged": purge_expired()}
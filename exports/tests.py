@@ -0,0 +1,121 @@
+import csv
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import InvoiceLineItem, PatientInvoice
+from common.testing import TempRootMixin
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+from .models import ExportJob
+
+
+class DataExportTests(TempRootMixin, TestCase):
+    def setUp(self):
+        self.temp_root("EXPORTS_ROOT")
+
+        self.tenant = Tenant.objects.create(
+            name="Test Clinic", subdomain="test", plan="professional"
+        )
+        other = Tenant.objects.create(name="Other Clinic", subdomain="other")
+        self.admin = CustomUser.objects.create_user(
+            username="admin", password="pw", tenant=self.tenant, role="admin"
+        )
+        self.client.login(username="admin", password="pw")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="=HYPERLINK()",
+            date_of_birth=date(1980, 1, 1),
+        )
+        Patient.objects.create(
+            tenant=other,
+            first_name="Not",
+            last_name="Mine",
+            date_of_birth=date(1990, 1, 1),
+        )
+        Appointment.objects.create(
+            tenant=self.tenant,
+            patient=self.patient,
+            scheduled_for=timezone.now() + timedelta(days=1),
+        )
+        invoice = PatientInvoice.objects.create(
+            tenant=self.tenant,
+            patient=self.patient,
+            invoice_number="INV-1",
+            due_date=date.today(),
+        )
+        InvoiceLineItem.objects.create(
+            invoice=invoice, description="Consultation", unit_price=Decimal("40.00")
+        )
+
+    def download_csv(self, name):
+        response = self.client.get(reverse("export_dataset", args=[name, "csv"]))
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(body)))
+
+    def test_csv_exports_are_streamed_and_tenant_scoped(self):
+        rows = self.download_csv("patients")
+        self.assertEqual(rows[0][:4], ["ID", "Tenant ID", "First name", "Last name"])
+        self.assertEqual(len(rows), 2)
+        # Formula-looking values are neutralized.
+        self.assertEqual(rows[1][3], "'=HYPERLINK()")
+
+        line_items = self.download_csv("invoice_line_items")
+        self.assertEqual(line_items[1][2:4], ["INV-1", "Consultation"])
+        self.assertEqual(len(self.download_csv("appointments")), 2)
+
+    def test_xlsx_and_analytics_exports(self):
+        response = self.client.get(reverse("export_dataset", args=["patients", "xlsx"]))
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        sheet = workbook.active
+        self.assertEqual(sheet.max_row, 2)
+        self.assertEqual(sheet.cell(row=2, column=3).value, "Ada")
+
+        rows = self.download_csv("analytics_patients")
+        self.assertEqual(rows[0], ["Section", "Label", "Value"])
+        self.assertIn(["Summary", "Total patients", "1"], rows)
+
+    @override_settings(EXPORT_SYNC_MAX_ROWS=0)
+    def test_large_exports_run_in_the_background(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(
+                reverse("export_dataset", args=["patients", "csv"])
+            )
+        self.assertRedirects(response, reverse("export_index"))
+        job = ExportJob.objects.get()
+        self.assertEqual((job.status, job.row_count), (ExportJob.COMPLETED, 1))
+
+        index = self.client.get(reverse("export_index"))
+        download_url = reverse("export_download", args=[job.pk])
+        self.assertContains(index, download_url)
+        download = self.client.get(download_url)
+        body = b"".join(download.streaming_content).decode("utf-8-sig")
+        self.assertIn("Ada", body)
+
+        CustomUser.objects.create_user(
+            username="admin2", password="pw", tenant=self.tenant, role="admin"
+        )
+        self.client.login(username="admin2", password="pw")
+        self.assertEqual(self.client.get(download_url).status_code, 404)
+
+    def test_exports_require_an_admin(self):
+        CustomUser.objects.create_user(
+            username="staff", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="staff", password="pw")
+        response = self.client.get(reverse("export_dataset", args=["patients", "csv"]))
+        self.assertRedirects(
+            response, reverse("dashboard"), fetch_redirect_response=False
+        )
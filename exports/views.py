@@ -0,0 +1,125 @@
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+
+from common.audit import log_audit
+
+from .datasets import DATASETS
+from .jobs import export_filename, job_dir
+from .models import ExportJob
+from .tasks import run_export_job
+from .writers import CONTENT_TYPES, iter_csv, write_xlsx
+
+ANALYTICS_PLANS = ("professional", "enterprise")
+
+
+def can_export(user):
+    return bool(
+        user.is_superuser
+        or getattr(user, "platform_admin", False)
+        or getattr(user, "role", None) == "admin"
+    )
+
+
+def dataset_allowed(user, dataset):
+    if not dataset.requires_analytics:
+        return True
+    tenant = getattr(user, "tenant", None)
+    return tenant is not None and tenant.plan in ANALYTICS_PLANS
+
+
+def export_admin_required(view_func):
+    @wraps(view_func)
+    @login_required
+    def _wrapped_view(request, *args, **kwargs):
+        if not can_export(request.user):
+            messages.error(request, "You must be an administrator to export data.")
+            return redirect("dashboard")
+        return view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+@export_admin_required
+def export_index(request):
+    """Datasets the user may export, and their recent background exports."""
+    datasets = [d for d in DATASETS.values() if dataset_allowed(request.user, d)]
+    jobs = list(ExportJob.objects.filter(requested_by=request.user)[:20])
+    return render(
+        request,
+        "exports/index.html",
+        {
+            "datasets": datasets,
+            "jobs": jobs,
+            "formats": ExportJob.FORMAT_CHOICES,
+            "jobs_running": any(
+                job.status in (ExportJob.PENDING, ExportJob.RUNNING) for job in jobs
+            ),
+        },
+    )
+
+
+@export_admin_required
+def export_dataset(request, name, fmt):
+    """
+    Download a dataset as CSV or XLSX. Small exports are produced in the
+    request (CSV is streamed row by row); larger ones are queued.
+    """
+    dataset = DATASETS.get(name)
+    if dataset is None or fmt not in CONTENT_TYPES:
+        raise Http404("Unknown export")
+    user = request.user
+    if not dataset_allowed(user, dataset):
+        raise Http404("Unknown export")
+    log_audit("EXPORT", user=user, details=f"{dataset.title} ({fmt})")
+
+    if dataset.exceeds(user, getattr(settings, "EXPORT_SYNC_MAX_ROWS", 10_000)):
+        job = ExportJob.objects.create(
+            tenant=user.tenant, requested_by=user, dataset=name, format=fmt
+        )
+        transaction.on_commit(lambda: run_export_job.delay(str(job.pk)))
+        messages.info(
+            request,
+            f"{dataset.title} is large, so it is being prepared in the background. "
+            "It will be ready to download below.",
+        )
+        return redirect("export_index")
+
+    filename = export_filename(name, fmt)
+    if fmt == "csv":
+        response = StreamingHttpResponse(
+            iter_csv(dataset.header, dataset.rows(user)),
+            content_type=CONTENT_TYPES["csv"],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    # The workbook needs a seekable file; rows are spooled by openpyxl.
+    fh = tempfile.TemporaryFile()
+    write_xlsx(fh, dataset.title, dataset.header, dataset.rows(user))
+    fh.seek(0)
+    return FileResponse(
+        fh, as_attachment=True, filename=filename, content_type=CONTENT_TYPES["xlsx"]
+    )
+
+
+@export_admin_required
+def export_download(request, job_id):
+    """Download the file of a finished background export."""
+    job = get_object_or_404(
+        ExportJob, pk=job_id, requested_by=request.user, status=ExportJob.COMPLETED
+    )
+    path = job_dir(job) / job.filename
+    if not path.exists():
+        raise Http404("Export file not found")
+    return FileResponse(
+        open(path, "rb"),
+        as_attachment=True,
+        filename=job.filename,
+        content_type=CONTENT_TYPES[job.format],
+    )
@@ -0,0 +1,75 @@
+"""
+CSV and XLSX writers for dataset rows.
+CSV is produced line by line, so it can be streamed straight into a
+``StreamingHttpResponse``. XLSX goes through an openpyxl write-only workbook,
+which spools rows to a temporary file instead of building the sheet in
+memory; the finished workbook is written to a file-like object.
+"""
+import csv
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from django.utils import timezone
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Spreadsheet apps run cells starting with these as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class _Echo:
+    """A file-like object whose ``write`` returns what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def _xlsx_value(value):
+    if isinstance(value, str) and value.startswith("="):
+        return "'" + value
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        # Excel has no time zones.
+        return timezone.make_naive(value)
+    return value
+
+
+def iter_csv(header, rows):
+    """Yield the CSV text of ``header`` and ``rows``, one line at a time."""
+    writer = csv.writer(_Echo())
+    # The BOM makes Excel read the file as UTF-8.
+    yield "\ufeff" + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def write_csv(fh, header, rows):
+    """Write CSV text to ``fh``; returns the number of data rows."""
+    count = -1
+    for count, line in enumerate(iter_csv(header, rows)):
+        fh.write(line)
+    return count
+
+
+def write_xlsx(fh, title, header, rows):
+    """Write an XLSX workbook to ``fh``; returns the number of data rows."""
+    workbook = Workbook(write_only=True)
+    # Sheet titles are limited to 31 characters and may not contain ":".
+    sheet = workbook.create_sheet(title=title.replace(":", "")[:31])
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+        count += 1
+    workbook.save(fh)
+    return count
@@ -0,0 +1,210 @@
+"""
+FHIR Bulk Data ``$export``.
+A job writes one gzip-compressed NDJSON file per resource type under
+FHIR_EXPORT_ROOT/<job id>/. Rows are read with ``.iterator(chunk_size=...)``
+and written one line at a time, so memory stays flat however many resources a
+tenant has. Files are kept for FHIR_EXPORT_TTL hours.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from appointments.models import Appointment
+from documents.models import Document
+from labs.models import LabResult
+from patients.models import Patient
+
+from .models import BulkExportJob
+from .utils import (
+    appointment_to_fhir_encounter,
+    document_to_fhir_document_reference,
+    lab_result_to_fhir_observation,
+    patient_to_fhir,
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+# Cancellation is checked this often (in resources) while a file is written.
+CANCEL_CHECK_EVERY = 20_000
+NDJSON_FORMATS = ("application/fhir+ndjson", "application/ndjson", "ndjson")
+
+
+def _patients(tenant_id, since):
+    queryset = Patient.objects.filter(tenant_id=tenant_id).only(
+        "id",
+        "tenant_id",
+        "first_name",
+        "last_name",
+        "date_of_birth",
+        "email",
+        "phone",
+        "updated_at",
+    )
+    return queryset.filter(updated_at__gte=since) if since else queryset
+
+
+def _encounters(tenant_id, since):
+    queryset = Appointment.objects.filter(tenant_id=tenant_id).only(
+        "id", "patient_id", "scheduled_for", "status", "updated_at"
+    )
+    return queryset.filter(updated_at__gte=since) if since else queryset
+
+
+def _observations(tenant_id, since):
+    queryset = LabResult.objects.filter(tenant_id=tenant_id)
+    return queryset.filter(updated_at__gte=since) if since else queryset
+
+
+def _document_references(tenant_id, since):
+    queryset = Document.objects.filter(patient__tenant_id=tenant_id).only(
+        "id", "patient_id", "file", "uploaded_at", "description"
+    )
+    return queryset.filter(uploaded_at__gte=since) if since else queryset
+
+
+# FHIR resource type -> (queryset for a tenant and _since, mapper)
+EXPORT_TYPES = {
+    "Patient": (_patients, patient_to_fhir),
+    "Encounter": (_encounters, appointment_to_fhir_encounter),
+    "Observation": (_observations, lab_result_to_fhir_observation),
+    "DocumentReference": (_document_references, document_to_fhir_document_reference),
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_root():
+    return Path(
+        getattr(
+            settings, "FHIR_EXPORT_ROOT", settings.BASE_DIR / "var" / "fhir_exports"
+        )
+    )
+
+
+def export_dir(job):
+    return export_root() / str(job.pk)
+
+
+def output_filename(resource_type):
+    return f"{resource_type}.ndjson.gz"
+
+
+def write_ndjson(path, resources, on_progress=None):
+    """Write ``resources`` to ``path`` as gzip NDJSON; returns the line count."""
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        for resource in resources:
+            fh.write(json.dumps(resource, cls=DjangoJSONEncoder, separators=(",", ":")))
+            fh.write("\n")
+            count += 1
+            if on_progress and count % CANCEL_CHECK_EVERY == 0:
+                on_progress(count)
+    os.replace(tmp, path)
+    return count
+
+
+def _check_cancelled(job):
+    if BulkExportJob.objects.filter(pk=job.pk, status=BulkExportJob.CANCELLED).exists():
+        raise ExportCancelled
+
+
+def run_export(job):
+    """Write every requested resource type of ``job`` and mark it completed."""
+    job.transaction_time = timezone.now()
+    started = BulkExportJob.objects.filter(
+        pk=job.pk, status=BulkExportJob.ACCEPTED
+    ).update(status=BulkExportJob.IN_PROGRESS, transaction_time=job.transaction_time)
+    if not started:
+        return  # cancelled before a worker picked it up
+    directory = export_dir(job)
+    directory.mkdir(parents=True, exist_ok=True)
+    output = []
+    types = job.types
+    try:
+        for index, resource_type in enumerate(types, start=1):
+            _check_cancelled(job)
+            BulkExportJob.objects.filter(pk=job.pk).update(
+                progress=f"Exporting {resource_type} ({index}/{len(types)})"
+            )
+            build_queryset, mapper = EXPORT_TYPES[resource_type]
+            rows = (
+                build_queryset(job.tenant_id, job.since)
+                .order_by("pk")
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            path = directory / output_filename(resource_type)
+            count = write_ndjson(
+                path, map(mapper, rows), on_progress=lambda _: _check_cancelled(job)
+            )
+            if count:
+                output.append(
+                    {"type": resource_type, "file": path.name, "count": count}
+                )
+            else:
+                path.unlink()
+    except ExportCancelled:
+        shutil.rmtree(directory, ignore_errors=True)
+        logger.info("FHIR export cancelled", extra={"job_id": str(job.pk)})
+        return
+    except Exception as exc:
+        shutil.rmtree(directory, ignore_errors=True)
+        BulkExportJob.objects.filter(pk=job.pk).update(
+            status=BulkExportJob.FAILED, error=str(exc), completed_at=timezone.now()
+        )
+        raise
+
+    # A DELETE may have landed after the last check; never resurrect the job.
+    updated = BulkExportJob.objects.filter(
+        pk=job.pk, status=BulkExportJob.IN_PROGRESS
+    ).update(
+        status=BulkExportJob.COMPLETED,
+        output=output,
+        progress="",
+        completed_at=timezone.now(),
+    )
+    if not updated:
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+    logger.info(
+        "FHIR export completed",
+        extra={
+            "job_id": str(job.pk),
+            "tenant_id": job.tenant_id,
+            "resources": sum(item["count"] for item in output),
+        },
+    )
+
+
+def delete_export(job):
+    shutil.rmtree(export_dir(job), ignore_errors=True)
+
+
+def expires_at(job):
+    hours = getattr(settings, "FHIR_EXPORT_TTL", 24)
+    return (job.completed_at or job.created_at) + timedelta(hours=hours)
+
+
+def purge_expired():
+    """Delete finished jobs (and their files) older than FHIR_EXPORT_TTL hours."""
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, "FHIR_EXPORT_TTL", 24))
+    expired = BulkExportJob.objects.exclude(
+        status__in=BulkExportJob.ACTIVE_STATUSES
+    ).filter(completed_at__lt=cutoff)
+    purged = 0
+    for job in expired.iterator():
+        delete_export(job)
+        job.delete()
+        purged += 1
+    return purged
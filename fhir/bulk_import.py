@@ -0,0 +1,417 @@
+"""
+FHIR bulk ``$import`` of NDJSON Patient, Encounter and Observation resources.
+Uploaded files are kept under FHIR_IMPORT_ROOT/<job id>/ until the job ends
+and read one line at a time (plain or gzip). Patients are imported in a
+first pass so that ``subject`` references in the second pass can point at
+them. Each pass validates CHUNK_SIZE lines into unsaved model instances and
+writes them with ``bulk_create``, one transaction per chunk, so a bad line is
+reported without stopping the job and memory stays flat however big the
+files are.
+"""
+import gzip
+import json
+import logging
+import shutil
+from collections import Counter
+from datetime import datetime, time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from appointments.models import Appointment
+from labs.models import LabResult
+from patients.autocomplete import invalidate_autocomplete
+from patients.models import Patient
+from patients.search import build_search_text
+
+from .models import BulkImportJob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+# Only this many rejected lines are kept on the job; the rest are counted.
+MAX_ERRORS = 100
+IMPORT_TYPES = ("Patient", "Encounter", "Observation")
+# Resource types written in each pass over the files.
+PASSES = (("Patient",), ("Encounter", "Observation"))
+
+GENDERS = {"male": "M", "female": "F", "other": "O", "unknown": "P"}
+# Encounter.status -> Appointment.status (see fhir.utils.ENCOUNTER_STATUS)
+APPOINTMENT_STATUSES = {
+    "planned": "scheduled",
+    "arrived": "arrived",
+    "in-progress": "in_progress",
+    "finished": "completed",
+    "cancelled": "cancelled",
+}
+
+
+class InvalidResource(ValueError):
+    """A line that cannot be imported; recorded on the job and skipped."""
+
+
+def import_root():
+    return Path(
+        getattr(
+            settings, "FHIR_IMPORT_ROOT", settings.BASE_DIR / "var" / "fhir_imports"
+        )
+    )
+
+
+def import_dir(job):
+    return import_root() / str(job.pk)
+
+
+def save_upload(job, index, chunks):
+    """Write one uploaded file (an iterable of byte chunks) for ``job``."""
+    directory = import_dir(job)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f"{index:04d}.ndjson", "wb") as fh:
+        for chunk in chunks:
+            fh.write(chunk)
+
+
+def read_ndjson(path):
+    """Yield ``(line number, resource)``; unparseable lines yield an error."""
+    with open(path, "rb") as probe:
+        gzipped = probe.read(2) == b"\x1f\x8b"
+    opener = gzip.open if gzipped else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as fh:
+        for number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                resource = json.loads(line)
+            except ValueError:
+                yield number, InvalidResource("Line is not valid JSON.")
+                continue
+            if not isinstance(resource, dict):
+                resource = InvalidResource("Line is not a FHIR resource.")
+            yield number, resource
+
+
+def _string(value, field, max_length):
+    value = (value or "").strip()
+    if len(value) > max_length:
+        raise InvalidResource(f"{field} is longer than {max_length} characters.")
+    return value
+
+
+def _parse_moment(value, field):
+    """A FHIR dateTime (a bare date means local midnight)."""
+    try:
+        moment = parse_datetime(value or "")
+        if moment is None:
+            day = parse_date(value or "")
+            if day is None:
+                raise ValueError
+            moment = datetime.combine(day, time.min)
+    except ValueError:
+        raise InvalidResource(f"{field} must be a FHIR dateTime.")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class PatientReferences:
+    """
+    Resolves ``Patient/<id>`` references for one import. Ids of patients
+    created by the job are matched first; anything else must be the id of an
+    existing patient of the tenant, looked up once per chunk.
+    """
+
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.imported = {}
+        self.existing = set()
+
+    def add(self, source_id, pk):
+        self.imported[f"Patient/{source_id}"] = pk
+
+    def prefetch(self, references):
+        ids = {
+            int(ref[8:])
+            for ref in references
+            if ref not in self.imported
+            and ref.startswith("Patient/")
+            and ref[8:].isdigit()
+        }
+        ids -= self.existing
+        if ids:
+            self.existing.update(
+                Patient.objects.filter(tenant_id=self.tenant_id, pk__in=ids)
+                .values_list("pk", flat=True)
+                .iterator()
+            )
+
+    def resolve(self, resource):
+        reference = _subject(resource)
+        if reference in self.imported:
+            return self.imported[reference]
+        ref_id = reference[8:]
+        if ref_id.isdigit() and int(ref_id) in self.existing:
+            return int(ref_id)
+        raise InvalidResource(f"Unresolved subject reference {reference!r}.")
+
+
+def _subject(resource):
+    subject = resource.get("subject")
+    reference = subject.get("reference") if isinstance(subject, dict) else None
+    if not isinstance(reference, str) or not reference.startswith("Patient/"):
+        raise InvalidResource("subject must reference a Patient.")
+    return reference
+
+
+def build_patient(resource, tenant_id):
+    names = resource.get("name") or [{}]
+    name = next((n for n in names if n.get("use") == "official"), names[0])
+    first_name = _string(" ".join(name.get("given") or []), "Patient.name.given", 100)
+    last_name = _string(name.get("family"), "Patient.name.family", 100)
+    if not (first_name or last_name):
+        raise InvalidResource("Patient.name is required.")
+    try:
+        date_of_birth = parse_date(resource.get("birthDate") or "")
+    except ValueError:
+        date_of_birth = None
+    if date_of_birth is None:
+        raise InvalidResource("Patient.birthDate must be a FHIR date.")
+
+    telecom = {}
+    for contact in resource.get("telecom") or []:
+        telecom.setdefault(contact.get("system"), contact.get("value"))
+    email = _string(telecom.get("email"), "Patient email", 254) or None
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise InvalidResource(f"Invalid email {email!r}.")
+
+    patient = Patient(
+        tenant_id=tenant_id,
+        first_name=first_name,
+        last_name=last_name,
+        date_of_birth=date_of_birth,
+        gender=GENDERS.get(resource.get("gender")),
+        email=email,
+        phone=_string(telecom.get("phone"), "Patient phone", 20) or None,
+    )
+    # bulk_create skips Patient.save(), which normally fills this in.
+    patient.search_text = build_search_text(patient)
+    return patient
+
+
+def build_appointment(resource, tenant_id, references):
+    status = resource.get("status")
+    if status not in APPOINTMENT_STATUSES:
+        raise InvalidResource(f"Unsupported Encounter.status {status!r}.")
+    period = resource.get("period") or {}
+    return Appointment(
+        tenant_id=tenant_id,
+        patient_id=references.resolve(resource),
+        scheduled_for=_parse_moment(period.get("start"), "Encounter.period.start"),
+        status=APPOINTMENT_STATUSES[status],
+    )
+
+
+def _observation_value(resource):
+    if resource.get("valueString"):
+        return resource["valueString"]
+    quantity = resource.get("valueQuantity")
+    if isinstance(quantity, dict) and quantity.get("value") is not None:
+        return f"{quantity['value']} {quantity.get('unit', '')}".strip()
+    concept = resource.get("valueCodeableConcept")
+    if isinstance(concept, dict):
+        codings = concept.get("coding") or [{}]
+        return concept.get("text") or codings[0].get("display")
+    for key in ("valueInteger", "valueBoolean", "valueDateTime"):
+        if resource.get(key) is not None:
+            return str(resource[key])
+    return None
+
+
+def build_lab_result(resource, tenant_id, references):
+    result = _observation_value(resource)
+    if not result:
+        raise InvalidResource("Observation has no supported value[x].")
+    return LabResult(
+        tenant_id=tenant_id, patient_id=references.resolve(resource), result=result
+    )
+
+
+class ImportRun:
+    """The counters and references of one job while its files are read."""
+
+    def __init__(self, job):
+        self.job = job
+        self.references = PatientReferences(job.tenant_id)
+        self.counts = Counter()
+        self.error_count = 0
+        self.errors = []
+
+    def reject(self, filename, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"file": filename, "line": line, "message": message})
+
+    def build(self, filename, number, builder, *args):
+        """Run ``builder``; a rejected line is recorded and None returned."""
+        try:
+            return builder(*args)
+        except InvalidResource as exc:
+            self.reject(filename, number, str(exc))
+        except (AttributeError, TypeError):
+            # A field of the wrong JSON type somewhere in the resource.
+            self.reject(filename, number, "Malformed resource.")
+        return None
+
+    def import_chunk(self, filename, lines, types):
+        """Validate and write one chunk of ``(line number, resource)``."""
+        first_pass = "Patient" in types
+        wanted = []
+        for number, resource in lines:
+            if isinstance(resource, InvalidResource):
+                if first_pass:
+                    self.reject(filename, number, str(resource))
+                continue
+            resource_type = resource.get("resourceType")
+            if not isinstance(resource_type, str):
+                if first_pass:
+                    self.reject(filename, number, "resourceType must be a string.")
+                continue
+            if resource_type in types:
+                wanted.append((number, resource))
+            elif first_pass and resource_type not in IMPORT_TYPES:
+                self.reject(
+                    filename, number, f"Unsupported resourceType {resource_type!r}."
+                )
+        if first_pass:
+            self._write_patients(filename, wanted)
+        else:
+            self._write_clinical(filename, wanted)
+
+    def _write_patients(self, filename, lines):
+        patients, source_ids, seen = [], [], set()
+        for number, resource in lines:
+            source_id = resource.get("id")
+            if source_id is not None and not isinstance(source_id, str):
+                self.reject(filename, number, "Patient.id must be a string.")
+                continue
+            if source_id and (
+                source_id in seen or f"Patient/{source_id}" in self.references.imported
+            ):
+                self.reject(filename, number, f"Duplicate Patient id {source_id!r}.")
+                continue
+            patient = self.build(
+                filename, number, build_patient, resource, self.job.tenant_id
+            )
+            if patient is not None:
+                patients.append(patient)
+                source_ids.append(source_id)
+                seen.add(source_id)
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients, batch_size=BATCH_SIZE)
+        for source_id, patient in zip(source_ids, patients):
+            if source_id:
+                self.references.add(source_id, patient.pk)
+        self.counts["Patient"] += len(patients)
+
+    def _write_clinical(self, filename, lines):
+        references = []
+        for _, resource in lines:
+            try:
+                references.append(_subject(resource))
+            except (InvalidResource, AttributeError):
+                pass
+        self.references.prefetch(references)
+
+        builders = {"Encounter": build_appointment, "Observation": build_lab_result}
+        objects = {"Encounter": [], "Observation": []}
+        for number, resource in lines:
+            resource_type = resource["resourceType"]
+            obj = self.build(
+                filename,
+                number,
+                builders[resource_type],
+                resource,
+                self.job.tenant_id,
+                self.references,
+            )
+            if obj is not None:
+                objects[resource_type].append(obj)
+        with transaction.atomic():
+            Appointment.objects.bulk_create(objects["Encounter"], batch_size=BATCH_SIZE)
+            LabResult.objects.bulk_create(objects["Observation"], batch_size=BATCH_SIZE)
+        for resource_type, created in objects.items():
+            self.counts[resource_type] += len(created)
+
+    def save_progress(self, progress):
+        BulkImportJob.objects.filter(pk=self.job.pk).update(
+            progress=progress,
+            counts=dict(self.counts),
+            error_count=self.error_count,
+            errors=self.errors,
+        )
+
+
+def _chunks(lines, size):
+    while chunk := list(islice(lines, size)):
+        yield chunk
+
+
+def run_import(job):
+    """Import every uploaded file of ``job`` and mark it completed."""
+    job.transaction_time = timezone.now()
+    started = BulkImportJob.objects.filter(
+        pk=job.pk, status=BulkImportJob.ACCEPTED
+    ).update(status=BulkImportJob.IN_PROGRESS, transaction_time=job.transaction_time)
+    if not started:
+        return
+    run = ImportRun(job)
+    files = sorted(import_dir(job).glob("*.ndjson"))
+    try:
+        for types in PASSES:
+            for path in files:
+                for chunk in _chunks(read_ndjson(path), CHUNK_SIZE):
+                    run.import_chunk(path.name, chunk, types)
+                    run.save_progress(
+                        f"Importing {'/'.join(types)}: "
+                        f"{sum(run.counts.values())} resources"
+                    )
+            if types == ("Patient",) and run.counts["Patient"]:
+                # bulk_create sends no post_save, which normally does this.
+                invalidate_autocomplete(job.tenant_id)
+    except Exception as exc:
+        run.save_progress("")
+        BulkImportJob.objects.filter(pk=job.pk).update(
+            status=BulkImportJob.FAILED, error=str(exc), completed_at=timezone.now()
+        )
+        raise
+    finally:
+        delete_import(job)
+
+    BulkImportJob.objects.filter(pk=job.pk).update(
+        status=BulkImportJob.COMPLETED,
+        progress="",
+        counts=dict(run.counts),
+        error_count=run.error_count,
+        errors=run.errors,
+        completed_at=timezone.now(),
+    )
+    logger.info(
+        "FHIR import completed",
+        extra={
+            "job_id": str(job.pk),
+            "tenant_id": job.tenant_id,
+            "resources": sum(run.counts.values()),
+            "rejected": run.error_count,
+        },
+    )
+
+
+def delete_import(job):
+    shutil.rmtree(import_dir(job), ignore_errors=True)
@@ -0,0 +1,291 @@
+"""
+FHIR Bulk Data endpoints: ``$export`` (kick-off, status and file download)
+and ``$import`` (upload and status).
+See http://hl7.org/fhir/uv/bulkdata/export.html. Authentication goes through
+the API's JWT/session authentication; jobs are scoped to the caller's
+tenant (platform admins may pass ``tenant_id``).
+"""
+import gzip
+
+from rest_framework.parsers import MultiPartParser
+
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from common.http import CHUNK_SIZE, ranged_file_response
+
+from .bulk_export import (
+    EXPORT_TYPES,
+    NDJSON_FORMATS,
+    delete_export,
+    expires_at,
+    export_dir,
+)
+from .bulk_import import IMPORT_TYPES, delete_import, save_upload
+from .models import BulkExportJob, BulkImportJob
+from .responses import FHIR_NDJSON, fhir_response, operation_outcome
+from .search import SearchError, parse_instant
+from .tasks import run_bulk_export, run_bulk_import
+from .views import FHIRView, request_tenant_id
+
+RETRY_AFTER = "5"
+IMPORT_CONTENT_TYPES = (
+    "application/fhir+ndjson",
+    "application/ndjson",
+    "application/x-ndjson",
+)
+
+
+def _get_job(request, job_id, model=BulkExportJob):
+    jobs = model.objects.all()
+    if not getattr(request.user, "platform_admin", False):
+        jobs = jobs.filter(tenant_id=request.user.tenant_id)
+    job = jobs.filter(pk=job_id).first()
+    if job is None or job.status == model.CANCELLED:
+        raise Http404("Bulk data job not found")
+    return job
+
+
+def _in_progress(job):
+    return HttpResponse(
+        status=202,
+        headers={
+            "X-Progress": job.progress or job.get_status_display(),
+            "Retry-After": RETRY_AFTER,
+        },
+    )
+
+
+def _already_running(model, tenant_id, operation):
+    if not model.objects.filter(
+        tenant_id=tenant_id, status__in=model.ACTIVE_STATUSES
+    ).exists():
+        return None
+    return operation_outcome(
+        f"An {operation} for this tenant is already running.",
+        status=429,
+        code="throttled",
+        headers={"Retry-After": "60"},
+    )
+
+
+class ExportKickoffView(FHIRView):
+    """``GET /fhir/$export``: queue an export of the caller's tenant."""
+
+    def get(self, request):
+        if "respond-async" not in request.headers.get("Prefer", ""):
+            return operation_outcome("The Prefer: respond-async header is required.")
+        output_format = request.GET.get("_outputFormat")
+        if output_format and output_format not in NDJSON_FORMATS:
+            return operation_outcome(f"Unsupported _outputFormat {output_format!r}.")
+
+        types = [
+            t.strip() for t in request.GET.get("_type", "").split(",") if t.strip()
+        ]
+        unknown = [t for t in types if t not in EXPORT_TYPES]
+        if unknown:
+            return operation_outcome(
+                f"Unsupported _type: {', '.join(unknown)}.", code="not-supported"
+            )
+        types = list(dict.fromkeys(types)) or list(EXPORT_TYPES)
+
+        since = None
+        if request.GET.get("_since"):
+            try:
+                since = parse_instant(request.GET["_since"])
+            except SearchError as exc:
+                return operation_outcome(str(exc))
+
+        tenant_id = request_tenant_id(request)
+        if not tenant_id:
+            return operation_outcome("No tenant to export.")
+        running = _already_running(BulkExportJob, tenant_id, "export")
+        if running:
+            return running
+
+        job = BulkExportJob.objects.create(
+            tenant_id=tenant_id,
+            requested_by=request.user,
+            request_url=request.build_absolute_uri(),
+            resource_types=",".join(types),
+            since=since,
+        )
+        transaction.on_commit(lambda: run_bulk_export.delay(str(job.pk)))
+        status_url = request.build_absolute_uri(
+            reverse("fhir_export_status", args=[job.pk])
+        )
+        return HttpResponse(status=202, headers={"Content-Location": status_url})
+
+
+class ExportStatusView(FHIRView):
+    """Poll (GET) or cancel (DELETE) an export job."""
+
+    def get(self, request, job_id):
+        job = _get_job(request, job_id)
+        if job.status in BulkExportJob.ACTIVE_STATUSES:
+            return _in_progress(job)
+        if job.status == BulkExportJob.FAILED:
+            return operation_outcome(
+                f"Export failed: {job.error}", status=500, code="exception"
+            )
+        manifest = {
+            "transactionTime": job.transaction_time.isoformat(),
+            "request": job.request_url,
+            "requiresAccessToken": True,
+            "output": [
+                {
+                    "type": item["type"],
+                    "url": request.build_absolute_uri(
+                        reverse("fhir_export_file", args=[job.pk, item["file"]])
+                    ),
+                    "count": item["count"],
+                }
+                for item in job.output
+            ],
+            "error": [],
+        }
+        return fhir_response(
+            manifest, headers={"Expires": http_date(expires_at(job).timestamp())}
+        )
+
+    def delete(self, request, job_id):
+        job = _get_job(request, job_id)
+        BulkExportJob.objects.filter(pk=job.pk).update(
+            status=BulkExportJob.CANCELLED, completed_at=timezone.now()
+        )
+        if job.status not in BulkExportJob.ACTIVE_STATUSES:
+            delete_export(job)
+        # A running export notices the cancellation and removes its own files.
+        return HttpResponse(status=202)
+
+
+def _gunzip(path):
+    with gzip.open(path, "rb") as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            yield chunk
+
+
+class ExportFileView(FHIRView):
+    """Download one NDJSON output file, gzip-encoded with Range support."""
+
+    def get(self, request, job_id, filename):
+        job = _get_job(request, job_id)
+        if job.status != BulkExportJob.COMPLETED or filename not in {
+            item["file"] for item in job.output
+        }:
+            raise Http404("Export file not found")
+        path = export_dir(job) / filename
+        if not path.exists():
+            raise Http404("Export file not found")
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            return ranged_file_response(
+                request,
+                path,
+                FHIR_NDJSON,
+                headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+            )
+        return StreamingHttpResponse(
+            _gunzip(path), content_type=FHIR_NDJSON, headers={"Vary": "Accept-Encoding"}
+        )
+
+
+class ImportKickoffView(FHIRView):
+    """
+    ``POST /fhir/$import``: queue a load of NDJSON Patient, Encounter and
+    Observation resources, sent as the request body or as multipart ``file``
+    uploads (plain or gzip).
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        if "respond-async" not in request.headers.get("Prefer", ""):
+            return operation_outcome("The Prefer: respond-async header is required.")
+        tenant_id = request_tenant_id(request)
+        if not tenant_id:
+            return operation_outcome("No tenant to import into.")
+        running = _already_running(BulkImportJob, tenant_id, "import")
+        if running:
+            return running
+
+        if request.content_type.startswith("multipart/"):
+            sources = [upload.chunks() for upload in request.FILES.getlist("file")]
+        elif request.content_type.split(";")[0].strip() in IMPORT_CONTENT_TYPES:
+            stream = request.stream
+            sources = [iter(lambda: stream.read(CHUNK_SIZE), b"")] if stream else []
+        else:
+            return operation_outcome(
+                "Send NDJSON as the request body or as multipart 'file' uploads.",
+                status=415,
+                code="not-supported",
+            )
+        if not sources:
+            return operation_outcome("No NDJSON to import.")
+
+        job = BulkImportJob.objects.create(
+            tenant_id=tenant_id,
+            requested_by=request.user,
+            request_url=request.build_absolute_uri(),
+        )
+        try:
+            for index, chunks in enumerate(sources):
+                save_upload(job, index, chunks)
+        except Exception:
+            delete_import(job)
+            job.delete()
+            raise
+        transaction.on_commit(lambda: run_bulk_import.delay(str(job.pk)))
+        status_url = request.build_absolute_uri(
+            reverse("fhir_import_status", args=[job.pk])
+        )
+        return HttpResponse(status=202, headers={"Content-Location": status_url})
+
+
+class ImportStatusView(FHIRView):
+    """Poll an import job; once done, report counts and rejected lines."""
+
+    def get(self, request, job_id):
+        job = _get_job(request, job_id, model=BulkImportJob)
+        if job.status in BulkImportJob.ACTIVE_STATUSES:
+            return _in_progress(job)
+        if job.status == BulkImportJob.FAILED:
+            return operation_outcome(
+                f"Import failed: {job.error}", status=500, code="exception"
+            )
+        errors = []
+        if job.error_count:
+            errors.append(
+                {
+                    "type": "OperationOutcome",
+                    "count": job.error_count,
+                    "outcome": {
+                        "resourceType": "OperationOutcome",
+                        "issue": [
+                            {
+                                "severity": "error",
+                                "code": "invalid",
+                                "diagnostics": (
+                                    f"{item['file']} line {item['line']}: "
+                                    f"{item['message']}"
+                                ),
+                            }
+                            for item in job.errors
+                        ],
+                    },
+                }
+            )
+        return fhir_response(
+            {
+                "transactionTime": job.transaction_time.isoformat(),
+                "request": job.request_url,
+                "output": [
+                    {"type": resource_type, "count": job.counts[resource_type]}
+                    for resource_type in IMPORT_TYPES
+                    if job.counts.get(resource_type)
+                ],
+                "error": errors,
+            }
+        )
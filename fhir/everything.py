@@ -0,0 +1,122 @@
+"""
+Patient ``$everything``.
+The Bundle is written to the response as it is built: one query per
+resource type (plus one for invoice line items), each read with
+``.iterator(chunk_size=...)`` and serialized entry by entry, so a patient
+with years of history costs the same memory and query count as a new one.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from appointments.models import Appointment
+from billing.models import PatientInvoice
+from clinical_records.models import ClinicalRecord
+from documents.models import Document
+from labs.models import LabResult
+from referrals.models import Referral
+
+from .utils import (
+    appointment_to_fhir_appointment,
+    clinical_record_to_fhir_composition,
+    document_to_fhir_document_reference,
+    invoice_to_fhir_invoice,
+    lab_result_to_fhir_observation,
+    patient_to_fhir,
+    referral_to_fhir_service_request,
+)
+
+CHUNK_SIZE = 500
+# Entries are flushed to the client in buffers of about this many characters.
+FLUSH_SIZE = 64 * 1024
+
+
+def _compositions(patient):
+    return ClinicalRecord.objects.filter(patient=patient).order_by("created_at", "id")
+
+
+def _appointments(patient):
+    return Appointment.objects.filter(patient=patient).order_by("scheduled_for", "id")
+
+
+def _observations(patient):
+    return LabResult.objects.filter(patient=patient).order_by("created_at", "id")
+
+
+def _service_requests(patient):
+    return (
+        Referral.objects.filter(patient=patient)
+        .select_related("from_clinic", "to_clinic", "referred_by")
+        .order_by("created_at", "id")
+    )
+
+
+def _document_references(patient):
+    return Document.objects.filter(patient=patient).order_by("uploaded_at", "id")
+
+
+def _invoices(patient):
+    return (
+        PatientInvoice.objects.filter(patient=patient)
+        .prefetch_related("items")
+        .order_by("issued_date", "id")
+    )
+
+
+# FHIR resource type -> (queryset for the patient, mapper, date field for _since)
+EVERYTHING_TYPES = {
+    "Composition": (_compositions, clinical_record_to_fhir_composition, "updated_at"),
+    "Appointment": (_appointments, appointment_to_fhir_appointment, "updated_at"),
+    "Observation": (_observations, lab_result_to_fhir_observation, "updated_at"),
+    "ServiceRequest": (
+        _service_requests,
+        referral_to_fhir_service_request,
+        "created_at",
+    ),
+    "DocumentReference": (
+        _document_references,
+        document_to_fhir_document_reference,
+        "uploaded_at",
+    ),
+    "Invoice": (_invoices, invoice_to_fhir_invoice, "updated_at"),
+}
+
+
+def everything_resources(patient, types=None, since=None):
+    """Yield the patient's resources, type by type, without loading them all."""
+    yield patient_to_fhir(patient)
+    for resource_type, spec in EVERYTHING_TYPES.items():
+        if types and resource_type not in types:
+            continue
+        build_queryset, mapper, since_field = spec
+        queryset = build_queryset(patient)
+        if since:
+            queryset = queryset.filter(**{f"{since_field}__gte": since})
+        for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield mapper(obj)
+
+
+def stream_bundle(resources, base_url, self_url):
+    """Serialize ``resources`` as a searchset Bundle, yielding text chunks."""
+    header = {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "link": [{"relation": "self", "url": self_url}],
+    }
+    buffer = [json.dumps(header)[:-1], ', "entry": [']
+    size, separator = 0, ""
+    for resource in resources:
+        entry = {
+            "fullUrl": f"{base_url}{resource['resourceType']}/{resource['id']}",
+            "resource": resource,
+            "search": {"mode": "match"},
+        }
+        text = separator + json.dumps(entry, cls=DjangoJSONEncoder)
+        buffer.append(text)
+        size += len(text)
+        separator = ","
+        if size >= FLUSH_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    buffer.append("]}")
+    yield "".join(buffer)
@@ -0,0 +1,81 @@
+import uuid
+
+from django.db import models
+
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class BulkDataJob(models.Model):
+    """Status tracking shared by FHIR Bulk Data ``$export`` and ``$import`` jobs."""
+
+    ACCEPTED = "accepted"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (ACCEPTED, "Accepted"),
+        (IN_PROGRESS, "In progress"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+    ACTIVE_STATUSES = (ACCEPTED, IN_PROGRESS)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    request_url = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACCEPTED)
+    progress = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    transaction_time = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class BulkExportJob(BulkDataJob):
+    """A FHIR Bulk Data ``$export`` request and its NDJSON output files."""
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="fhir_export_jobs"
+    )
+    # Comma-separated FHIR resource types, in export order.
+    resource_types = models.CharField(max_length=255)
+    since = models.DateTimeField(null=True, blank=True)
+    # [{"type": ..., "file": ..., "count": ...}] once completed.
+    output = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["tenant", "status"])]
+
+    def __str__(self):
+        return f"$export {self.pk} ({self.status})"
+
+    @property
+    def types(self):
+        return [t for t in self.resource_types.split(",") if t]
+
+
+class BulkImportJob(BulkDataJob):
+    """A FHIR bulk ``$import`` of uploaded NDJSON files."""
+
+    tenant = models.ForeignKey(
+        Tenant, on_delete=models.CASCADE, related_name="fhir_import_jobs"
+    )
+    # {"Patient": 120, ...}: resources created so far, per type.
+    counts = models.JSONField(default=dict, blank=True)
+    error_count = models.PositiveIntegerField(default=0)
+    # The first MAX_ERRORS rejected lines: [{"file", "line", "message"}].
+    errors = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["tenant", "status"])]
+
+    def __str__(self):
+        return f"$import {self.pk} ({self.status})"
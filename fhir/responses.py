@@ -0,0 +1,26 @@
+from django.http import JsonResponse
+
+FHIR_JSON = "application/fhir+json"
+FHIR_NDJSON = "application/fhir+ndjson"
+
+
+def fhir_response(resource, status=200, headers=None):
+    return JsonResponse(
+        resource,
+        status=status,
+        headers=headers,
+        json_dumps_params={"indent": 2},
+        content_type=FHIR_JSON,
+    )
+
+
+def operation_outcome(diagnostics, status=400, code="invalid", headers=None):
+    """A FHIR OperationOutcome error response."""
+    return fhir_response(
+        {
+            "resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": code, "diagnostics": diagnostics}],
+        },
+        status=status,
+        headers=headers,
+    )
@@ -0,0 +1,305 @@
+"""
+FHIR search (``GET /fhir/<type>?...``) returning searchset Bundles.
+Pages are keyset ranges on the resource's sort column plus id, passed around
+as an opaque ``_cursor``, so deep pages cost the same as the first and no
+COUNT is issued. Rows are fetched with ``.values()`` and mapped straight to
+resources by the ``fhir.utils`` mappers, without building model instances.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from appointments.models import Appointment
+from labs.models import LabResult
+from patients.models import Patient
+
+from .utils import (
+    ENCOUNTER_STATUS,
+    TENANT_SYSTEM,
+    appointment_to_fhir_encounter,
+    lab_result_to_fhir_observation,
+    patient_to_fhir,
+)
+
+DEFAULT_COUNT = 20
+MAX_COUNT = 100
+CURSOR_PARAM = "_cursor"
+DATE_PREFIXES = ("eq", "ne", "lt", "gt", "le", "ge")
+PATIENT_ID_SYSTEM = "urn:healthcare-saas:patient-id"
+
+
+class SearchError(ValueError):
+    """An invalid search parameter; reported as a 400 OperationOutcome."""
+
+
+def _date_bounds(value, is_datetime):
+    """Return the [start, end) range a FHIR date/dateTime value covers."""
+    if "T" in value:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise SearchError(f"Invalid date {value!r}.")
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        if not is_datetime:
+            return moment.date(), moment.date() + timedelta(days=1)
+        return moment, moment + timedelta(microseconds=1)
+    try:
+        if len(value) == 4:
+            start = date(int(value), 1, 1)
+            end = date(start.year + 1, 1, 1)
+        elif len(value) == 7:
+            start = date(int(value[:4]), int(value[5:]), 1)
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            start = parse_date(value)
+            if start is None:
+                raise ValueError
+            end = start + timedelta(days=1)
+    except ValueError:
+        raise SearchError(f"Invalid date {value!r}.")
+    if is_datetime:
+        start, end = (
+            timezone.make_aware(datetime.combine(d, time.min)) for d in (start, end)
+        )
+    return start, end
+
+
+def date_filter(field, value, is_datetime=False):
+    """Translate a FHIR date search value (with optional prefix) to a Q."""
+    prefix = value[:2] if value[:2] in DATE_PREFIXES else "eq"
+    if value[:2] in DATE_PREFIXES:
+        value = value[2:]
+    start, end = _date_bounds(value, is_datetime)
+    within = Q(**{f"{field}__gte": start, f"{field}__lt": end})
+    return {
+        "eq": within,
+        "ne": ~within,
+        "lt": Q(**{f"{field}__lt": start}),
+        "le": Q(**{f"{field}__lt": end}),
+        "gt": Q(**{f"{field}__gte": end}),
+        "ge": Q(**{f"{field}__gte": start}),
+    }[prefix]
+
+
+def parse_instant(value, param="_since"):
+    """Parse a FHIR instant (naive values are taken as local time)."""
+    moment = parse_datetime(value)
+    if moment is None:
+        raise SearchError(f"{param} must be a FHIR instant.")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _reference_id(value, resource_type):
+    """Accept ``123`` or ``Patient/123`` and return the integer id."""
+    if value.startswith(f"{resource_type}/"):
+        value = value[len(resource_type) + 1 :]
+    if not value.isdigit():
+        raise SearchError(f"Invalid {resource_type} reference {value!r}.")
+    return int(value)
+
+
+class ResourceSearch:
+    """Search parameters, sort key and mapper for one FHIR resource type."""
+
+    resource_type = None
+    model = None
+    fields = ()
+    # Keyset column sorted newest first (ties broken by id); None sorts by id.
+    order_field = None
+
+    def base_queryset(self, tenant_id):
+        queryset = self.model.objects.all()
+        return queryset.filter(tenant_id=tenant_id) if tenant_id else queryset
+
+    def filter(self, queryset, params):
+        return queryset
+
+    def to_resource(self, row):
+        raise NotImplementedError
+
+    def ordering(self):
+        if self.order_field is None:
+            return ("id",)
+        return (f"-{self.order_field}", "-id")
+
+    def after(self, queryset, cursor):
+        if self.order_field is None:
+            return queryset.filter(id__gt=cursor["id"])
+        key = cursor.get("k")
+        try:
+            key = parse_datetime(key) if isinstance(key, str) else None
+        except ValueError:
+            key = None
+        if key is None:
+            raise SearchError("Invalid _cursor.")
+        return queryset.filter(
+            Q(**{f"{self.order_field}__lt": key})
+            | Q(**{self.order_field: key, "id__lt": cursor["id"]})
+        )
+
+    def cursor_for(self, row):
+        cursor = {"id": row["id"]}
+        if self.order_field is not None:
+            cursor["k"] = row[self.order_field].isoformat()
+        return cursor
+
+
+class PatientSearch(ResourceSearch):
+    resource_type = "Patient"
+    model = Patient
+    fields = (
+        "id",
+        "tenant_id",
+        "first_name",
+        "last_name",
+        "date_of_birth",
+        "email",
+        "phone",
+        "updated_at",
+    )
+
+    def filter(self, queryset, params):
+        name_filters = []
+        for param, fields in (
+            ("name", ("last_lower", "first_lower")),
+            ("family", ("last_lower",)),
+            ("given", ("first_lower",)),
+        ):
+            value = params.get(param, "").strip().lower()
+            if value:
+                condition = Q()
+                for field in fields:
+                    condition |= Q(**{f"{field}__startswith": value})
+                name_filters.append(condition)
+        if name_filters:
+            # FHIR string search is a case-insensitive "starts with", which the
+            # (tenant, lower(name)) indexes from patients.autocomplete serve.
+            queryset = queryset.annotate(
+                last_lower=Lower("last_name"), first_lower=Lower("first_name")
+            )
+            for condition in name_filters:
+                queryset = queryset.filter(condition)
+
+        for value in params.getlist("birthdate"):
+            queryset = queryset.filter(date_filter("date_of_birth", value))
+        if params.get("_id"):
+            queryset = queryset.filter(id=_reference_id(params["_id"], "Patient"))
+        if params.get("identifier"):
+            system, _, value = params["identifier"].rpartition("|")
+            if system in ("", PATIENT_ID_SYSTEM):
+                if not value.isdigit():
+                    return queryset.none()
+                queryset = queryset.filter(id=int(value))
+            elif system == TENANT_SYSTEM and value.isdigit():
+                queryset = queryset.filter(tenant_id=int(value))
+            else:
+                return queryset.none()
+        return queryset
+
+    def to_resource(self, row):
+        return patient_to_fhir(SimpleNamespace(pk=row["id"], **row))
+
+
+class EncounterSearch(ResourceSearch):
+    resource_type = "Encounter"
+    model = Appointment
+    fields = ("id", "patient_id", "scheduled_for", "status", "updated_at")
+    order_field = "scheduled_for"
+
+    def filter(self, queryset, params):
+        subject = params.get("patient") or params.get("subject")
+        if subject:
+            queryset = queryset.filter(patient_id=_reference_id(subject, "Patient"))
+        for value in params.getlist("date"):
+            queryset = queryset.filter(
+                date_filter("scheduled_for", value, is_datetime=True)
+            )
+        if params.get("status"):
+            wanted = set(params["status"].split(","))
+            statuses = [s for s, fhir in ENCOUNTER_STATUS.items() if fhir in wanted]
+            condition = Q(status__in=statuses)
+            if "unknown" in wanted:
+                condition |= ~Q(status__in=list(ENCOUNTER_STATUS))
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def to_resource(self, row):
+        return appointment_to_fhir_encounter(SimpleNamespace(pk=row["id"], **row))
+
+
+class ObservationSearch(ResourceSearch):
+    resource_type = "Observation"
+    model = LabResult
+    fields = ("id", "patient_id", "created_at", "updated_at", "result")
+    order_field = "created_at"
+
+    def filter(self, queryset, params):
+        subject = params.get("patient") or params.get("subject")
+        if subject:
+            queryset = queryset.filter(patient_id=_reference_id(subject, "Patient"))
+        for value in params.getlist("date"):
+            queryset = queryset.filter(
+                date_filter("created_at", value, is_datetime=True)
+            )
+        category = params.get("category")
+        if category and category.rpartition("|")[2] != "laboratory":
+            return queryset.none()
+        return queryset
+
+    def to_resource(self, row):
+        return lab_result_to_fhir_observation(SimpleNamespace(pk=row["id"], **row))
+
+
+SEARCHES = {
+    search.resource_type: search
+    for search in (PatientSearch(), EncounterSearch(), ObservationSearch())
+}
+
+
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_cursor(encoded):
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        cursor["id"] = int(cursor["id"])
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise SearchError("Invalid _cursor.")
+    return cursor
+
+
+def page_size(params):
+    try:
+        count = int(params.get("_count", DEFAULT_COUNT))
+    except ValueError:
+        raise SearchError("_count must be an integer.")
+    return max(1, min(count, MAX_COUNT))
+
+
+def search_page(resource_type, params, tenant_id):
+    """
+    Run one page of a search. Returns ``(resources, next_cursor)`` where
+    ``next_cursor`` is None on the last page.
+    """
+    search = SEARCHES[resource_type]
+    count = page_size(params)
+    queryset = search.filter(search.base_queryset(tenant_id), params)
+    if params.get(CURSOR_PARAM):
+        queryset = search.after(queryset, decode_cursor(params[CURSOR_PARAM]))
+    rows = queryset.order_by(*search.ordering()).values(*search.fields)[: count + 1]
+
+    resources, last = [], None
+    for row in rows:
+        if len(resources) == count:
+            return resources, encode_cursor(search.cursor_for(last))
+        resources.append(search.to_resource(row))
+        last = row
+    return resources, None
@@ -0,0 +1,36 @@
+import logging
+
+from celery import shared_task
+
+from .bulk_export import purge_expired, run_export
+from .bulk_import import run_import
+from .models import BulkExportJob, BulkImportJob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_bulk_export(job_id):
+    """Write the NDJSON files of a FHIR ``$export`` job."""
+    job = BulkExportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning("FHIR export job vanished", extra={"job_id": str(job_id)})
+        return
+    run_export(job)
+
+
+@shared_task
+def purge_expired_exports():
+    """Remove FHIR export jobs and files older than FHIR_EXPORT_TTL hours."""
+    purged = purge_expired()
+    return {"purged": purged}
+
+
+@shared_task
+def run_bulk_import(job_id):
+    """Load the uploaded NDJSON files of a FHIR ``$import`` job."""
+    job = BulkImportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning("FHIR import job vanished", extra={"job_id": str(job_id)})
+        return
+    run_import(job)
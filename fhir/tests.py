@@ -1,10 +1,21 @@
-from datetime import date
+import gzip
+import json
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from appointments.models import Appointment
+from common.testing import TempRootMixin
+from fhir.search import encode_cursor
+from labs.models import LabResult
 from patients.models import Patient
 from tenants.models import Tenant
+from users.models import CustomUser
 
 
 class FhirPatientTests(TestCase):
@@ -30,7 +41,503 @@ class FhirPatientTests(TestCase):
         self.assertEqual(body["name"][0]["family"], "Lovelace")
         self.assertEqual(body["telecom"][0]["system"], "phone")
 
+    def test_patient_read_supports_conditional_requests(self):
+        url = reverse("fhir_patient_read", args=[self.patient.pk])
+        url = f"{url}?tenant_id={self.tenant.id}"
+        resp = self.client.get(url)
+        version = resp.json()["meta"]["versionId"]
+        self.assertEqual(resp["ETag"], f'W/"{version}"')
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=f'W/"{version}"')
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+        self.patient.email = "countess@example.com"
+        self.patient.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=f'W/"{version}"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.json()["meta"]["versionId"], version)
+
     def test_patient_read_requires_tenant(self):
         url = reverse("fhir_patient_read", args=[self.patient.pk])
         resp = self.client.get(url)  # missing tenant_id
         self.assertEqual(resp.status_code, 400)
+
+
+class BulkExportTests(TempRootMixin, TestCase):
+    def setUp(self):
+        self.temp_root("FHIR_EXPORT_ROOT")
+
+        self.tenant = Tenant.objects.create(name="Test Clinic", subdomain="test")
+        other = Tenant.objects.create(name="Other Clinic", subdomain="other")
+        self.user = CustomUser.objects.create_user(
+            username="exporter", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="exporter", password="pw")
+        for i in range(3):
+            patient = Patient.objects.create(
+                tenant=self.tenant,
+                first_name=f"Pat{i}",
+                last_name="Smith",
+                date_of_birth=date(1980, 1, i + 1),
+            )
+            LabResult.objects.create(tenant=self.tenant, patient=patient, result="ok")
+        Patient.objects.create(
+            tenant=other,
+            first_name="Not",
+            last_name="Mine",
+            date_of_birth=date(1990, 1, 1),
+        )
+
+    def kick_off(self, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(
+                reverse("fhir_export"), params, HTTP_PREFER="respond-async"
+            )
+
+    def test_export_flow_writes_tenant_ndjson(self):
+        response = self.kick_off(_type="Patient,Observation")
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response["Content-Location"])
+        self.assertEqual(status.status_code, 200)
+        manifest = status.json()
+        self.assertEqual(
+            [(o["type"], o["count"]) for o in manifest["output"]],
+            [("Patient", 3), ("Observation", 3)],
+        )
+
+        url = manifest["output"][0]["url"]
+        plain = self.client.get(url)
+        lines = b"".join(plain.streaming_content).decode().splitlines()
+        names = [json.loads(line)["name"][0]["given"][0] for line in lines]
+        self.assertEqual(names, ["Pat0", "Pat1", "Pat2"])
+
+        encoded = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        body = b"".join(encoded.streaming_content)
+        self.assertEqual(encoded["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body).decode().splitlines(), lines)
+        partial = self.client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", HTTP_RANGE="bytes=10-19"
+        )
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b"".join(partial.streaming_content), body[10:20])
+        self.assertEqual(partial["Content-Range"], f"bytes 10-19/{len(body)}")
+
+    def test_kick_off_validation_and_cancel(self):
+        url = reverse("fhir_export")
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.kick_off(_type="Medication").status_code, 400)
+        self.assertEqual(self.kick_off(_since="yesterday").status_code, 400)
+
+        response = self.kick_off(_since="2999-01-01T00:00:00Z")
+        manifest = self.client.get(response["Content-Location"]).json()
+        self.assertEqual(manifest["output"], [])
+        self.assertEqual(
+            self.client.delete(response["Content-Location"]).status_code, 202
+        )
+        self.assertEqual(self.client.get(response["Content-Location"]).status_code, 404)
+
+    def test_jobs_are_tenant_scoped(self):
+        status_url = self.kick_off()["Content-Location"]
+        other = Tenant.objects.get(subdomain="other")
+        CustomUser.objects.create_user(username="outsider", password="pw", tenant=other)
+        self.client.login(username="outsider", password="pw")
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+
+class FhirSearchTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Clinic", subdomain="test")
+        other = Tenant.objects.create(name="Other Clinic", subdomain="other")
+        CustomUser.objects.create_user(
+            username="searcher", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="searcher", password="pw")
+        self.patients = [
+            Patient.objects.create(
+                tenant=self.tenant,
+                first_name=first,
+                last_name=last,
+                date_of_birth=dob,
+            )
+            for first, last, dob in [
+                ("Ada", "Lovelace", date(1815, 12, 10)),
+                ("Alan", "Turing", date(1912, 6, 23)),
+                ("Grace", "Hopper", date(1906, 12, 9)),
+                ("Adam", "Smith", date(1912, 1, 5)),
+            ]
+        ]
+        Patient.objects.create(
+            tenant=other,
+            first_name="Ada",
+            last_name="Other",
+            date_of_birth=date(1815, 1, 1),
+        )
+
+    def search(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def family_names(self, bundle):
+        return [e["resource"]["name"][0]["family"] for e in bundle["entry"]]
+
+    def test_patient_search_parameters(self):
+        bundle = self.search("fhir_patient_search", name="ad")
+        self.assertEqual(bundle["type"], "searchset")
+        self.assertEqual(self.family_names(bundle), ["Lovelace", "Smith"])
+        self.assertEqual(
+            self.family_names(self.search("fhir_patient_search", birthdate="1912")),
+            ["Turing", "Smith"],
+        )
+        self.assertEqual(
+            self.family_names(
+                self.search("fhir_patient_search", birthdate="lt1900-01-01")
+            ),
+            ["Lovelace"],
+        )
+        turing = self.patients[1]
+        bundle = self.search(
+            "fhir_patient_search",
+            identifier=f"urn:healthcare-saas:patient-id|{turing.pk}",
+        )
+        self.assertEqual(self.family_names(bundle), ["Turing"])
+        self.assertTrue(
+            bundle["entry"][0]["fullUrl"].endswith(f"/fhir/Patient/{turing.pk}")
+        )
+
+    def test_keyset_paging_follows_next_links(self):
+        url = reverse("fhir_patient_search") + "?_count=3"
+        names = []
+        while url:
+            bundle = self.client.get(url).json()
+            names += self.family_names(bundle)
+            url = next(
+                (link["url"] for link in bundle["link"] if link["relation"] == "next"),
+                None,
+            )
+        self.assertEqual(names, ["Lovelace", "Turing", "Hopper", "Smith"])
+
+    def test_encounter_and_observation_search(self):
+        from appointments.models import Appointment
+
+        ada = self.patients[0]
+        for day in (1, 2, 3):
+            Appointment.objects.create(
+                tenant=self.tenant,
+                patient=ada,
+                scheduled_for=datetime(2024, 3, day, 9, tzinfo=dt_timezone.utc),
+                status="completed" if day < 3 else "scheduled",
+            )
+        LabResult.objects.create(tenant=self.tenant, patient=ada, result="5.1")
+
+        bundle = self.search(
+            "fhir_encounter_search", patient=f"Patient/{ada.pk}", status="finished"
+        )
+        self.assertEqual(
+            [e["resource"]["period"]["start"][:10] for e in bundle["entry"]],
+            ["2024-03-02", "2024-03-01"],
+        )
+        bundle = self.search("fhir_encounter_search", date="ge2024-03-02", _count=1)
+        self.assertEqual(len(bundle["entry"]), 1)
+        self.assertEqual(bundle["link"][1]["relation"], "next")
+
+        bundle = self.search("fhir_observation_search", subject=f"Patient/{ada.pk}")
+        self.assertEqual(bundle["entry"][0]["resource"]["valueString"], "5.1")
+
+    def test_malformed_cursors_are_rejected(self):
+        for url_name in ("fhir_encounter_search", "fhir_observation_search"):
+            for cursor in ({"id": 1}, {"id": 1, "k": 5}, {"id": 1, "k": "x"}):
+                response = self.client.get(
+                    reverse(url_name), {"_cursor": encode_cursor(cursor)}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["resourceType"], "OperationOutcome")
+
+    def test_invalid_parameters_and_authentication(self):
+        response = self.client.get(reverse("fhir_patient_search"), {"birthdate": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["resourceType"], "OperationOutcome")
+        self.client.logout()
+        response = self.client.get(reverse("fhir_patient_search"))
+        self.assertIn(response.status_code, (401, 403))
+
+
+class PatientEverythingTests(TestCase):
+    def setUp(self):
+        from referrals.models import Clinic
+
+        self.tenant = Tenant.objects.create(name="Test Clinic", subdomain="test")
+        CustomUser.objects.create_user(
+            username="carer", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="carer", password="pw")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1815, 12, 10),
+        )
+        self.clinics = [
+            Clinic.objects.create(
+                tenant=self.tenant, name=name, clinic_type="general_practice"
+            )
+            for name in ("North", "South")
+        ]
+
+    def add_history(self, count):
+        from appointments.models import Appointment
+        from billing.models import InvoiceLineItem, PatientInvoice
+        from clinical_records.models import ClinicalRecord
+        from referrals.models import Referral
+
+        for i in range(count):
+            ClinicalRecord.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                chief_complaint="Cough <3 days>",
+            )
+            Appointment.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                scheduled_for=datetime(2024, 1, i + 1, tzinfo=dt_timezone.utc),
+                status="completed",
+            )
+            LabResult.objects.create(
+                tenant=self.tenant, patient=self.patient, result=f"{i}"
+            )
+            Referral.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                from_clinic=self.clinics[0],
+                to_clinic=self.clinics[1],
+            )
+            invoice = PatientInvoice.objects.create(
+                tenant=self.tenant,
+                patient=self.patient,
+                invoice_number=f"INV-{self.patient.pk}-{PatientInvoice.objects.count()}",
+                due_date=date(2024, 2, 1),
+            )
+            InvoiceLineItem.objects.create(
+                invoice=invoice, description="Consultation", unit_price=40
+            )
+
+    def everything(self, **params):
+        url = reverse("fhir_patient_everything", args=[self.patient.pk])
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_streams_the_whole_record_as_a_bundle(self):
+        self.add_history(2)
+        bundle = self.everything()
+        self.assertEqual(bundle["type"], "searchset")
+        types = [e["resource"]["resourceType"] for e in bundle["entry"]]
+        self.assertEqual(types[0], "Patient")
+        for resource_type in (
+            "Composition",
+            "Appointment",
+            "Observation",
+            "ServiceRequest",
+            "Invoice",
+        ):
+            self.assertEqual(types.count(resource_type), 2, resource_type)
+
+        by_type = {
+            e["resource"]["resourceType"]: e["resource"] for e in bundle["entry"]
+        }
+        self.assertIn(
+            "Cough &lt;3 days&gt;", by_type["Composition"]["section"][0]["text"]["div"]
+        )
+        self.assertEqual(by_type["ServiceRequest"]["performer"][0]["display"], "South")
+        self.assertEqual(by_type["Invoice"]["totalGross"]["value"], 40.0)
+        self.assertEqual(by_type["Appointment"]["status"], "fulfilled")
+
+        only = self.everything(_type="Observation")
+        self.assertEqual(
+            [e["resource"]["resourceType"] for e in only["entry"]],
+            ["Patient", "Observation", "Observation"],
+        )
+
+    def test_query_count_does_not_grow_with_history(self):
+        url = reverse("fhir_patient_everything", args=[self.patient.pk])
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as captured:
+                b"".join(self.client.get(url).streaming_content)
+            return len(captured)
+
+        self.add_history(1)
+        baseline = count_queries()
+        self.add_history(5)
+        self.assertEqual(count_queries(), baseline)
+
+    def test_other_tenants_patients_are_not_found(self):
+        other = Tenant.objects.create(name="Other", subdomain="other")
+        CustomUser.objects.create_user(username="outsider", password="pw", tenant=other)
+        self.client.login(username="outsider", password="pw")
+        url = reverse("fhir_patient_everything", args=[self.patient.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class BulkImportTests(TempRootMixin, TestCase):
+    def setUp(self):
+        self.import_root = self.temp_root("FHIR_IMPORT_ROOT")
+
+        self.tenant = Tenant.objects.create(name="Test Clinic", subdomain="test")
+        other = Tenant.objects.create(name="Other Clinic", subdomain="other")
+        self.user = CustomUser.objects.create_user(
+            username="importer", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="importer", password="pw")
+        self.existing = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Old",
+            last_name="Timer",
+            date_of_birth=date(1950, 1, 1),
+        )
+        self.foreign = Patient.objects.create(
+            tenant=other,
+            first_name="Not",
+            last_name="Mine",
+            date_of_birth=date(1990, 1, 1),
+        )
+
+    def ndjson(self, *resources):
+        return "".join(json.dumps(r) + "\n" for r in resources).encode()
+
+    def patient(self, source_id, family, **extra):
+        return {
+            "resourceType": "Patient",
+            "id": source_id,
+            "name": [{"family": family, "given": ["Ann"]}],
+            "birthDate": "1980-02-03",
+            **extra,
+        }
+
+    def observation(self, subject, value="7.2 mmol/L"):
+        return {
+            "resourceType": "Observation",
+            "status": "final",
+            "subject": {"reference": subject},
+            "valueString": value,
+        }
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("fhir_import"), HTTP_PREFER="respond-async", **kwargs
+            )
+
+    def test_import_resolves_references_and_reports_rejected_lines(self):
+        clinical = self.ndjson(
+            # References to patients later in the upload resolve too.
+            {
+                "resourceType": "Encounter",
+                "status": "finished",
+                "subject": {"reference": "Patient/src-1"},
+                "period": {"start": "2024-05-01T09:30:00Z"},
+            },
+            self.observation("Patient/src-1"),
+            self.observation(f"Patient/{self.existing.pk}", "negative"),
+            self.observation(f"Patient/{self.foreign.pk}"),
+            self.observation("Patient/missing"),
+        )
+        patients = (
+            self.ndjson(
+                self.patient(
+                    "src-1",
+                    "Import",
+                    gender="female",
+                    telecom=[{"system": "email", "value": "ann@example.com"}],
+                ),
+                self.patient("src-2", "Second"),
+                self.patient("src-3", "Undated", birthDate="not-a-date"),
+                {"resourceType": "Condition", "id": "c1"},
+            )
+            + b"{broken\n"
+        )
+        response = self.upload(
+            data={
+                "file": [
+                    SimpleUploadedFile("clinical.ndjson", clinical),
+                    SimpleUploadedFile("patients.ndjson.gz", gzip.compress(patients)),
+                ]
+            }
+        )
+        self.assertEqual(response.status_code, 202)
+
+        manifest = self.client.get(response["Content-Location"]).json()
+        self.assertEqual(
+            [(o["type"], o["count"]) for o in manifest["output"]],
+            [("Patient", 2), ("Encounter", 1), ("Observation", 2)],
+        )
+        self.assertEqual(manifest["error"][0]["count"], 5)
+        issues = [i["diagnostics"] for i in manifest["error"][0]["outcome"]["issue"]]
+        self.assertIn(
+            "0001.ndjson line 3: Patient.birthDate must be a FHIR date.", issues
+        )
+        self.assertIn("0001.ndjson line 5: Line is not valid JSON.", issues)
+        self.assertIn(
+            "0000.ndjson line 5: Unresolved subject reference 'Patient/missing'.",
+            issues,
+        )
+
+        imported = Patient.objects.get(tenant=self.tenant, last_name="Import")
+        self.assertEqual(imported.gender, "F")
+        self.assertIn("ann@example.com", imported.search_text)
+        appointment = Appointment.objects.get(patient=imported)
+        self.assertEqual(appointment.status, "completed")
+        self.assertEqual(appointment.tenant, self.tenant)
+        self.assertEqual(
+            set(LabResult.objects.values_list("patient_id", "result")),
+            {(imported.pk, "7.2 mmol/L"), (self.existing.pk, "negative")},
+        )
+        self.assertEqual(list(self.import_root.iterdir()), [])
+
+    def test_ids_and_resource_types_of_the_wrong_type_are_rejected(self):
+        response = self.upload(
+            data=self.ndjson(
+                self.patient(["p1"], "Listed"),
+                {**self.patient("p2", "Typed"), "resourceType": ["Patient"]},
+                self.patient("p3", "Valid"),
+            ),
+            content_type="application/fhir+ndjson",
+        )
+        status = self.client.get(response["Content-Location"]).json()
+        self.assertEqual(status["output"], [{"type": "Patient", "count": 1}])
+        issues = [i["diagnostics"] for i in status["error"][0]["outcome"]["issue"]]
+        self.assertCountEqual(
+            issues,
+            [
+                "0000.ndjson line 1: Patient.id must be a string.",
+                "0000.ndjson line 2: resourceType must be a string.",
+            ],
+        )
+        self.assertTrue(
+            Patient.objects.filter(tenant=self.tenant, last_name="Valid").exists()
+        )
+
+    def test_raw_ndjson_body_and_validation(self):
+        response = self.upload(
+            data=self.ndjson(self.patient("p1", "Body")),
+            content_type="application/fhir+ndjson",
+        )
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response["Content-Location"]).json()
+        self.assertEqual(status["output"], [{"type": "Patient", "count": 1}])
+        self.assertEqual(status["error"], [])
+
+        no_prefer = self.client.post(
+            reverse("fhir_import"), b"", content_type="application/fhir+ndjson"
+        )
+        self.assertEqual(no_prefer.status_code, 400)
+        wrong_type = self.upload(data={}, content_type="application/json")
+        self.assertEqual(wrong_type.status_code, 415)
+
+        other = CustomUser.objects.create_user(
+            username="other", password="pw", tenant=self.foreign.tenant
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(response["Content-Location"]).status_code, 404)
@@ -1,3 +1,19 @@
+from django.utils.html import escape
+
+from common.conditional import resource_version
+
+
+def version_meta(obj):
+    """``meta.versionId``/``lastUpdated`` for objects that carry ``updated_at``."""
+    updated_at = getattr(obj, "updated_at", None)
+    if not updated_at:
+        return {}
+    return {
+        "versionId": resource_version(updated_at),
+        "lastUpdated": updated_at.isoformat(),
+    }
+
+
 def patient_to_fhir(patient):
     """Map internal Patient to a FHIR Patient resource."""
     telecom = []
@@ -10,6 +26,7 @@ def patient_to_fhir(patient):
         "resourceType": "Patient",
         "id": str(patient.pk),
         "meta": {
+            **version_meta(patient),
             "profile": ["http://hl7.org/fhir/StructureDefinition/Patient"],
         },
         "identifier": [
@@ -37,3 +54,243 @@ def patient_to_fhir(patient):
             }
         },
     }
+
+
+def _reference(resource_type, pk):
+    return {"reference": f"{resource_type}/{pk}"}
+
+
+def _instant(value):
+    return value.isoformat() if value else None
+
+
+ENCOUNTER_STATUS = {
+    "scheduled": "planned",
+    "confirmed": "planned",
+    "arrived": "arrived",
+    "in_progress": "in-progress",
+    "completed": "finished",
+    "cancelled": "cancelled",
+    "no_show": "cancelled",
+}
+
+
+def appointment_to_fhir_encounter(appointment):
+    """Map an Appointment to a FHIR Encounter resource."""
+    return {
+        "resourceType": "Encounter",
+        "id": str(appointment.pk),
+        "meta": version_meta(appointment),
+        "status": ENCOUNTER_STATUS.get(appointment.status, "unknown"),
+        "class": {
+            "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+            "code": "AMB",
+            "display": "ambulatory",
+        },
+        "subject": _reference("Patient", appointment.patient_id),
+        "period": {"start": _instant(appointment.scheduled_for)},
+    }
+
+
+def lab_result_to_fhir_observation(lab_result):
+    """Map a LabResult to a FHIR laboratory Observation resource."""
+    return {
+        "resourceType": "Observation",
+        "id": str(lab_result.pk),
+        "meta": version_meta(lab_result),
+        "status": "final",
+        "category": [
+            {
+                "coding": [
+                    {
+                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                        "code": "laboratory",
+                    }
+                ]
+            }
+        ],
+        "code": {"text": "Laboratory result"},
+        "subject": _reference("Patient", lab_result.patient_id),
+        "effectiveDateTime": _instant(lab_result.created_at),
+        "issued": _instant(lab_result.updated_at or lab_result.created_at),
+        "valueString": lab_result.result,
+    }
+
+
+def document_to_fhir_document_reference(document):
+    """Map a Document to a FHIR DocumentReference resource."""
+    attachment = {"title": document.description or document.file.name}
+    if document.file:
+        attachment["url"] = document.file.url
+    return {
+        "resourceType": "DocumentReference",
+        "id": str(document.pk),
+        "status": "current",
+        "subject": _reference("Patient", document.patient_id),
+        "date": _instant(document.uploaded_at),
+        "description": document.description,
+        "content": [{"attachment": attachment}],
+    }
+
+
+TENANT_SYSTEM = "urn:healthcare-saas:tenant"
+
+# (field, section title) for the narrative sections of a clinical note
+CLINICAL_NOTE_SECTIONS = [
+    ("chief_complaint", "Chief complaint"),
+    ("history_of_present_illness", "History of present illness"),
+    ("past_medical_history", "Past medical history"),
+    ("medications_history", "Medications"),
+    ("allergy_history", "Allergies"),
+    ("physical_exam_inspection", "Inspection"),
+    ("physical_exam_palpation", "Palpation"),
+    ("physical_exam_percussion", "Percussion"),
+    ("physical_exam_auscultation", "Auscultation"),
+    ("provisional_diagnosis", "Provisional diagnosis"),
+    ("investigations_ordered", "Investigations ordered"),
+    ("investigation_results", "Investigation results"),
+    ("assessment_diagnosis", "Assessment"),
+    ("plan", "Plan"),
+    ("note", "Note"),
+]
+
+
+def _narrative(text):
+    return {
+        "status": "generated",
+        "div": f'<div xmlns="http://www.w3.org/1999/xhtml">{escape(text)}</div>',
+    }
+
+
+def _organization(tenant_id):
+    return {"identifier": {"system": TENANT_SYSTEM, "value": str(tenant_id)}}
+
+
+def _money(amount, currency):
+    return {"value": float(amount), "currency": currency}
+
+
+def clinical_record_to_fhir_composition(record):
+    """Map a ClinicalRecord (SOAP note) to a FHIR Composition resource."""
+    return {
+        "resourceType": "Composition",
+        "id": str(record.pk),
+        "meta": version_meta(record),
+        "status": "final",
+        "type": {
+            "coding": [
+                {
+                    "system": "http://loinc.org",
+                    "code": "11506-3",
+                    "display": "Progress note",
+                }
+            ],
+            "text": record.note_type,
+        },
+        "subject": _reference("Patient", record.patient_id),
+        "date": _instant(record.created_at),
+        "author": [_organization(record.tenant_id)],
+        "title": f"{record.note_type.replace('_', ' ').capitalize()} note",
+        "section": [
+            {"title": title, "text": _narrative(getattr(record, field))}
+            for field, title in CLINICAL_NOTE_SECTIONS
+            if getattr(record, field)
+        ],
+    }
+
+
+APPOINTMENT_STATUS = {
+    "scheduled": "booked",
+    "confirmed": "booked",
+    "arrived": "arrived",
+    "in_progress": "arrived",
+    "completed": "fulfilled",
+    "cancelled": "cancelled",
+    "no_show": "noshow",
+}
+
+
+def appointment_to_fhir_appointment(appointment):
+    """Map an Appointment to a FHIR Appointment resource."""
+    return {
+        "resourceType": "Appointment",
+        "id": str(appointment.pk),
+        "meta": version_meta(appointment),
+        "status": APPOINTMENT_STATUS.get(appointment.status, "booked"),
+        "start": _instant(appointment.scheduled_for),
+        "participant": [
+            {
+                "actor": _reference("Patient", appointment.patient_id),
+                "status": "accepted",
+            }
+        ],
+    }
+
+
+def referral_to_fhir_service_request(referral):
+    """Map a Referral to a FHIR ServiceRequest (needs clinics and referrer loaded)."""
+    resource = {
+        "resourceType": "ServiceRequest",
+        "id": str(referral.pk),
+        # Pending referrals have not been accepted by the receiving clinic yet.
+        "status": "active" if referral.accepted else "draft",
+        "intent": "order",
+        "category": [{"text": "Referral"}],
+        "subject": _reference("Patient", referral.patient_id),
+        "authoredOn": _instant(referral.created_at),
+        "performer": [{"display": referral.to_clinic.name}],
+        "locationCode": [{"text": referral.from_clinic.name}],
+    }
+    if referral.referred_by:
+        resource["requester"] = {
+            "display": referral.referred_by.get_full_name()
+            or referral.referred_by.username
+        }
+    if referral.notes:
+        resource["note"] = [{"text": referral.notes}]
+    return resource
+
+
+INVOICE_STATUS = {
+    "draft": "draft",
+    "sent": "issued",
+    "overdue": "issued",
+    "paid": "balanced",
+    "cancelled": "cancelled",
+}
+
+
+def invoice_to_fhir_invoice(invoice):
+    """Map a PatientInvoice (with its line items prefetched) to a FHIR Invoice."""
+    currency = invoice.currency
+    return {
+        "resourceType": "Invoice",
+        "id": str(invoice.pk),
+        "meta": version_meta(invoice),
+        "identifier": [
+            {"system": "urn:healthcare-saas:invoice", "value": invoice.invoice_number}
+        ],
+        "status": INVOICE_STATUS.get(invoice.status, "issued"),
+        "subject": _reference("Patient", invoice.patient_id),
+        "date": invoice.issued_date.isoformat(),
+        "issuer": _organization(invoice.tenant_id),
+        "lineItem": [
+            {
+                "sequence": sequence,
+                "chargeItemCodeableConcept": {
+                    "text": item.description,
+                    "coding": [{"code": item.service_type}],
+                },
+                "priceComponent": [
+                    {
+                        "type": "base",
+                        "factor": float(item.quantity),
+                        "amount": _money(item.total, currency),
+                    }
+                ],
+            }
+            for sequence, item in enumerate(invoice.items.all(), start=1)
+        ],
+        "totalNet": _money(invoice.subtotal, currency),
+        "totalGross": _money(invoice.total, currency),
+    }
@@ -1,11 +1,48 @@
-from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.views import APIView
+
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 
+from common.conditional import not_modified_response, set_validators
 from patients.models import Patient
 
+from .everything import EVERYTHING_TYPES, everything_resources, stream_bundle
+from .responses import FHIR_JSON, fhir_response, operation_outcome
+from .search import CURSOR_PARAM, SearchError, parse_instant, search_page
 from .utils import patient_to_fhir
 
 
+class FHIRContentNegotiation(BaseContentNegotiation):
+    """FHIR responses are built by hand, so any Accept header is fine."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class FHIRView(APIView):
+    """Base for FHIR endpoints that use the API's JWT/session authentication."""
+
+    content_negotiation_class = FHIRContentNegotiation
+
+
+def request_tenant_id(request):
+    """The caller's tenant; platform admins may pick one with ``tenant_id``."""
+    user = request.user
+    if getattr(user, "platform_admin", False) and request.GET.get("tenant_id"):
+        return request.GET["tenant_id"]
+    return user.tenant_id
+
+
 @require_http_methods(["GET"])
 def patient_read(request, pk):
     """Return a FHIR Patient resource for the given patient and tenant.
@@ -29,12 +66,23 @@ def patient_read(request, pk):
         "date_of_birth",
         "email",
         "phone",
+        "updated_at",
     )
 
     scoped_qs = base_qs
     if tenant_id:
         scoped_qs = scoped_qs.filter(tenant_id=tenant_id)
 
+    # Pollers holding the current version get a 304 from one indexed lookup.
+    version_qs = scoped_qs.filter(pk=pk).values_list("updated_at", flat=True)
+    updated_at = version_qs.first()
+    if updated_at is None and is_platform_admin:
+        updated_at = base_qs.filter(pk=pk).values_list("updated_at", flat=True).first()
+    if updated_at is not None:
+        not_modified = not_modified_response(request, updated_at)
+        if not_modified is not None:
+            return not_modified
+
     try:
         patient = scoped_qs.get(pk=pk)
     except Patient.DoesNotExist:
@@ -47,9 +95,94 @@ def patient_read(request, pk):
             raise Http404("Patient not found")
 
     resource = patient_to_fhir(patient)
-    return JsonResponse(
+    response = JsonResponse(
         resource,
         status=200,
         json_dumps_params={"indent": 2},
         content_type="application/fhir+json",
     )
+    return set_validators(response, patient.updated_at)
+
+
+class SearchView(FHIRView):
+    """``GET /fhir/<type>?<params>``: one page of a searchset Bundle."""
+
+    resource_type = None
+
+    def get(self, request):
+        tenant_id = request_tenant_id(request)
+        if not tenant_id and not getattr(request.user, "platform_admin", False):
+            return operation_outcome("No tenant to search.")
+        try:
+            resources, cursor = search_page(self.resource_type, request.GET, tenant_id)
+        except SearchError as exc:
+            return operation_outcome(str(exc))
+
+        base = request.build_absolute_uri(reverse("fhir_info"))
+        links = [{"relation": "self", "url": request.build_absolute_uri()}]
+        if cursor:
+            params = request.GET.copy()
+            params[CURSOR_PARAM] = cursor
+            links.append(
+                {
+                    "relation": "next",
+                    "url": request.build_absolute_uri(
+                        f"{request.path}?{params.urlencode()}"
+                    ),
+                }
+            )
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "link": links,
+            "entry": [
+                {
+                    "fullUrl": f"{base}{resource['resourceType']}/{resource['id']}",
+                    "resource": resource,
+                    "search": {"mode": "match"},
+                }
+                for resource in resources
+            ],
+        }
+        return fhir_response(bundle)
+
+
+class EverythingView(FHIRView):
+    """``GET /fhir/Patient/<id>/$everything``: the patient's record as a Bundle."""
+
+    def get(self, request, pk):
+        patients = Patient.objects.all()
+        tenant_id = request_tenant_id(request)
+        if tenant_id:
+            patients = patients.filter(tenant_id=tenant_id)
+        elif not getattr(request.user, "platform_admin", False):
+            return operation_outcome("No tenant to search.")
+        patient = patients.filter(pk=pk).first()
+        if patient is None:
+            return operation_outcome("Patient not found.", status=404, code="not-found")
+
+        types = {
+            t.strip() for t in request.GET.get("_type", "").split(",") if t.strip()
+        }
+        unknown = types - set(EVERYTHING_TYPES) - {"Patient"}
+        if unknown:
+            return operation_outcome(
+                f"Unsupported _type: {', '.join(sorted(unknown))}.",
+                code="not-supported",
+            )
+        since = None
+        if request.GET.get("_since"):
+            try:
+                since = parse_instant(request.GET["_since"])
+            except SearchError as exc:
+                return operation_outcome(str(exc))
+
+        resources = everything_resources(patient, types, since)
+        return StreamingHttpResponse(
+            stream_bundle(
+                resources,
+                base_url=request.build_absolute_uri(reverse("fhir_info")),
+                self_url=request.build_absolute_uri(),
+            ),
+            content_type=FHIR_JSON,
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("labs", "0003_alter_labresult_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="labresult",
+            index=models.Index(
+                fields=["tenant", "created_at"], name="labs_labres_tenant__8f08dd_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="labresult",
+            index=models.Index(
+                fields=["tenant", "patient", "created_at"],
+                name="labs_labres_tenant__bb12c6_idx",
+            ),
+        ),
+    ]
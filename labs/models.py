@@ -15,5 +15,11 @@ class LabResult(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "created_at"]),
+            models.Index(fields=["tenant", "patient", "created_at"]),
+        ]
+
     def __str__(self):
         return f"LabResult for {self.patient} at {self.created_at}"
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PatientsConfig(AppConfig):
     name = "patients"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import ensure_search_backend
+
+        post_migrate.connect(
+            ensure_search_backend,
+            sender=self,
+            dispatch_uid="patients.ensure_search_backend",
+        )
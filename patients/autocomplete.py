@@ -0,0 +1,162 @@
+"""
+Patient typeahead lookups.
+Prefixes are matched against lower-cased names through the
+(tenant, last name, first name) indexes. Results for hot prefixes are kept in
+a bounded in-process LRU per tenant, invalidated through a shared generation
+counter that Patient signals bump on every change.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from common.tenant_scope import scope_queryset
+
+from .models import Patient
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+LRU_MAX_TENANTS = 128
+LRU_MAX_PREFIXES = 256
+
+
+class PrefixLRU:
+    """Thread-safe LRU of ``tenant -> {key: results}`` with both levels bounded."""
+
+    def __init__(self, max_tenants=LRU_MAX_TENANTS, max_prefixes=LRU_MAX_PREFIXES):
+        self.max_tenants = max_tenants
+        self.max_prefixes = max_prefixes
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id, generation, key):
+        with self._lock:
+            bucket = self._tenants.get(tenant_id)
+            if bucket is None or bucket[0] != generation:
+                return None
+            self._tenants.move_to_end(tenant_id)
+            entries = bucket[1]
+            if key not in entries:
+                return None
+            entries.move_to_end(key)
+            return entries[key]
+
+    def put(self, tenant_id, generation, key, value):
+        with self._lock:
+            bucket = self._tenants.get(tenant_id)
+            if bucket is None or bucket[0] != generation:
+                bucket = self._tenants[tenant_id] = (generation, OrderedDict())
+            self._tenants.move_to_end(tenant_id)
+            entries = bucket[1]
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_prefixes:
+                entries.popitem(last=False)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tenants.clear()
+
+
+hot_prefixes = PrefixLRU()
+
+
+def _generation_key(tenant_id):
+    return f"patients:autocomplete:gen:{tenant_id}"
+
+
+def autocomplete_generation(tenant_id):
+    key = _generation_key(tenant_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_autocomplete(tenant_id):
+    """Drop every cached prefix of the tenant, in all processes."""
+    try:
+        cache.incr(_generation_key(tenant_id))
+    except ValueError:
+        cache.set(_generation_key(tenant_id), time.time_ns(), timeout=None)
+
+
+def _prefix(field, prefix):
+    # The range lets a btree index serve the scan; startswith keeps it exact.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(
+        **{
+            f"{field}__gte": prefix,
+            f"{field}__lt": upper,
+            f"{field}__startswith": prefix,
+        }
+    )
+
+
+def _lookup(queryset, terms, limit):
+    queryset = queryset.annotate(
+        last_lower=Lower("last_name"), first_lower=Lower("first_name")
+    )
+    by_last = ("last_lower", "first_lower", "id")
+    if len(terms) == 1:
+        (term,) = terms
+        candidates = [
+            (_prefix("last_lower", term), by_last),
+            (_prefix("first_lower", term), ("first_lower", "last_lower", "id")),
+        ]
+    else:
+        first, last = terms
+        candidates = [
+            (_prefix("last_lower", last) & _prefix("first_lower", first), by_last),
+            (_prefix("last_lower", first) & _prefix("first_lower", last), by_last),
+        ]
+
+    results, seen = [], set()
+    for condition, ordering in candidates:
+        rows = (
+            queryset.filter(condition)
+            .order_by(*ordering)
+            .values("id", "first_name", "last_name", "date_of_birth")[:limit]
+        )
+        for row in rows:
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            results.append(
+                {
+                    "id": row["id"],
+                    "label": f"{row['first_name']} {row['last_name']}",
+                    "date_of_birth": row["date_of_birth"].isoformat(),
+                }
+            )
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def autocomplete_patients(user, query, limit=DEFAULT_LIMIT):
+    """
+    Return up to ``limit`` patients visible to ``user`` whose last or first
+    name starts with ``query``. Two words match "first last" or "last first".
+    """
+    terms = tuple(query.lower().split()[:2])
+    if not terms:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    queryset = scope_queryset(Patient.objects.all(), user)
+    if getattr(user, "platform_admin", False) or not user.tenant_id:
+        return _lookup(queryset, terms, limit)
+
+    generation = autocomplete_generation(user.tenant_id)
+    key = (terms, limit)
+    results = hot_prefixes.get(user.tenant_id, generation, key)
+    if results is None:
+        results = _lookup(queryset, terms, limit)
+        hot_prefixes.put(user.tenant_id, generation, key, results)
+    return results
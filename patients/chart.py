@@ -0,0 +1,106 @@
+"""
+Patient chart summary.
+The chart opens with the most recent few items of every section plus the
+section totals: one query for all counts and one bounded query per section,
+whatever the size of the patient's history. Full section histories are paged
+through ``section_queryset`` by the chart partial endpoint.
+"""
+from django.apps import apps
+from django.db.models import Count, IntegerField, Subquery
+from django.db.models.functions import Coalesce
+
+from common.tenant_scope import scope_queryset
+
+from .models import Patient
+
+SUMMARY_SIZE = 5
+PAGE_SIZE = 10
+
+# section -> (model label, ordering, select_related, only)
+SECTIONS = {
+    "clinical_records": (
+        "clinical_records.ClinicalRecord",
+        ("-created_at", "-id"),
+        (),
+        ("id", "tenant", "patient", "note_type", "note", "created_at"),
+    ),
+    "appointments": (
+        "appointments.Appointment",
+        ("-scheduled_for", "-id"),
+        (),
+        (),
+    ),
+    "referrals": (
+        "referrals.Referral",
+        ("-created_at", "-id"),
+        ("from_clinic", "to_clinic", "referred_by"),
+        (),
+    ),
+    "lab_results": (
+        "labs.LabResult",
+        ("-created_at", "-id"),
+        (),
+        ("id", "tenant", "patient", "created_at"),
+    ),
+    "documents": (
+        "documents.Document",
+        ("-uploaded_at", "-id"),
+        (),
+        (),
+    ),
+}
+
+
+def _base_queryset(section, patient, user):
+    label = SECTIONS[section][0]
+    model = apps.get_model(label)
+    queryset = model.objects.filter(patient=patient)
+    if any(f.name == "tenant" for f in model._meta.fields):
+        queryset = scope_queryset(queryset, user)
+    return queryset
+
+
+def section_queryset(section, patient, user):
+    """Ordered, tenant-scoped queryset of one chart section for ``patient``."""
+    _, ordering, related, only = SECTIONS[section]
+    queryset = _base_queryset(section, patient, user).order_by(*ordering)
+    if related:
+        queryset = queryset.select_related(*related)
+    if only:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+def section_counts(patient, user):
+    """Return ``{section: total}`` for every chart section in a single query."""
+    counts = {
+        f"{section}_count": Coalesce(
+            Subquery(
+                _base_queryset(section, patient, user)
+                .order_by()
+                .values("patient")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+            output_field=IntegerField(),
+        )
+        for section in SECTIONS
+    }
+    row = Patient.objects.filter(pk=patient.pk).values(**counts).first() or {}
+    return {section: row.get(f"{section}_count", 0) for section in SECTIONS}
+
+
+def chart_summary(patient, user, size=SUMMARY_SIZE):
+    """
+    Return ``{section: {"items": [...], "count": n}}`` with the ``size`` most
+    recent items of each section.
+    """
+    counts = section_counts(patient, user)
+    return {
+        section: {
+            "items": list(section_queryset(section, patient, user)[:size]),
+            "count": counts[section],
+        }
+        for section in SECTIONS
+    }
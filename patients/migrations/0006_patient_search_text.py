@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:13
+
+from django.db import migrations, models
+
+from patients.search import (
+    build_search_text,
+    install_search_backend,
+    uninstall_search_backend,
+)
+
+
+def populate_search_text(apps, schema_editor):
+    Patient = apps.get_model("patients", "Patient")
+    batch = []
+    for patient in Patient.objects.all().iterator(chunk_size=2000):
+        patient.search_text = build_search_text(patient)
+        batch.append(patient)
+        if len(batch) >= 2000:
+            Patient.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    Patient.objects.bulk_update(batch, ["search_text"])
+
+
+def create_search_backend(apps, schema_editor):
+    install_search_backend(schema_editor)
+
+
+def drop_search_backend(apps, schema_editor):
+    uninstall_search_backend(schema_editor)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0005_patient_patients_pa_tenant__257f00_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="search_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:16
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0006_patient_search_text"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                models.F("tenant"),
+                django.db.models.functions.text.Lower("last_name"),
+                django.db.models.functions.text.Lower("first_name"),
+                name="patients_tenant_last_first",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                models.F("tenant"),
+                django.db.models.functions.text.Lower("first_name"),
+                name="patients_tenant_first",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patients", "0007_patient_name_prefix_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "date_of_birth"],
+                name="patients_pa_tenant__9687e3_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["tenant", "id"], name="patients_pa_tenant__65d1d3_idx"
+            ),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 from tenants.models import Tenant
 
+from .search import build_search_text
+
 
 class Patient(models.Model):
     GENDER_CHOICES = [
@@ -34,9 +37,34 @@ class Patient(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Normalized copy of the searchable fields; see patients.search.
+    search_text = models.TextField(blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "created_at"]),
+            # FHIR search: birthdate filters and id-keyset paging (fhir.search)
+            models.Index(fields=["tenant", "date_of_birth"]),
+            models.Index(fields=["tenant", "id"]),
+            # Case-insensitive name prefix lookups (patients.autocomplete)
+            models.Index(
+                "tenant",
+                Lower("last_name"),
+                Lower("first_name"),
+                name="patients_tenant_last_first",
+            ),
+            models.Index("tenant", Lower("first_name"), name="patients_tenant_first"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    def save(self, *args, **kwargs):
+        self.search_text = build_search_text(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_text"}
+        super().save(*args, **kwargs)
     
     def get_profile_picture_url(self):
         """Get profile picture URL, with gender-based default fallback.
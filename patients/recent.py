@@ -0,0 +1,65 @@
+"""
+Recently viewed patients.
+Each user has a bounded most-recent-first list of patient ids in the cache, and
+each listed patient has a small "card" (id, display name, picture URL, tenant).
+Reading the list is two cache lookups and never touches the database; Patient
+signals refresh or drop cards as patients change.
+"""
+from django.core.cache import cache
+
+MAX_RECENT = 5
+RECENT_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def _user_key(user_id):
+    return f"patients:recent:user:{user_id}"
+
+
+def _card_key(patient_id):
+    return f"patients:recent:card:{patient_id}"
+
+
+def patient_card(patient):
+    return {
+        "id": patient.pk,
+        "name": f"{patient.first_name} {patient.last_name}",
+        "picture_url": patient.get_profile_picture_url(),
+        "tenant_id": patient.tenant_id,
+    }
+
+
+def remember_patient(user, patient):
+    """Move ``patient`` to the front of ``user``'s recent list."""
+    key = _user_key(user.pk)
+    ids = [pk for pk in cache.get(key, []) if pk != patient.pk]
+    ids = [patient.pk] + ids[: MAX_RECENT - 1]
+    cache.set_many(
+        {key: ids, _card_key(patient.pk): patient_card(patient)},
+        timeout=RECENT_TIMEOUT,
+    )
+
+
+def recent_patients_for(user):
+    """Return the cards of ``user``'s recently viewed patients, newest first."""
+    ids = cache.get(_user_key(user.pk))
+    if not ids:
+        return []
+    cards = cache.get_many([_card_key(pk) for pk in ids])
+    platform_admin = getattr(user, "platform_admin", False)
+    recent = []
+    for pk in ids:
+        card = cards.get(_card_key(pk))
+        if card and (platform_admin or card["tenant_id"] == user.tenant_id):
+            recent.append(card)
+    return recent
+
+
+def refresh_patient_card(patient):
+    """Update the cached card of a patient that someone has recently viewed."""
+    key = _card_key(patient.pk)
+    if cache.get(key) is not None:
+        cache.set(key, patient_card(patient), timeout=RECENT_TIMEOUT)
+
+
+def forget_patient(patient_id):
+    cache.delete(_card_key(patient_id))
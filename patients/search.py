@@ -0,0 +1,166 @@
+"""
+Patient search.
+Each patient carries a normalized ``search_text`` column (names, email, phone
+digits and date of birth) maintained on save. PostgreSQL searches it through a
+pg_trgm GIN index; SQLite mirrors it into an FTS5 trigram table kept in sync by
+triggers. Other backends fall back to plain substring matching.
+"""
+import re
+import unicodedata
+from datetime import date
+
+from django.db import connections
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.dateparse import parse_date
+
+FTS_TABLE = "patients_patient_fts"
+TRIGRAM_INDEX = "patients_patient_search_trgm"
+# FTS5 and pg_trgm both index three-character grams; shorter terms cannot use them.
+MIN_INDEXED_TERM = 3
+MAX_TERMS = 6
+
+SQLITE_SETUP = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"search_text, content='patients_patient', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON patients_patient BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON patients_patient BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) "
+    f"VALUES ('delete', old.id, old.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON patients_patient BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) "
+    f"VALUES ('delete', old.id, old.search_text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_TEARDOWN = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+    "ON patients_patient USING gin (search_text gin_trgm_ops)",
+]
+POSTGRES_TEARDOWN = [f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}"]
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def build_search_text(patient):
+    """Return the normalized text a patient is found by."""
+    parts = [patient.first_name, patient.last_name, patient.email, patient.phone]
+    if patient.phone:
+        parts.append(re.sub(r"\D", "", patient.phone))
+    dob = patient.date_of_birth
+    if isinstance(dob, str):
+        dob = parse_date(dob) or dob
+    if isinstance(dob, date):
+        parts += [dob.isoformat(), dob.strftime("%d/%m/%Y")]
+    elif dob:
+        parts.append(str(dob))
+    return normalize(" ".join(p for p in parts if p))
+
+
+def search_terms(query):
+    return normalize(query).split()[:MAX_TERMS]
+
+
+def install_search_backend(schema_editor):
+    """Create the backend-specific search structures (used by migrations)."""
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_SETUP, "postgresql": POSTGRES_SETUP}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def uninstall_search_backend(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_TEARDOWN, "postgresql": POSTGRES_TEARDOWN}.get(
+        vendor, []
+    )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def ensure_search_backend(using="default", **kwargs):
+    """
+    Reinstall the SQLite triggers if a table rebuild dropped them.
+    SQLite migrations recreate ``patients_patient`` for most schema changes,
+    which silently removes its triggers; this runs after every migrate.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+            ["patients_patient", FTS_TABLE],
+        )
+        tables = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE not in tables or "patients_patient" not in tables:
+            return  # search migration not applied yet
+        triggers = [f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"]
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            triggers,
+        )
+        if cursor.fetchone()[0] == len(triggers):
+            return
+    with db.schema_editor() as schema_editor:
+        install_search_backend(schema_editor)
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_patients(queryset, query):
+    """
+    Restrict ``queryset`` to patients matching every term of ``query``.
+    The result is annotated with ``search_rank`` (higher is better) and ordered
+    by it, then by name.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    indexed = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+    for term in terms:
+        if vendor == "sqlite" and term in indexed:
+            continue  # matched through FTS5 below
+        queryset = queryset.filter(search_text__contains=term)
+
+    if vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        rank = TrigramWordSimilarity(" ".join(terms), "search_text")
+    elif vendor == "sqlite" and indexed:
+        match = " AND ".join(_fts_phrase(t) for t in indexed)
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)
+            )
+        )
+        # bm25 is lower-is-better; negate so every backend sorts descending.
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = patients_patient.id",
+            (match,),
+            output_field=FloatField(),
+        )
+    else:
+        rank = Value(0.0, output_field=FloatField())
+
+    return queryset.annotate(search_rank=rank).order_by(
+        F("search_rank").desc(nulls_last=True), "last_name", "first_name", "id"
+    )
@@ -0,0 +1,44 @@
+"""
+Keep patient caches in step with the database: autocomplete prefixes are
+invalidated per tenant and recently-viewed cards are refreshed or dropped.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .autocomplete import invalidate_autocomplete
+from .models import Patient
+from .recent import forget_patient, refresh_patient_card
+
+
+def invalidate_patient_autocomplete(sender, instance, **kwargs):
+    if instance.tenant_id:
+        invalidate_autocomplete(instance.tenant_id)
+
+
+def refresh_recent_patient(sender, instance, **kwargs):
+    refresh_patient_card(instance)
+
+
+def forget_recent_patient(sender, instance, **kwargs):
+    forget_patient(instance.pk)
+
+
+post_save.connect(
+    invalidate_patient_autocomplete,
+    sender=Patient,
+    dispatch_uid="patients_autocomplete_invalidate_save",
+)
+post_delete.connect(
+    invalidate_patient_autocomplete,
+    sender=Patient,
+    dispatch_uid="patients_autocomplete_invalidate_delete",
+)
+post_save.connect(
+    refresh_recent_patient,
+    sender=Patient,
+    dispatch_uid="patients_recent_refresh_save",
+)
+post_delete.connect(
+    forget_recent_patient,
+    sender=Patient,
+    dispatch_uid="patients_recent_forget_delete",
+)
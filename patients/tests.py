@@ -1,10 +1,18 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from tenants.models import Tenant
 from users.models import CustomUser
 
+from .autocomplete import PrefixLRU, autocomplete_patients, hot_prefixes
+from .chart import SUMMARY_SIZE, chart_summary
 from .models import Patient
+from .recent import MAX_RECENT, recent_patients_for
+from .search import search_patients
 
 
 class PatientListViewTest(TestCase):
@@ -25,3 +33,269 @@ class PatientListViewTest(TestCase):
         response = self.client.get(reverse("patient_list"))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "John Doe")
+
+
+class PatientSearchTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        other = Tenant.objects.create(name="Other Tenant", subdomain="other")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="testuser", password="testpass")
+        self.zoe = Patient.objects.create(
+            first_name="Zoë",
+            last_name="Smithson",
+            date_of_birth="1985-03-14",
+            phone="+44 7700 900123",
+            tenant=self.tenant,
+        )
+        self.john = Patient.objects.create(
+            first_name="John",
+            last_name="Smith",
+            email="john.smith@example.com",
+            date_of_birth="1990-01-01",
+            tenant=self.tenant,
+        )
+        Patient.objects.create(
+            first_name="John",
+            last_name="Smith",
+            date_of_birth="1990-01-01",
+            tenant=other,
+        )
+
+    def search(self, query):
+        return list(search_patients(Patient.objects.filter(tenant=self.tenant), query))
+
+    def test_search_text_is_normalized_on_save(self):
+        self.assertIn("zoe smithson", self.zoe.search_text)
+        self.assertIn("447700900123", self.zoe.search_text)
+        self.assertIn("14/03/1985", self.zoe.search_text)
+
+    def test_matches_names_contacts_and_dates(self):
+        self.assertEqual(self.search("smith"), [self.john, self.zoe])
+        self.assertEqual(self.search("ZOE"), [self.zoe])
+        self.assertEqual(self.search("john smith"), [self.john])
+        self.assertEqual(self.search("example.com"), [self.john])
+        self.assertEqual(self.search("7700900"), [self.zoe])
+        self.assertEqual(self.search("1985-03"), [self.zoe])
+        self.assertEqual(self.search("jo"), [self.john])
+        self.assertEqual(self.search("nobody"), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.john.last_name = "Jones"
+        self.john.email = "john.jones@example.com"
+        self.john.save(update_fields=["last_name", "email"])
+        self.assertEqual(self.search("jones"), [self.john])
+        self.assertEqual(self.search("smith"), [self.zoe])
+        self.zoe.delete()
+        self.assertEqual(self.search("smith"), [])
+
+    def test_patient_list_uses_search(self):
+        response = self.client.get(reverse("patient_list"), {"search": "smithson"})
+        self.assertContains(response, "Smithson")
+        self.assertNotContains(response, "john.smith@example.com")
+
+
+class PatientAutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        hot_prefixes.clear()
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        other = Tenant.objects.create(name="Other Tenant", subdomain="other")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="testuser", password="testpass")
+        self.ann = Patient.objects.create(
+            first_name="Ann",
+            last_name="Smith",
+            date_of_birth="1970-05-01",
+            tenant=self.tenant,
+        )
+        self.sam = Patient.objects.create(
+            first_name="Sam",
+            last_name="Jones",
+            date_of_birth="1980-06-02",
+            tenant=self.tenant,
+        )
+        Patient.objects.create(
+            first_name="Smitty",
+            last_name="Other",
+            date_of_birth="1990-01-01",
+            tenant=other,
+        )
+
+    def ids(self, query):
+        return [r["id"] for r in autocomplete_patients(self.user, query)]
+
+    def test_matches_last_then_first_name_prefixes(self):
+        self.assertEqual(self.ids("SMI"), [self.ann.pk])
+        self.assertEqual(self.ids("s"), [self.ann.pk, self.sam.pk])
+        self.assertEqual(self.ids("ann smi"), [self.ann.pk])
+        self.assertEqual(self.ids("jones sa"), [self.sam.pk])
+        self.assertEqual(self.ids("   "), [])
+
+    def test_hot_prefixes_are_served_from_the_lru_until_patients_change(self):
+        self.ids("smi")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids("smi"), [self.ann.pk])
+        Patient.objects.create(
+            first_name="Bob",
+            last_name="Smithers",
+            date_of_birth="1960-01-01",
+            tenant=self.tenant,
+        )
+        self.assertEqual(len(self.ids("smi")), 2)
+
+    def test_lru_is_bounded(self):
+        lru = PrefixLRU(max_tenants=2, max_prefixes=2)
+        for tenant_id in (1, 2, 3):
+            for prefix in ("a", "b", "c"):
+                lru.put(tenant_id, 0, prefix, [prefix])
+        self.assertIsNone(lru.get(1, 0, "c"))
+        self.assertIsNone(lru.get(3, 0, "a"))
+        self.assertEqual(lru.get(3, 0, "c"), ["c"])
+        self.assertIsNone(lru.get(3, 1, "c"))
+
+    def test_endpoint_and_forms_do_not_render_the_patient_list(self):
+        response = self.client.get(reverse("patient_autocomplete"), {"q": "jo"})
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": self.sam.pk, "label": "Sam Jones", "date_of_birth": "1980-06-02"}],
+        )
+        for name in ("clinic_note_create", "create_referral", "upload_document"):
+            response = self.client.get(reverse(name))
+            self.assertContains(response, reverse("patient_autocomplete"))
+            self.assertNotContains(response, "Jones")
+
+
+class PatientChartTest(TestCase):
+    def setUp(self):
+        from appointments.models import Appointment
+        from clinical_records.models import ClinicalRecord
+
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="testuser", password="testpass")
+        self.patient = Patient.objects.create(
+            first_name="Ann",
+            last_name="Smith",
+            date_of_birth="1970-05-01",
+            tenant=self.tenant,
+        )
+        self.Appointment = Appointment
+        self.ClinicalRecord = ClinicalRecord
+
+    def add_history(self, count):
+        now = timezone.now()
+        self.Appointment.objects.bulk_create(
+            self.Appointment(
+                tenant=self.tenant,
+                patient=self.patient,
+                scheduled_for=now - timedelta(days=i),
+            )
+            for i in range(count)
+        )
+        self.ClinicalRecord.objects.bulk_create(
+            self.ClinicalRecord(
+                tenant=self.tenant, patient=self.patient, note=f"note {i}"
+            )
+            for i in range(count)
+        )
+
+    def test_summary_is_bounded_and_counts_everything(self):
+        # One count query plus one query per section, whatever the history size.
+        self.add_history(2)
+        with self.assertNumQueries(6):
+            chart_summary(self.patient, self.user)
+        self.add_history(30)
+        with self.assertNumQueries(6):
+            chart = chart_summary(self.patient, self.user)
+
+        self.assertEqual(chart["appointments"]["count"], 32)
+        self.assertEqual(len(chart["appointments"]["items"]), SUMMARY_SIZE)
+        self.assertEqual(
+            chart["appointments"]["items"][0].scheduled_for,
+            self.Appointment.objects.latest("scheduled_for").scheduled_for,
+        )
+        self.assertEqual(chart["clinical_records"]["count"], 32)
+        self.assertEqual(chart["referrals"], {"items": [], "count": 0})
+
+    def test_detail_links_to_paginated_sections(self):
+        self.add_history(25)
+        response = self.client.get(reverse("patient_detail", args=[self.patient.pk]))
+        url = reverse("patient_chart_section", args=[self.patient.pk, "appointments"])
+        self.assertContains(response, f'href="{url}"')
+        self.assertContains(response, "Show all 25")
+
+        response = self.client.get(url, {"page": 3})
+        self.assertEqual(len(response.context["items"]), 5)
+        self.assertContains(response, "Page 3 of 3")
+        self.assertContains(response, "?page=2")
+        self.assertNotContains(response, "<html")
+
+    def test_section_endpoint_is_tenant_scoped(self):
+        url = reverse("patient_chart_section", args=[self.patient.pk, "bogus"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        other = Tenant.objects.create(name="Other Tenant", subdomain="other")
+        stranger = Patient.objects.create(
+            first_name="Bo", last_name="Other", date_of_birth="1990-01-01", tenant=other
+        )
+        url = reverse("patient_chart_section", args=[stranger.pk, "appointments"])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class RecentPatientsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="testuser", password="testpass")
+        self.patients = [
+            Patient.objects.create(
+                first_name=f"Pat{i}",
+                last_name="Smith",
+                date_of_birth="1970-05-01",
+                tenant=self.tenant,
+            )
+            for i in range(MAX_RECENT + 1)
+        ]
+
+    def view(self, patient):
+        self.client.get(reverse("patient_detail", args=[patient.pk]))
+
+    def names(self):
+        return [card["name"] for card in recent_patients_for(self.user)]
+
+    def test_views_build_a_bounded_mru_list_without_the_session(self):
+        for patient in self.patients:
+            self.view(patient)
+        self.view(self.patients[2])
+        names = self.names()
+        self.assertEqual(len(names), MAX_RECENT)
+        self.assertEqual(names[:2], ["Pat2 Smith", f"Pat{MAX_RECENT} Smith"])
+        self.assertNotIn("Pat0 Smith", names)
+        self.assertNotIn("recent_patients", self.client.session)
+
+    def test_sidebar_is_read_from_the_cache_and_follows_changes(self):
+        first, second = self.patients[:2]
+        self.view(first)
+        self.view(second)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ["Pat1 Smith", "Pat0 Smith"])
+
+        first.last_name = "Jones"
+        first.save()
+        second.delete()
+        self.assertEqual(self.names(), ["Pat0 Jones"])
+        response = self.client.get(reverse("patient_list"))
+        self.assertEqual(
+            [card["id"] for card in response.context["recent_patients_sidebar"]],
+            [first.pk],
+        )
@@ -2,11 +2,16 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.http import Http404, JsonResponse
 
 from common.tenant_scope import assign_tenant, enforce_tenant, scope_queryset
 
+from .autocomplete import DEFAULT_LIMIT, autocomplete_patients
+from .chart import PAGE_SIZE, SECTIONS, chart_summary, section_queryset
 from .forms import PatientForm
 from .models import Patient
+from .recent import remember_patient
+from .search import search_patients
 
 
 @login_required
@@ -37,44 +42,30 @@ def patient_delete(request, pk):
 def patient_detail(request, pk):
     patient = enforce_tenant(get_object_or_404(Patient, pk=pk), request.user)
     # Track recently viewed patients for sidebar quick access
-    recent_ids = request.session.get("recent_patients", [])
-    if patient.pk in recent_ids:
-        recent_ids.remove(patient.pk)
-    recent_ids.insert(0, patient.pk)
-    request.session["recent_patients"] = recent_ids[:5]
-    from clinical_records.models import ClinicalRecord
-    from appointments.models import Appointment
-    from referrals.models import Referral
-    from labs.models import LabResult
-    from documents.models import Document
-
-    clinical_records = scope_queryset(
-        ClinicalRecord.objects.filter(patient=patient).order_by("-created_at"),
-        request.user,
-    )
-    appointments = scope_queryset(
-        Appointment.objects.filter(patient=patient).order_by("-scheduled_for"),
-        request.user,
-    )
-    referrals = scope_queryset(
-        Referral.objects.filter(patient=patient).order_by("-id"),
-        request.user,
-    )
-    lab_results = scope_queryset(
-        LabResult.objects.filter(patient=patient).order_by("-id"),
-        request.user,
-    )
-    documents = Document.objects.filter(patient=patient).order_by("-uploaded_at")
+    remember_patient(request.user, patient)
     return render(
         request,
         "patients/patient_detail.html",
+        {"patient": patient, "chart": chart_summary(patient, request.user)},
+    )
+
+
+@login_required
+def patient_chart_section(request, pk, section):
+    """One page of a chart section, rendered as a partial for the chart tabs."""
+    if section not in SECTIONS:
+        raise Http404("Unknown chart section.")
+    patient = enforce_tenant(get_object_or_404(Patient, pk=pk), request.user)
+    paginator = Paginator(section_queryset(section, patient, request.user), PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    return render(
+        request,
+        f"patients/chart/{section}.html",
         {
             "patient": patient,
-            "clinical_records": clinical_records,
-            "appointments": appointments,
-            "referrals": referrals,
-            "lab_results": lab_results,
-            "documents": documents,
+            "section": section,
+            "items": page_obj.object_list,
+            "page_obj": page_obj,
         },
     )
 
@@ -96,19 +87,12 @@ def patient_create(request):
 def patient_list(request):
     patients = scope_queryset(Patient.objects.all(), request.user)
     
-    # Search functionality
+    # Search functionality (ranked; see patients.search)
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        from django.db.models import Q
-        patients = patients.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query) |
-            Q(date_of_birth__icontains=search_query)
-        )
-    
-    patients = patients.order_by("last_name", "first_name")
+        patients = search_patients(patients, search_query)
+    else:
+        patients = patients.order_by("last_name", "first_name")
     
     # Pagination
     paginator = Paginator(patients, 10)  # 10 patients per page
@@ -124,3 +108,14 @@ def patient_list(request):
         "patients": patients,
         "search_query": search_query
     })
+
+
+@login_required
+def patient_autocomplete(request):
+    """Typeahead lookup for patient pickers: ``?q=<name prefix>&limit=<n>``."""
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    results = autocomplete_patients(request.user, request.GET.get("q", ""), limit)
+    return JsonResponse({"results": results})
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("referrals", "0004_alter_clinic_id_alter_referral_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="referral",
+            index=models.Index(
+                fields=["tenant", "created_at"], name="referrals_r_tenant__774b28_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="referral",
+            index=models.Index(
+                fields=["tenant", "patient", "created_at"],
+                name="referrals_r_tenant__fd0c3e_idx",
+            ),
+        ),
+    ]
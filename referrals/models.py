@@ -56,5 +56,11 @@ class Referral(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     accepted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "created_at"]),
+            models.Index(fields=["tenant", "patient", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Referral of {self.patient} from {self.from_clinic} to {self.to_clinic}"
@@ -49,8 +49,6 @@ def create_referral(request):
     else:
         clinics = scope_queryset(Clinic.objects.all(), request.user)
     
-    patients = scope_queryset(Patient.objects.all(), request.user)
-    
     if request.method == "POST":
         patient_id = request.POST.get("patient")
         from_clinic_id = request.POST.get("from_clinic")
@@ -77,7 +75,6 @@ def create_referral(request):
         "referrals/create.html",
         {
             "clinics": clinics,
-            "patients": patients,
             "patient": patient,
             "clinic_types": CLINIC_TYPES
         },
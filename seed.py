@@ -16,6 +16,7 @@ from labs.models import LabResult
 from patients.models import Patient
 from referrals.models import Clinic, Referral
 from documents.models import Document
+from billing.invoices import create_invoice
 from billing.models import PatientInvoice, InvoiceLineItem
 
 # Import models after django.setup()
@@ -485,14 +486,12 @@ invoice_services = [
     ("Physical Therapy Session", "procedure", Decimal("85.00")),
 ]
 
-invoice_counter = 1000
 for tenant in tenants:
     tenant_patients = [p for p in all_patients if p.tenant == tenant]
     
     for patient in tenant_patients[:8]:  # Invoices for first 8 patients
         # Create 1-3 invoices per patient
         for _ in range(random.randint(1, 3)):
-            invoice_counter += 1
             days_ago = random.randint(1, 120)
             issue_date = (datetime.now() - timedelta(days=days_ago)).date()
             due_date = issue_date + timedelta(days=30)
@@ -502,10 +501,23 @@ for tenant in tenants:
             if status == "paid":
                 paid_date = issue_date + timedelta(days=random.randint(1, 25))
             
-            invoice = PatientInvoice.objects.create(
-                tenant=tenant,
-                patient=patient,
-                invoice_number=f"INV-{invoice_counter}",
+            # Add 1-4 line items per invoice
+            line_items = []
+            for _ in range(random.randint(1, 4)):
+                service = random.choice(invoice_services)
+                line_items.append(
+                    {
+                        "description": service[0],
+                        "service_type": service[1],
+                        "quantity": Decimal(random.randint(1, 3)),
+                        "unit_price": service[2],
+                    }
+                )
+            
+            create_invoice(
+                tenant,
+                patient,
+                line_items,
                 status=status,
                 issued_date=issue_date,
                 due_date=due_date,
@@ -513,24 +525,6 @@ for tenant in tenants:
                 tax=Decimal("0.00"),
                 currency="GBP"
             )
-            
-            # Add 1-4 line items per invoice
-            for _ in range(random.randint(1, 4)):
-                service = random.choice(invoice_services)
-                quantity = random.randint(1, 3)
-                
-                InvoiceLineItem.objects.create(
-                    invoice=invoice,
-                    description=service[0],
-                    service_type=service[1],
-                    quantity=Decimal(str(quantity)),
-                    unit_price=service[2],
-                    total=Decimal(str(quantity)) * service[2]
-                )
-            
-            # Calculate invoice total
-            invoice.calculate_total()
-            invoice.save()
 
 print(f"Created {PatientInvoice.objects.count()} invoices with {InvoiceLineItem.objects.count()} line items")
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tenants", "0005_alter_tenant_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tenant",
+            index=models.Index(
+                fields=["plan", "created_at"], name="tenants_ten_plan_49a8ca_idx"
+            ),
+        ),
+    ]
@@ -52,6 +52,12 @@ class Tenant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Trial reminder windows (billing.free_trial.trial_expiring_tenants)
+            models.Index(fields=["plan", "created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.get_plan_display()})"
 
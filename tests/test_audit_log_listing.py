@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from audit_logs.models import AuditLog
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class AuditLogListViewTest(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test Tenant", subdomain="testtenant")
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpass", tenant=self.tenant
+        )
+        self.client.login(username="testuser", password="testpass")
+        now = timezone.now()
+        AuditLog.objects.bulk_create(
+            AuditLog(
+                action=f"action-{i}",
+                tenant=self.tenant,
+                timestamp=now - timedelta(minutes=i),
+            )
+            for i in range(15)
+        )
+        AuditLog.objects.create(
+            action="ancient", tenant=self.tenant, timestamp=now - timedelta(days=400)
+        )
+        AuditLog.objects.create(
+            action="last-quarter",
+            tenant=self.tenant,
+            timestamp=now - timedelta(days=200),
+        )
+
+    def test_keyset_pages_recent_entries(self):
+        response = self.client.get(reverse("audit_log_list"))
+        actions = [log.action for log in response.context["logs"]]
+        self.assertEqual(actions, [f"action-{i}" for i in range(10)])
+        self.assertIsNotNone(response.context["next_cursor"])
+
+        response = self.client.get(
+            reverse("audit_log_list"), {"before": response.context["next_cursor"]}
+        )
+        actions = [log.action for log in response.context["logs"]]
+        # Everything not yet archived (ARCHIVE_AFTER_MONTHS) stays reachable.
+        self.assertEqual(
+            actions, [f"action-{i}" for i in range(10, 15)] + ["last-quarter"]
+        )
+        self.assertIsNone(response.context["next_cursor"])
+        self.assertNotContains(response, "ancient")
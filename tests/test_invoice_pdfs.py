@@ -0,0 +1,83 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from billing.invoice_pdf import invoice_digest, pdf_path, render_invoices
+from billing.invoices import create_invoice
+from billing.tasks import render_statement_pdfs
+from common.testing import TempRootMixin
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class InvoicePdfTests(TempRootMixin, TestCase):
+    def setUp(self):
+        self.temp_root("INVOICE_PDF_ROOT")
+
+        self.tenant = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def invoice(self, status="sent"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_invoice(
+                self.tenant,
+                self.patient,
+                [{"description": "MRI <scan>", "unit_price": Decimal("450.00")}],
+                status=status,
+                due_date=date(2025, 1, 31),
+                notes="Thank you",
+            )
+
+    def test_finalized_invoices_are_rendered_once_per_content(self):
+        invoice = self.invoice()
+        invoice.refresh_from_db()
+        first = pdf_path(invoice, invoice.pdf_sha256)
+        self.assertTrue(first.read_bytes().startswith(b"%PDF"))
+        self.assertEqual(render_invoices([invoice.pk]), {"rendered": 0, "unchanged": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.status = "paid"
+            invoice.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.pdf_sha256, invoice_digest(invoice))
+        self.assertTrue(pdf_path(invoice, invoice.pdf_sha256).exists())
+        self.assertFalse(first.exists())
+
+    def test_drafts_wait_for_finalizing_or_a_statement_run(self):
+        draft = self.invoice(status="draft")
+        draft.refresh_from_db()
+        self.assertEqual(draft.pdf_sha256, "")
+        self.invoice()
+        self.assertEqual(render_statement_pdfs(), {"invoices": 1, "batches": 1})
+
+    def test_download_uses_the_content_hash_as_etag(self):
+        CustomUser.objects.create_user(
+            username="biller", password="pw", tenant=self.tenant
+        )
+        self.client.login(username="biller", password="pw")
+        draft = self.invoice(status="draft")
+        url = reverse("patient_invoice_pdf", args=[draft.pk])
+
+        # Not rendered yet: queued, and the user is sent back to the invoice.
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, reverse("patient_invoice_detail", args=[draft.pk])
+        )
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn("private", response["Cache-Control"])
+        etag = response["ETag"]
+        draft.refresh_from_db()
+        self.assertEqual(etag, f'"{invoice_digest(draft)}"')
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
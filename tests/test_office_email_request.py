@@ -32,7 +32,8 @@ class OfficeEmailRequestTests(TestCase):
             "users": 5,
             "notes": "Please set up 5 mailboxes."
         }
-        resp = self.client.post(self.url, data)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, data)
         print("RESPONSE CONTENT:\n", resp.content.decode())
         self.assertEqual(resp.status_code, 200)
         self.assertContains(resp, "Your request has been received")
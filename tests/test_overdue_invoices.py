@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core import mail
+from django.test import TestCase
+
+from audit_logs.models import AuditLog
+from billing.invoices import create_invoice
+from billing.models import PatientBalance, PatientInvoice
+from billing.tasks import mark_overdue_invoices
+from common.testing import TempRootMixin
+from patients.models import Patient
+from tenants.models import Tenant
+
+
+class OverdueSweepTests(TempRootMixin, TestCase):
+    def setUp(self):
+        self.temp_root("INVOICE_PDF_ROOT")
+
+        self.today = date.today()
+        self.clinic = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.other = Tenant.objects.create(name="Other", subdomain="other")
+        self.ada = self.make_patient(self.clinic, "Ada", "ada@example.com")
+        self.bob = self.make_patient(self.other, "Bob", "")
+
+    def make_patient(self, tenant, first_name, email):
+        return Patient.objects.create(
+            tenant=tenant,
+            first_name=first_name,
+            last_name="Patient",
+            date_of_birth=date(1980, 1, 1),
+            email=email,
+        )
+
+    def invoice(self, patient, number, days_past_due, status="sent"):
+        return create_invoice(
+            patient.tenant,
+            patient,
+            [{"description": "Visit", "unit_price": Decimal("50.00")}],
+            invoice_number=number,
+            status=status,
+            due_date=self.today - timedelta(days=days_past_due),
+        )
+
+    def status(self, number):
+        return PatientInvoice.objects.get(invoice_number=number).status
+
+    def test_sweep_marks_past_due_invoices_and_queues_reminders(self):
+        self.invoice(self.ada, "INV-1", 3)
+        self.invoice(self.ada, "INV-2", 0)
+        self.invoice(self.ada, "INV-3", 10, status="paid")
+        self.invoice(self.bob, "INV-4", 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = mark_overdue_invoices()
+        self.assertEqual(result, {"tenants": 2, "invoices": 2, "reminder_batches": 1})
+        self.assertEqual(
+            [self.status(n) for n in ("INV-1", "INV-2", "INV-3", "INV-4")],
+            ["overdue", "sent", "paid", "overdue"],
+        )
+        balance = PatientBalance.objects.get(patient=self.ada)
+        self.assertEqual(
+            (balance.outstanding, balance.overdue), (Decimal("100.00"), 50)
+        )
+        self.assertEqual(
+            AuditLog.objects.filter(action="invoices_marked_overdue").count(), 2
+        )
+        # Bob has no email address.
+        self.assertEqual([m.to for m in mail.outbox], [["ada@example.com"]])
+        self.assertIn("INV-1", mail.outbox[0].subject)
+
+        self.assertEqual(mark_overdue_invoices()["invoices"], 0)
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from billing.invoices import create_invoice
+from billing.ledger import aging_report, reconcile_balances
+from billing.models import PatientBalance, Payment
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class PatientBalanceTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.patient = self.make_patient("Ada")
+        self.today = date.today()
+
+    def make_patient(self, first_name):
+        return Patient.objects.create(
+            tenant=self.tenant,
+            first_name=first_name,
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def invoice(self, number, amount, status="sent", days_past_due=0, patient=None):
+        return create_invoice(
+            self.tenant,
+            patient or self.patient,
+            [{"description": "Visit", "unit_price": Decimal(amount)}],
+            invoice_number=number,
+            status=status,
+            due_date=self.today - timedelta(days=days_past_due),
+        )
+
+    def balance(self, patient=None):
+        return PatientBalance.objects.get(patient=patient or self.patient)
+
+    def test_balance_follows_invoices_and_payments(self):
+        self.invoice("INV-1", "100.00")
+        overdue = self.invoice("INV-2", "40.00", status="overdue", days_past_due=45)
+        self.invoice("INV-3", "999.00", status="draft")
+        balance = self.balance()
+        self.assertEqual(
+            (balance.outstanding, balance.overdue, balance.open_invoices),
+            (Decimal("140.00"), Decimal("40.00"), 2),
+        )
+        self.assertEqual(balance.oldest_due_date, overdue.due_date)
+
+        overdue.status = "paid"
+        overdue.save()
+        Payment.objects.create(
+            tenant=self.tenant, patient=self.patient, amount=Decimal("40.00")
+        )
+        balance = self.balance()
+        self.assertEqual((balance.outstanding, balance.overdue), (100, 0))
+        self.assertEqual(balance.payments_total, Decimal("40.00"))
+        self.assertIsNotNone(balance.last_payment_at)
+
+        self.patient.delete()
+        self.assertFalse(PatientBalance.objects.exists())
+
+    def test_reconcile_flags_and_fixes_drift(self):
+        self.invoice("INV-1", "100.00")
+        other = self.make_patient("Grace")
+        self.invoice("INV-2", "25.00", patient=other)
+        PatientBalance.objects.filter(patient=self.patient).update(outstanding=1)
+        PatientBalance.objects.filter(patient=other).delete()
+
+        self.assertEqual(reconcile_balances(fix=False)["drifted"], 2)
+        self.assertEqual(self.balance().outstanding, 1)
+        self.assertEqual(reconcile_balances(), {"tenants": 1, "drifted": 2})
+        self.assertEqual(self.balance().outstanding, Decimal("100.00"))
+        self.assertEqual(self.balance(other).outstanding, Decimal("25.00"))
+        self.assertEqual(reconcile_balances()["drifted"], 0)
+
+    def test_aging_report_and_receivables_page(self):
+        self.invoice("INV-1", "100.00")
+        self.invoice("INV-2", "60.00", days_past_due=10, patient=self.make_patient("B"))
+        self.invoice(
+            "INV-3", "30.00", days_past_due=120, patient=self.make_patient("C")
+        )
+        report = {row["label"]: row for row in aging_report(self.tenant)}
+        self.assertEqual(report["Current"]["amount"], Decimal("100.00"))
+        self.assertEqual(report["1-30 days"]["patients"], 1)
+        self.assertEqual(report["31-60 days"]["amount"], 0)
+        self.assertEqual(report["Over 90 days"]["amount"], Decimal("30.00"))
+
+        CustomUser.objects.create_user(
+            username="biller",
+            password="pw",
+            tenant=self.tenant,
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.client.login(username="biller", password="pw")
+        response = self.client.get(reverse("accounts_receivable"))
+        self.assertContains(response, "Total outstanding: £190.00")
+        response = self.client.get(reverse("patient_billing", args=[self.patient.pk]))
+        self.assertContains(response, "Total Amount Owed: £100.00")
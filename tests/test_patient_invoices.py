@@ -0,0 +1,214 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from billing.invoices import (
+    allocate_invoice_numbers,
+    create_invoice,
+    reserve_invoice_numbers,
+)
+from billing.models import InvoiceLineItem, InvoiceSequence, PatientInvoice
+from patients.models import Patient
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class PatientInvoiceBuilderTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.patient = Patient.objects.create(
+            tenant=self.tenant,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+
+    def create(self, number, item_count):
+        items = [
+            {"description": f"Procedure {i}", "quantity": 3, "unit_price": "3.335"}
+            for i in range(item_count)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            invoice = create_invoice(
+                self.tenant,
+                self.patient,
+                items,
+                invoice_number=number,
+                due_date=date(2025, 1, 31),
+                tax=Decimal("5.00"),
+            )
+        invoice.refresh_from_db()
+        return invoice, len(queries)
+
+    def test_create_invoice_bulk_inserts_items(self):
+        _, single_item_queries = self.create("INV-0", 1)
+        invoice, queries = self.create("INV-1", 300)
+        # Only the INSERT batches grow with the number of items.
+        self.assertLessEqual(queries - single_item_queries, 3)
+        self.assertEqual(invoice.items.count(), 300)
+        # 3 * 3.335 = 10.005, rounded half up per line.
+        self.assertEqual(invoice.subtotal, Decimal("3003.00"))
+        self.assertEqual(invoice.total, Decimal("3008.00"))
+
+    def test_single_item_save_keeps_totals(self):
+        invoice = create_invoice(
+            self.tenant, self.patient, invoice_number="INV-2", due_date=date.today()
+        )
+        item = InvoiceLineItem.objects.create(
+            invoice=invoice, description="Consultation", unit_price=Decimal("40.00")
+        )
+        item.quantity = Decimal("2")
+        item.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total, Decimal("80.00"))
+
+    def test_create_view_and_admin_use_the_builder(self):
+        CustomUser.objects.create_user(
+            username="biller",
+            password="pw",
+            tenant=self.tenant,
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.client.login(username="biller", password="pw")
+        data = {
+            "due_date": "2025-02-28",
+            "tax": "1.50",
+            "item_count": 3,
+            "item_0_description": "MRI",
+            "item_0_quantity": "1",
+            "item_0_unit_price": "450.00",
+            "item_1_description": "Dressing",
+            "item_1_quantity": "4",
+            "item_1_unit_price": "2.25",
+            "item_2_description": "",
+        }
+        self.client.post(
+            reverse("patient_invoice_create", args=[self.patient.pk]), data
+        )
+        invoice = PatientInvoice.objects.get(patient=self.patient)
+        self.assertEqual(invoice.invoice_number, "INV-000001")
+        self.assertEqual(invoice.items.count(), 2)
+        self.assertEqual(
+            (invoice.subtotal, invoice.total), (Decimal("459.00"), Decimal("460.50"))
+        )
+
+        mri, dressing = invoice.items.order_by("pk")
+        url = reverse("admin:billing_patientinvoice_change", args=[invoice.pk])
+        prefix = "items"
+        response = self.client.post(
+            url,
+            {
+                "tenant": self.tenant.pk,
+                "patient": self.patient.pk,
+                "status": "sent",
+                "due_date": "2025-02-28",
+                "tax": "1.50",
+                "currency": "GBP",
+                "notes": "",
+                f"{prefix}-TOTAL_FORMS": 3,
+                f"{prefix}-INITIAL_FORMS": 2,
+                f"{prefix}-0-id": mri.pk,
+                f"{prefix}-0-invoice": invoice.pk,
+                f"{prefix}-0-description": "MRI",
+                f"{prefix}-0-service_type": "imaging",
+                f"{prefix}-0-quantity": "1",
+                f"{prefix}-0-unit_price": "400.00",
+                f"{prefix}-1-id": dressing.pk,
+                f"{prefix}-1-invoice": invoice.pk,
+                f"{prefix}-1-description": "Dressing",
+                f"{prefix}-1-service_type": "other",
+                f"{prefix}-1-quantity": "4",
+                f"{prefix}-1-unit_price": "2.25",
+                f"{prefix}-1-DELETE": "on",
+                f"{prefix}-2-invoice": invoice.pk,
+                f"{prefix}-2-description": "Follow-up",
+                f"{prefix}-2-service_type": "consultation",
+                f"{prefix}-2-quantity": "1",
+                f"{prefix}-2-unit_price": "50.00",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        invoice.refresh_from_db()
+        self.assertEqual(
+            sorted(invoice.items.values_list("description", flat=True)),
+            ["Follow-up", "MRI"],
+        )
+        self.assertEqual(
+            (invoice.subtotal, invoice.total), (Decimal("450.00"), Decimal("451.50"))
+        )
+
+
+class InvoiceNumberTests(TestCase):
+    def setUp(self):
+        self.clinic = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.other = Tenant.objects.create(name="Other", subdomain="other")
+
+    def test_numbers_are_per_tenant_blocks_and_gap_free(self):
+        self.assertEqual(allocate_invoice_numbers(self.clinic), ["INV-000001"])
+        self.assertEqual(
+            allocate_invoice_numbers(self.clinic, 3),
+            ["INV-000002", "INV-000003", "INV-000004"],
+        )
+        self.assertEqual(allocate_invoice_numbers(self.other), ["INV-000001"])
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                allocate_invoice_numbers(self.clinic, 10)
+                raise ValueError("invoice creation failed")
+        self.assertEqual(allocate_invoice_numbers(self.clinic), ["INV-000005"])
+
+    @override_settings(INVOICE_NUMBER_FORMAT="{tenant}-{year}-{number:04d}")
+    def test_format_is_configurable_per_tenant(self):
+        year = date.today().year
+        self.assertEqual(allocate_invoice_numbers(self.clinic), [f"clinic-{year}-0001"])
+        InvoiceSequence.objects.update_or_create(
+            tenant=self.other, defaults={"number_format": "B{number}"}
+        )
+        self.assertEqual(allocate_invoice_numbers(self.other), ["B1"])
+
+    def test_sequence_continues_after_existing_numbers(self):
+        patient = Patient.objects.create(
+            tenant=self.clinic,
+            first_name="Ada",
+            last_name="Lovelace",
+            date_of_birth=date(1980, 1, 1),
+        )
+        for number in ("INV-000002", "INV-000004"):
+            PatientInvoice.objects.create(
+                tenant=self.clinic,
+                patient=patient,
+                invoice_number=number,
+                due_date=date(2025, 1, 31),
+            )
+        invoice = create_invoice(self.clinic, patient, due_date=date(2025, 1, 31))
+        self.assertEqual(invoice.invoice_number, "INV-000005")
+
+        # Numbers already in use are skipped rather than handed out again.
+        InvoiceSequence.objects.filter(tenant=self.clinic).update(next_value=1)
+        self.assertEqual(
+            allocate_invoice_numbers(self.clinic, 4),
+            ["INV-000001", "INV-000003", "INV-000006", "INV-000007"],
+        )
+
+
+class InvoiceNumberTransactionTests(TransactionTestCase):
+    def test_allocation_requires_a_transaction(self):
+        tenant = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        with self.assertRaises(transaction.TransactionManagementError):
+            allocate_invoice_numbers(tenant)
+
+    def test_blocks_are_reserved_in_their_own_transaction(self):
+        tenant = Tenant.objects.create(name="Clinic", subdomain="clinic")
+        self.assertEqual(
+            reserve_invoice_numbers(tenant, 3),
+            ["INV-000001", "INV-000002", "INV-000003"],
+        )
+        with transaction.atomic():
+            self.assertEqual(allocate_invoice_numbers(tenant), ["INV-000004"])
+            with self.assertRaises(transaction.TransactionManagementError):
+                reserve_invoice_numbers(tenant, 3)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from billing import free_trial
+from billing.free_trial import send_trial_notices
+from billing.models import TrialNotice
+from billing.tasks import (
+    daily_trial_expiry_soft_reminder,
+    weekly_trial_expiry_notifications,
+)
+from common.models import EmailOutbox
+from tenants.models import Tenant
+from users.models import CustomUser
+
+
+class TrialNotificationTests(TestCase):
+    def make_tenant(self, name, age_days, plan="free_trial"):
+        tenant = Tenant.objects.create(name=name, subdomain=name, plan=plan)
+        Tenant.objects.filter(pk=tenant.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days, hours=1)
+        )
+        CustomUser.objects.create_user(
+            username=f"{name}-admin",
+            password="pw",
+            tenant=tenant,
+            role="admin",
+            email=f"admin@{name}.example.com",
+        )
+        CustomUser.objects.create_user(
+            username=f"{name}-user",
+            password="pw",
+            tenant=tenant,
+            email=f"user@{name}.example.com",
+        )
+        return tenant
+
+    def setUp(self):
+        self.ten_days_left = self.make_tenant("tendays", 80)
+        self.five_days_left = self.make_tenant("fivedays", 85)
+        self.make_tenant("early", 30)
+        self.make_tenant("expired", 95)
+        self.make_tenant("paid", 80, plan="professional")
+
+    def recipients(self):
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def test_weekly_notifies_tenants_in_window_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = weekly_trial_expiry_notifications()
+        self.assertEqual(result, {"tenants": 2, "batches": 1})
+        self.assertEqual(
+            self.recipients(),
+            ["admin@fivedays.example.com", "admin@tendays.example.com"],
+        )
+        self.assertIn("will expire in 10 days", "".join(m.body for m in mail.outbox))
+
+        # A rerun (or a retried batch) sends nothing new.
+        self.assertEqual(weekly_trial_expiry_notifications()["tenants"], 0)
+        period = TrialNotice.period_for(TrialNotice.WEEKLY, timezone.localdate())
+        send_trial_notices(
+            TrialNotice.WEEKLY, period, [self.ten_days_left.pk, self.five_days_left.pk]
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_daily_reminder_covers_last_week(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            daily_trial_expiry_soft_reminder()
+        self.assertEqual(self.recipients(), ["admin@fivedays.example.com"])
+
+    def test_failed_batch_leaves_nothing_claimed(self):
+        enqueue_email = free_trial.enqueue_email
+        calls = []
+
+        def flaky_enqueue(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise DatabaseError("gone")
+            return enqueue_email(*args)
+
+        tenant_ids = [self.ten_days_left.pk, self.five_days_left.pk]
+        with mock.patch.object(free_trial, "enqueue_email", flaky_enqueue):
+            with self.assertRaises(DatabaseError):
+                send_trial_notices(TrialNotice.DAILY, "2025-01-01", tenant_ids)
+        self.assertFalse(TrialNotice.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+        self.assertEqual(
+            send_trial_notices(TrialNotice.DAILY, "2025-01-01", tenant_ids), 2
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 2)
@@ -5,6 +5,7 @@ from django.utils.html import format_html
 from common.audit import log_audit
 
 from .models import CustomUser
+from .notifications import notify_user_approved
 
 
 @admin.register(CustomUser)
@@ -54,6 +55,7 @@ class CustomUserAdmin(admin.ModelAdmin):
                 tenant=user.tenant,
                 details=f"User {user.username} approved by {request.user.username} via admin action.",
             )
+            notify_user_approved(user)
         self.message_user(request, f"{count} user(s) successfully activated.")
 
     activate_users.short_description = "Activate selected users"
@@ -4,6 +4,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 
 from common.audit import log_audit
 from users.models import CustomUser
+from users.notifications import notify_user_approved
 
 
 @staff_member_required
@@ -23,5 +24,6 @@ def approve_user(request, user_id):
         tenant=user.tenant,
         details=f"User {user.username} approved by {request.user.username}.",
     )
+    notify_user_approved(user)
     messages.success(request, f"User {user.username} has been approved and activated.")
     return redirect("pending_users")
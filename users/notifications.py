@@ -1,6 +1,6 @@
 from django.conf import settings
-from django.core.mail import send_mail
 
+from common.outbox import enqueue_email
 from users.models import CustomUser
 
 
@@ -42,15 +42,8 @@ def notify_admins_of_new_user(user):
     )
     recipient_list = [admin.email for admin in admins if admin.email]
 
-    if recipient_list:
-        try:
-            send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-        except Exception as e:
-            # Log error but don't block registration
-            import logging
-
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send admin notification email: {str(e)}")
+    # Queued, so registration never waits on the mail server.
+    enqueue_email(subject, message, recipient_list, from_email)
 
 
 def notify_user_approved(user):
@@ -84,13 +77,7 @@ def notify_user_approved(user):
         else "noreply@cliniccloud.com"
     )
 
-    try:
-        send_mail(subject, message, from_email, [user.email], fail_silently=False)
-    except Exception as e:
-        import logging
-
-        logger = logging.getLogger(__name__)
-        logger.error(f"Failed to send user approval email: {str(e)}")
+    enqueue_email(subject, message, [user.email], from_email)
 
 
 def notify_user_rejected(user, reason=""):
@@ -123,10 +110,4 @@ def notify_user_rejected(user, reason=""):
         else "noreply@cliniccloud.com"
     )
 
-    try:
-        send_mail(subject, message, from_email, [user.email], fail_silently=False)
-    except Exception as e:
-        import logging
-
-        logger = logging.getLogger(__name__)
-        logger.error(f"Failed to send user rejection email: {str(e)}")
+    enqueue_email(subject, message, [user.email], from_email)